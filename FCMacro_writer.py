@@ -9,27 +9,49 @@ in FreeCAD will generate the external shape.
 @author: Fabio C.
 '''
 
+import io
 import os
+from collections import OrderedDict
 
 import numpy as np
-from numpy import loadtxt
 
+from airfoil_registry import load_airfoil
+from box_layout import BoxLayout
+
+
+'''
+Formatted section blocks shared by all the writers of the process, see
+'FCMacro_writer.section_block'.
+'''
+_SECTION_BLOCKS = OrderedDict()
+MAX_SECTION_BLOCKS = 256
 
 
 class FCMacro_writer:
 
     
-    def __init__ (self, pars, airfoil_file):
+    def __init__ (self, pars, airfoil_file, layout=None, inputs_dir=None):
         
         self.parameters = pars
         self.airfoil_file = airfoil_file
+        if inputs_dir is None:
+            inputs_dir = os.path.join(os.getcwd(), 'Inputs')
+        self.inputs_dir = inputs_dir
+        self.layout = layout if layout is not None else BoxLayout()
         self.macro = None
+        self._geometry = None
+        self._airfoil_key = None
+        self.reused_sections = 0
         
         """
         FreeCAD_writer is a class, whose purpose is the generation of the macro
         for FreeCAD. The macro is intended for the automatic generation of the
         wing 3D parametric model of the external surface and the crresponding 
         internal structure.
+        'layout' is a BoxLayout giving the number of sections and the position
+        of the spars (default: 5 sections, box between 30% and 80%).
+        'inputs_dir' is the folder of the airfoil file (default 'Inputs' in
+        the current working directory).
         """
         
 
@@ -40,6 +62,8 @@ class FCMacro_writer:
         'airfoil' having four columns. Columns 1 and 3 contain the x coordinate 
         from 0 to 1, the 2nd and 4th columns the upper and lower coordinates 
         respectively. 
+        The file is parsed only once: the split is kept by the airfoil
+        registry (see 'airfoil_registry.py') and shared by all the processes.
             
         Args:
             
@@ -47,25 +71,14 @@ class FCMacro_writer:
         airfoil:              n_points x 4 array.
         """
         
-        airfoil_path = os.path.join(os.getcwd(), 'Inputs', self.airfoil_file)
-        airfoil = loadtxt(airfoil_path)
-        length = len(airfoil)
-        upper = airfoil[0:(length//2+1)]
-        lower = airfoil[(length//2):length]
-        '''
-        The following line reverses the order of the elements in 'upper' and
-        makes it consistent with 'lower'.
-        '''
-        upper = upper[::-1]
-        airfoil = np.concatenate((upper, lower), axis=1)
-
-        return airfoil
+        airfoil_path = os.path.join(self.inputs_dir, self.airfoil_file)
+        return load_airfoil(airfoil_path)
     
     def split_points(self):
         """
         This function take the upper and lower points from 'read_airfoil()' and
         splits each one in three parts: leading edge, central part (box) and 
-        trailing edge.
+        trailing edge. The box is the part between the spars of the layout.
             
         Args:
             
@@ -73,18 +86,17 @@ class FCMacro_writer:
         le, box, te:        arrays of 4 columns. Parts of the airfoil array.
         """
         airfoil = self.read_airfoil()
-        length = len(airfoil)
-        le = airfoil[0:round(0.3*length), :]
-        box = airfoil[round(0.3*length)-1:round(0.8*length), :]
-        #te = airfoil[round(0.8*length)-1:length, :]
+        self._airfoil_key = (self.airfoil_file, airfoil.tobytes(), self.layout.spars)
+        box = self.layout.box_points(airfoil)
+        le = airfoil[airfoil[:, 0] <= box[0, 0]]
         return le, box
     
     
     def make_sections(self):
         """
         This function takes a number of evenly spaced sections along the span 
-        and for each one computes the chord.It is desirable to have an odd 
-        number of sections.
+        and for each one computes the chord. The number of sections of each
+        panel is given by the layout (default 2 bays per panel, 5 sections).
         Then the function estimates the area of each wing block.
              
         Args:
@@ -94,10 +106,15 @@ class FCMacro_writer:
         areas:              area values [mm2] in a numpy array.
         """
         params = self.parameters
-        sections = ([0, params[5]/2, params[5], (params[6]+params[5])/2, params[6]])
+        sections = self.layout.stations(params)
         num = len(sections)
-        chords = np.zeros(num)
-        xle = np.zeros(num)
+        '''
+        The arrays take the type of the parameters, so the function also works
+        with complex parameters (complex-step derivatives, see 'gradient.py').
+        '''
+        dtype = np.result_type(np.asarray(params), float)
+        chords = np.zeros(num, dtype=dtype)
+        xle = np.zeros(num, dtype=dtype)
         j = 0
         '''
         I define the four sweep angles: 2 for the LE and for the TE.
@@ -108,7 +125,7 @@ class FCMacro_writer:
         Sweep_te2 = ((params[2]+params[4])-(params[1]+params[3]))/(params[6]-params[5])
          
         for sec in sections:            
-            if sec <= params[5]:
+            if np.real(sec) <= np.real(params[5]):
                 xle[j] =  (Sweep_le1*sec)
                 chords[j] = (params[0]+(Sweep_te1*sec))-(Sweep_le1*sec)
             else:
@@ -119,7 +136,7 @@ class FCMacro_writer:
         '''
         Now I compute the value of the area between two adjacent sections.
         '''
-        areas = np.zeros(num-1)
+        areas = np.zeros(num-1, dtype=dtype)
         for k in range(num-1):
             height = sections[k+1]-sections[k]
             areas[k] = ((chords[k+1]+chords[k])*height)/2
@@ -151,137 +168,77 @@ class FCMacro_writer:
         self.macro.write("FreeCAD.newDocument(docName)\n\n")
 
 
+    def geometry(self):
+        """
+        Computes the box points and the sections once; the other methods take
+        them from here instead of reading the airfoil file and computing the
+        sections again.
+
+        Returns:
+        box :               box part of the airfoil, see 'split_points'.
+        sections :          (yle, xle, chords) of 'make_sections'.
+        """
+        if self._geometry is None:
+            self._geometry = (self.split_points()[1], self.make_sections())
+        return self._geometry
+
+    @staticmethod
+    def points_block(x, z):
+        """
+        Formats the points of one spline (in the plane y = 0) in a single
+        join.
+        """
+        points = ',\n'.join(['    FreeCAD.Vector(' + str(a) + ',0.0,' + str(b) + ')'
+                             for a, b in zip(x.tolist(), z.tolist())])
+        return 'points = [\n' + points + '\n]\n'
+
+    def section_block(self, j):
+        """
+        Text of the upper and lower splines of section j. The blocks are kept
+        in '_SECTION_BLOCKS', so a section which did not change (e.g. the
+        inner sections when only the outer panel moved) is not formatted
+        again.
+        """
+        box, (yle, xle, chords) = self.geometry()
+        key = (self._airfoil_key, j, chords[j], xle[j], yle[j])
+        block = _SECTION_BLOCKS.get(key)
+        if block is not None:
+            _SECTION_BLOCKS.move_to_end(key)
+            self.reused_sections += 1
+            return block
+
+        k = 2*j
+        upper_name = 'BSpline' if k == 0 else 'BSpline' + str(k).zfill(3)
+        lower_name = 'BSpline' + str(k+1).zfill(3)
+        placement = ('").Placement = App.Placement(App.Vector(' + str(xle[j]) + ',' +
+                     str(yle[j]) + ', 0),App.Rotation(App.Vector(0,0,1),0))\n\n')
+        spline = ('spline = Draft.makeBSpline(points,closed=False,face=False,support=None)\n'
+                  'Draft.autogroup(spline)\n')
+        '''
+        Upper spline (columns 1 and 2 of the box) and lower spline (columns 1
+        and 4), both scaled by the chord.
+        '''
+        block = (self.points_block(chords[j]*box[:, 0], chords[j]*box[:, 1]) + spline +
+                 'FreeCAD.getDocument("MyDoc").getObject("' + upper_name + placement +
+                 self.points_block(chords[j]*box[:, 0], chords[j]*box[:, 3]) + spline +
+                 'FreeCAD.getDocument("MyDoc").getObject("' + lower_name + placement)
+
+        _SECTION_BLOCKS[key] = block
+        if len(_SECTION_BLOCKS) > MAX_SECTION_BLOCKS:
+            _SECTION_BLOCKS.popitem(last=False)
+        return block
+
     def airfoil_points(self):
         '''
-        I use a 'for' loop to create the block corresponding to the aerofoil
-        points. The nested 'if' condition is used only to avoid to write the
-        comma in the final line.
+        Writes the upper and lower splines of the box for each section (two
+        splines per section).
         '''
-#       params = self.parameters()
-#       le, box, te = self.split_points()
-        box = self.split_points()[1]
-        yle, xle, chords = self.make_sections()
-        k = 0       
-        self.macro.write("#Splines from points. Six splines per section.\n\n")
-        for j in range(len(yle)):
-            
-#             self.macro.write("points = [\n")
-#             for l in range(len(le)):
-#                 if l < (len(le)-1):
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*le[l,0]) + ',' +   \
-#                                         str(params[j]*le[l,1]) + ',' + str(0.0) +'),\n')
-#                 else:
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*le[l,0]) + ',' +   \
-#                                          str(params[j]*le[l,1]) + ',' + str(0.0) +')\n')
-#             self.macro.write("]\n")
-#             self.macro.write('spline = Draft.makeBSpline(points,closed=False,face=False,support=None)\n')
-#             self.macro.write('Draft.autogroup(spline)\n')
-#             if k == 0:      
-#                 self.macro.write('FreeCAD.getDocument("MyDoc").getObject("BSpline").Placement = App.Placement(App.Vector(' + str(xle[j]) + ', 0,' + str(yle[j]) + '),App.Rotation(App.Vector(0,0,1),0))\n\n')
-#             else:
-#                 self.macro.write('FreeCAD.getDocument("MyDoc").getObject("BSpline' + str(k).zfill(3) + '").Placement = App.Placement(App.Vector(' + str(xle[j]) + ', 0,' + str(yle[j]) + '),App.Rotation(App.Vector(0,0,1),0))\n\n')
-#             k +=1 
-            
-            '''
-            With the following block I write the upper and lower splines only 
-            corresponding to the box. So the 'for' loop on 'l' is for the upper 
-            spline, while the 'for' loop on 'm' draws the lower spline.
-            This block is inside the 'for' loop in 'j', which means it is 
-            repeated for each section.
-            '''
-            
-            self.macro.write("points = [\n")
-            for l in range(len(box)):
-                if l < (len(box)-1):
-                    self.macro.write('    FreeCAD.Vector('+str(chords[j]*box[l,0]) + ',' + \
-                                     str(0.0) + ',' + str(chords[j]*box[l,1]) +'),\n')
-                else:
-                    self.macro.write('    FreeCAD.Vector('+str(chords[j]*box[l,0]) + ',' + \
-                                     str(0.0) + ',' + str(chords[j]*box[l,1]) +')\n')
-            self.macro.write("]\n")
-            self.macro.write('spline = Draft.makeBSpline(points,closed=False,face=False,support=None)\n')
-            self.macro.write('Draft.autogroup(spline)\n')
-            if k == 0:      
-                self.macro.write('FreeCAD.getDocument("MyDoc").getObject("BSpline").Placement = App.Placement(App.Vector(' + str(xle[j]) + ',' + str(yle[j]) + ', 0),App.Rotation(App.Vector(0,0,1),0))\n\n')
-            else:
-                self.macro.write('FreeCAD.getDocument("MyDoc").getObject("BSpline' + str(k).zfill(3) + '").Placement = App.Placement(App.Vector(' + str(xle[j]) + ',' + str(yle[j]) + ', 0),App.Rotation(App.Vector(0,0,1),0))\n\n')
-            k +=1 
-    
-            self.macro.write("points = [\n")    
-            for m in range(len(box)):
-                if m < (len(box)-1):
-                    self.macro.write('    FreeCAD.Vector('+str(chords[j]*box[m,0]) + ',' + \
-                                     str(0.0) + ',' + str(chords[j]*box[m,3]) +'),\n')
-                else:
-                    self.macro.write('    FreeCAD.Vector('+str(chords[j]*box[m,0]) + ',' + \
-                                     str(0.0) + ',' + str(chords[j]*box[m,3]) +')\n')
-            self.macro.write("]\n")
-            self.macro.write('spline = Draft.makeBSpline(points,closed=False,face=False,support=None)\n')
-            self.macro.write('Draft.autogroup(spline)\n')
-            self.macro.write('FreeCAD.getDocument("MyDoc").getObject("BSpline' + str(k).zfill(3) + '").Placement = App.Placement(App.Vector(' + str(xle[j]) + ',' + str(yle[j]) + ', 0),App.Rotation(App.Vector(0,0,1),0))\n\n')
-            k +=1
-#             
-#             self.macro.write("points = [\n")
-#             for n in range(len(te)):
-#                 if n < (len(te)-1):
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*te[n,0]) + ',' +   \
-#                                         str(params[j]*te[n,1]) + ',' + str(0.0) +'),\n')
-#                 else:
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*te[n,0]) + ',' +   \
-#                                          str(params[j]*te[n,1]) + ',' + str(0.0) +')\n')
-#             self.macro.write("]\n")
-#             self.macro.write('spline = Draft.makeBSpline(points,closed=False,face=False,support=None)\n')
-#             self.macro.write('Draft.autogroup(spline)\n')
-#             self.macro.write('FreeCAD.getDocument("MyDoc").getObject("BSpline' + str(k).zfill(3) + '").Placement = App.Placement(App.Vector(' + str(xle[j]) + ', 0,' + str(yle[j]) + '),App.Rotation(App.Vector(0,0,1),0))\n\n')
-#             k += 1
-            
-            ####################################################################
-            
-#             self.macro.write("points = [\n")
-#             for l in range(len(le)):
-#                 if l < (len(le)-1):
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*le[l,0]) + ',' +   \
-#                                         str(params[j]*le[l,3]) + ',' + str(0.0) +'),\n')
-#                 else:
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*le[l,0]) + ',' +   \
-#                                          str(params[j]*le[l,3]) + ',' + str(0.0) +')\n')
-#             self.macro.write("]\n")
-#             self.macro.write('spline = Draft.makeBSpline(points,closed=False,face=False,support=None)\n')
-#             self.macro.write('Draft.autogroup(spline)\n')
-#             self.macro.write('FreeCAD.getDocument("MyDoc").getObject("BSpline' + str(k).zfill(3) + '").Placement = App.Placement(App.Vector(' + str(xle[j]) + ', 0,' + str(yle[j]) + '),App.Rotation(App.Vector(0,0,1),0))\n\n')
-#             k +=1 
-#             
-#     
-#             self.macro.write("points = [\n")    
-#             for m in range(len(box)):
-#                 if m < (len(box)-1):
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*box[m,0]) + ',' +   \
-#                                         str(params[j]*box[m,3]) + ',' + str(0.0) +'),\n')
-#                 else:
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*box[m,0]) + ',' +   \
-#                                          str(params[j]*box[m,3]) + ',' + str(0.0) +')\n')
-#             self.macro.write("]\n")
-#             self.macro.write('spline = Draft.makeBSpline(points,closed=False,face=False,support=None)\n')
-#             self.macro.write('Draft.autogroup(spline)\n')
-#             self.macro.write('FreeCAD.getDocument("MyDoc").getObject("BSpline' + str(k).zfill(3) + '").Placement = App.Placement(App.Vector(' + str(xle[j]) + ', 0,' + str(yle[j]) + '),App.Rotation(App.Vector(0,0,1),0))\n\n')
-#             k +=1
-#             
-#             self.macro.write("points = [\n")
-#             for n in range(len(te)):
-#                 if n < (len(te)-1):
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*te[n,0]) + ',' +   \
-#                                         str(params[j]*te[n,3]) + ',' + str(0.0) +'),\n')
-#                 else:
-#                     self.macro.write('    FreeCAD.Vector('+str(params[j]*te[n,0]) + ',' +   \
-#                                          str(params[j]*te[n,3]) + ',' + str(0.0) +')\n')
-#             self.macro.write("]\n")
-#             self.macro.write('spline = Draft.makeBSpline(points,closed=False,face=False,support=None)\n')
-#             self.macro.write('Draft.autogroup(spline)\n')
-#             self.macro.write('FreeCAD.getDocument("MyDoc").getObject("BSpline' + str(k).zfill(3) + '").Placement = App.Placement(App.Vector(' + str(xle[j]) + ', 0,' + str(yle[j]) + '),App.Rotation(App.Vector(0,0,1),0))\n\n')
-#             k += 1
+        yle = self.geometry()[1][0]
+        self.macro.write("#Splines from points. Six splines per section.\n\n" +
+                         ''.join([self.section_block(j) for j in range(len(yle))]))
 
     def make_skin(self):
-        sections = self.make_sections()[0]
+        sections = self.geometry()[1][0]
         num = len(sections)
         for k in range(2*(num-1)):
             if k == 0:
@@ -296,7 +253,7 @@ class FCMacro_writer:
                 self.macro.write("App.ActiveDocument.recompute()\n\n")       
                
     def make_spar(self):
-        sections = self.make_sections()[0]
+        sections = self.geometry()[1][0]
         num = len(sections)
         for k in range(num-1):
             if k == 0:
@@ -322,9 +279,28 @@ class FCMacro_writer:
                 self.macro.write("App.ActiveDocument.recompute()\n\n")  
         
     
+    def make_caps(self):
+        '''
+        The root and the tip of the box are closed with ruled surfaces
+        between the upper and the lower spline of the first and of the last
+        section.
+        '''
+        num = len(self.geometry()[1][0])
+        for upper in (0, 2*(num-1)):
+            first = "BSpline" if upper == 0 else "BSpline" + str(upper).zfill(3)
+            self.macro.write("FreeCAD.ActiveDocument.addObject('Part::RuledSurface', 'Ruled Surface')\n")
+            self.macro.write("FreeCAD.ActiveDocument.ActiveObject.Curve1=(FreeCAD.ActiveDocument." + first + ",['Edge1'])\n")
+            self.macro.write("FreeCAD.ActiveDocument.ActiveObject.Curve2=(FreeCAD.ActiveDocument.BSpline" + str(upper+1).zfill(3) + ",['Edge1'])\n")
+            self.macro.write("App.ActiveDocument.recompute()\n\n")
+
     def export_iges(self, out_dir):
+        '''
+        Skin, spars and caps are exported in this order: the ids of the
+        surfaces are listed by 'BoxLayout.manifest'.
+        '''
+        num = len(self.geometry()[1][0])
         self.macro.write("__objs__=[]\n")
-        for k in range(16):
+        for k in range(4*(num-1) + 2):
             if k == 0:
                 self.macro.write("__objs__.append(FreeCAD.getDocument('MyDoc').getObject('Ruled_Surface'))\n")
             else:
@@ -349,11 +325,18 @@ class FCMacro_writer:
         ndarray:          all the coordinates in a single numpy array structure.
         """
         path = os.path.join(out_dir, output_file)
-        self.macro = open(path,'w')
+        '''
+        The blocks are collected in memory and the file is written with a
+        single call.
+        '''
+        self.macro = io.StringIO()
         self.block_import()
         self.airfoil_points()
         self.make_skin()
         self.make_spar()
+        self.make_caps()
         self.export_iges(out_dir)
-        
+
+        with open(path, 'w') as f:
+            f.write(self.macro.getvalue())
         self.macro.close()        
\ No newline at end of file
@@ -0,0 +1,85 @@
+'''
+Created on 18 Oct 2026
+This module runs the aerodynamic analysis of one wing over several operating
+conditions. The geometry is written once by 'avl_writer' and all the
+points are solved in the same AVL session; the results are read with
+'get_efficiency' and 'get_pressure' and stacked in NumPy arrays. Each AVL
+file is read once into an AvlResult; no intermediate text file is written.
+'''
+
+import os
+import shutil
+
+import numpy as np
+
+from airfoil_registry import avl_airfoil
+from avl_output_p import get_efficiency, get_pressure
+from avl_parser import AvlResult
+from avl_session import AvlSession
+from avl_writer import avl_writer
+
+
+def aero_sweep(desvec, points, work_dir, session=None, inputs_dir=None):
+    """
+    This function computes CL, CD and the pressure field of the semi-wing for
+    a matrix of operating points.
+
+    Args:
+    desvec :            is the design vector.
+    points :            N x 3 array, each row is (Mach, CL, z [m]).
+    work_dir :          folder where the files of the sweep are written.
+    session :           an AvlSession or AvlPool. If None a session is started
+                        in 'work_dir' and closed at the end.
+    inputs_dir :        folder containing 'crm.txt'. Default is 'Inputs' in
+                        the current working directory.
+
+    Returns:
+    coefficients :      record array of N rows with the fields Mach, CL_target,
+                        z, CL, CD.
+    pressure :          N x n_points x 4 array (x, y, z, DP [MPa]) as given by
+                        'get_pressure' for each operating point.
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    if inputs_dir is None:
+        inputs_dir = os.path.join(os.getcwd(), 'Inputs')
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+
+    '''
+    The altitude only changes the dynamic pressure, so the points sharing Mach
+    and CL are solved once by AVL.
+    '''
+    cases, index = np.unique(points[:, :2], axis=0, return_inverse=True)
+    index = index.ravel()
+    avl_writer(desvec, cases[0, 0], work_dir, 'wing.avl')
+    output_files = ['sweep_{}.txt'.format(i) for i in range(len(cases))]
+    avl_cases = [dict(Mach=Mach, CL=CL) for Mach, CL in cases]
+
+    own_session = session is None
+    if own_session:
+        shutil.copy(avl_airfoil(inputs_dir), work_dir)
+        session = AvlSession(work_dir)
+    try:
+        session.solve(os.path.join(work_dir, 'wing.avl'), avl_cases, work_dir,
+                      output_files)
+    finally:
+        if own_session:
+            session.close()
+
+    n = len(points)
+    coefficients = np.recarray(n, dtype=[('Mach', float), ('CL_target', float),
+                                         ('z', float), ('CL', float),
+                                         ('CD', float)])
+    coefficients.Mach = points[:, 0]
+    coefficients.CL_target = points[:, 1]
+    coefficients.z = points[:, 2]
+    results = [AvlResult.from_file(os.path.join(work_dir, output_file))
+               for output_file in output_files]
+    aero = np.array([get_efficiency(result, None) for result in results])
+    coefficients.CL = aero[index, 0]
+    coefficients.CD = aero[index, 1]
+
+    pressure = np.stack([get_pressure(results[index[k]], None,
+                                      points[k, 0], points[k, 2])
+                         for k in range(n)])
+    return coefficients, pressure
@@ -0,0 +1,207 @@
+'''
+Created on 18 Oct 2026
+This module contains the class AirfoilRegistry. Each airfoil file is parsed
+only once: its coordinates and its upper/lower split (the 4 columns of
+'FCMacro_writer.read_airfoil') are saved as .npy files in a '__airfoils__'
+folder next to the airfoil, named after the hash of its content. Later
+requests, from this process or from any worker of an EvaluationPool, open the
+.npy memory-mapped, so the evaluations do not read the text file any more.
+The module also writes the AVL airfoil 'crm.txt' from 'CRM_airfoil.icms',
+after checking the 258 points of the CRM section once. It goes in the
+'__airfoils__' folder of the registry, never in the inputs folder, which is
+only read.
+'''
+
+import os
+import tempfile
+
+import numpy as np
+
+from result_cache import file_hash
+
+
+CRM_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'CRM_airfoil.icms')
+CRM_POINTS = 258
+
+
+def read_icms(path):
+    """
+    Reads an airfoil in the .icms format: name, 'n_sections n_points n_dims',
+    column titles and the points.
+
+    Returns:
+    name :              name of the section.
+    coords :            n_points x 2 array (x/c, z/c).
+    """
+    with open(path) as f:
+        name = f.readline().strip()
+        n_sections, n_points, n_dims = (int(v) for v in f.readline().split())
+        f.readline()
+        coords = np.loadtxt(f)
+    if n_sections != 1 or coords.shape != (n_points, n_dims):
+        raise ValueError('{}: expected {} points of {} coordinates, found {}'.format(
+            path, n_points, n_dims, coords.shape))
+    return name, coords
+
+
+def read_coordinates(path):
+    """
+    Coordinates of an airfoil file: .icms or plain columns (x/c, z/c).
+    """
+    if path.endswith('.icms'):
+        return read_icms(path)[1]
+    return np.loadtxt(path)
+
+
+def validate_section(coords, n_points=CRM_POINTS):
+    """
+    Checks a section given from the upper trailing edge to the lower trailing
+    edge: number of points, x/c within [0, 1], leading edge at x/c = 0, x/c
+    decreasing on the upper side and increasing on the lower side. Raises a
+    ValueError.
+    """
+    x = coords[:, 0]
+    if n_points is not None and len(coords) != n_points:
+        raise ValueError('the section has {} points instead of {}'.format(
+            len(coords), n_points))
+    if x.min() < 0 or x.max() > 1:
+        raise ValueError('x/c out of [0, 1]')
+    le = int(np.argmin(x))
+    if x[le] != 0:
+        raise ValueError('the leading edge is not at x/c = 0')
+    if np.any(np.diff(x[:le+1]) > 0) or np.any(np.diff(x[le:]) < 0):
+        raise ValueError('x/c is not monotonic on the upper or lower side')
+
+
+def split_surfaces(coords):
+    """
+    Splits the coordinates (upper trailing edge -> leading edge -> lower
+    trailing edge) in the 4 columns of 'FCMacro_writer.read_airfoil': x and
+    z of the upper side, x and z of the lower side, both from the leading
+    edge. A leading edge point given twice (as in the CRM file) is taken once.
+    """
+    length = len(coords)
+    if length % 2 == 0 and np.array_equal(coords[length//2 - 1], coords[length//2]):
+        coords = np.delete(coords, length//2, axis=0)
+        length -= 1
+    upper = coords[0:(length//2+1)][::-1]
+    lower = coords[(length//2):length]
+    return np.concatenate((upper, lower), axis=1)
+
+
+def _save(path, array):
+    '''
+    Writes the .npy in a temporary file first, so a worker never opens a
+    file still being written.
+    '''
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npy')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+class AirfoilRegistry:
+
+    def __init__(self, cache_dir=None):
+        '''
+        Args:
+        cache_dir :         folder of the .npy files. By default a
+                            '__airfoils__' folder next to each airfoil.
+        '''
+        self.cache_dir = cache_dir
+        self._arrays = {}
+        self._validated = set()
+        self.n_parsed = 0
+
+    def _folder(self, path):
+        folder = self.cache_dir
+        if folder is None:
+            folder = os.path.join(os.path.dirname(os.path.abspath(path)), '__airfoils__')
+        if not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def _npy_path(self, path, kind):
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self._folder(path),
+                            '{}-{}-{}.npy'.format(name, file_hash(path)[:16], kind))
+
+    def _get(self, path, kind):
+        path = os.path.abspath(path)
+        npy = self._npy_path(path, kind)
+        if npy not in self._arrays:
+            if not os.path.exists(npy):
+                coords = read_coordinates(path)
+                self.n_parsed += 1
+                _save(npy, coords if kind == 'coords' else split_surfaces(coords))
+            self._arrays[npy] = np.load(npy, mmap_mode='r')
+        return self._arrays[npy]
+
+    def coordinates(self, path):
+        """
+        Coordinates of the airfoil, n_points x 2 read-only array.
+        """
+        return self._get(path, 'coords')
+
+    def surfaces(self, path):
+        """
+        Upper and lower sides of the airfoil, the 4 columns of
+        'FCMacro_writer.read_airfoil' (read-only array).
+        """
+        return self._get(path, 'surfaces')
+
+    def write_avl_airfoil(self, out_path, source=CRM_FILE):
+        """
+        Writes the airfoil for AVL (name and coordinates, the file given by
+        AFILE in 'avl_writer') from an .icms file. The CRM section is checked
+        before its first use.
+        """
+        name = read_icms(source)[0]
+        coords = self.coordinates(source)
+        if source not in self._validated:
+            validate_section(coords, CRM_POINTS if source == CRM_FILE else None)
+            self._validated.add(source)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_path)))
+        with os.fdopen(fd, 'w') as f:
+            np.savetxt(f, coords, fmt='%.5f', header=name, comments='')
+        os.replace(tmp, out_path)
+
+    def avl_airfoil(self, source=CRM_FILE):
+        """
+        Path of the 'crm.txt' written from 'source' in the registry folder
+        (a subfolder named after the hash of 'source', so the file keeps the
+        name AVL expects). It is written on the first call.
+        """
+        name = os.path.splitext(os.path.basename(source))[0]
+        folder = os.path.join(self._folder(source),
+                              '{}-{}-avl'.format(name, file_hash(source)[:16]))
+        path = os.path.join(folder, 'crm.txt')
+        if not os.path.exists(path):
+            os.makedirs(folder, exist_ok=True)
+            self.write_avl_airfoil(path, source)
+        return path
+
+
+'''
+Registry of the process, used by 'FCMacro_writer' and 'evaluation'.
+'''
+registry = AirfoilRegistry()
+
+
+def load_airfoil(path):
+    """
+    Upper and lower sides of the airfoil in 'path' from the registry.
+    """
+    return registry.surfaces(path)
+
+
+def avl_airfoil(inputs_dir, source=CRM_FILE):
+    """
+    Gives back the path of the AVL airfoil 'crm.txt': the one of 'inputs_dir'
+    if there is one, otherwise the one written from 'source' by the registry.
+    Nothing is written in 'inputs_dir'.
+    """
+    path = os.path.join(inputs_dir, 'crm.txt')
+    if os.path.exists(path):
+        return path
+    return registry.avl_airfoil(source)
@@ -10,6 +10,7 @@ import numpy as np
 #import re
 #from numpy import loadtxt
 
+from avl_parser import AvlResult
 from isa_atmosphere import IsaAtmosphere
 
 
@@ -35,19 +36,7 @@ def get_efficiency(results, output_dir):
     path_res = os.path.join(output_dir, results)
     path_eff = os.path.join(output_dir,'efficiency.txt')
     
-    f = open(path_res)
-    content = f.readlines()
-    content = [x.split() for x in content]
-     
-    Eff = []
-    file_path = os.path.join(output_dir, results)
-    f = open(file_path)
-    for i, line in enumerate(f):
-        if line.startswith('  Forces referred to Ssurf, Cave about'):
-            Eff = content[i+1]
-            break
-    CL = float(Eff[2])
-    CD = float(Eff[5])       
+    CL, CD = AvlResult.from_file(path_res).coefficients()
     eff = open(path_eff,'w')
     eff.write('{:6.5f}  {:6.5f}\n'.format(CL/2, CD/2))
     eff.close()
@@ -69,20 +58,71 @@ def get_efficiency(results, output_dir):
 #     return match.group(1)
 
 
-def get_pressure(results, output_dir, Mach, z):
+def bay_starts(y, n_bays=4, bay_edges=None):
     """
-    This function reads the data from a lattice-beta output file and
-    puts them in a numpy array
+    This function gives the index of the first strip of each load bay.
     
     Args:
-    filename(string):    the name of the file to read
+    y :                  spanwise position of the strips, from root to tip.
+    n_bays :             number of bays. The strips are shared evenly.
+    bay_edges :          spanwise positions where the bays begin (the first
+                         one is the root). If given, 'n_bays' is not used.
     
+    Returns:
+    starts :             array of indices, one per bay.
+    """
+    if bay_edges is None:
+        if n_bays > len(y):
+            raise ValueError('{} bays for {} strips'.format(n_bays, len(y)))
+        starts = np.linspace(0, len(y), n_bays + 1)[:-1]
+        return np.round(starts).astype(int)
+    starts = np.searchsorted(y, bay_edges)
+    starts[0] = 0
+    if np.any(np.diff(starts) <= 0) or starts[-1] >= len(y):
+        raise ValueError('every bay must contain at least one strip')
+    return starts
+
+
+def integrate_strips(strips, n_bays=4, bay_edges=None):
+    """
+    This function integrates the spanwise load of the strips over the load
+    bays: each bay gets the sum of c*cl*dy of its strips divided by twice its
+    area. It works for any number of strips and bays.
+    
+    Args:
+    strips :             record array of the strips of one surface (see
+                         'avl_parser'), ordered from root to tip.
+    n_bays, bay_edges :  see 'bay_starts'.
     
     Returns:
-    ndarray:             all the data in a single numpy array structure
+    Cl :                 local lift coefficient of each bay.
+    """
+    y = np.abs(strips.Y)
+    dy = np.diff(y, prepend=0.0)
+    starts = bay_starts(y, n_bays, bay_edges)
+    As = np.add.reduceat(strips.area, starts)
+    Clocal = np.add.reduceat(strips.ccl * dy, starts)
+    return Clocal / (2*As)
+
+
+def get_pressure(results, output_dir, Mach, z, n_bays=4, bay_edges=None):
     """
+    This function reads the strip loads from the AVL output and gives back the
+    mean pressure on each load bay, which is written in 'pressures.txt'.
     
-    path_res = os.path.join(output_dir, results)
+    Args:
+    results :            the name of the file to read, or its AvlResult.
+    output_dir :         the directory of the file and of 'pressures.txt'.
+                         None with an AvlResult: nothing is written.
+    Mach :               Mach number.
+    z :                  flight heigth [m].
+    n_bays, bay_edges :  load bays, see 'bay_starts'.
+    
+    Returns:
+    ndarray:             the pressure of each bay [MPa].
+    """
+    if not isinstance(results, AvlResult):
+        results = AvlResult.from_file(os.path.join(output_dir, results))
     
     flight_conditions = IsaAtmosphere(z)
     rho = flight_conditions.compute_density()
@@ -90,32 +130,11 @@ def get_pressure(results, output_dir, Mach, z):
     p_dyn = 0.5 * rho * (Mach*c)**2
     #b = np.sqrt(1-Mach**2)
     
-    
-    y = np.zeros((40))
-    dy = np.zeros((40))
-    A = np.zeros((40))
-    ccl = np.zeros((40))
-    file = open(path_res)
-    lines = file.readlines()
-    for j in range(40):
-        riga = lines[j+20]
-        l = riga.split('  ')
-        y[j]= l[3]
-        A[j]= l[5]
-        ccl[j] = l[6]
-    
-    dy[0] = y[0]
-    for k in range(39):
-        dy[k+1] = y[k+1]-y[k]
-    As = np.array([sum(A[0:10]), sum(A[11:20]), sum(A[21:30]), sum(A[31:40])])
-    ccldy = ccl * dy
-    Clocal = np.array([sum(ccldy[0:10]), sum(ccldy[11:20]), sum(ccldy[21:30]), sum(ccldy[31:40])])
-    Cl = Clocal / (2*As)
+    Cl = integrate_strips(results.wing_strips(), n_bays, bay_edges)
     p = (Cl * p_dyn)/10e5
     p = np.around(p,4)
-    #print(np.around(p,4))
-    pres = open('OS\\pressures.txt', 'w')
-    pres.write('{:5.4f} {:5.4f} {:5.4f} {:5.4f}'.format(p[0], p[1], p[2], p[3]))
-    pres.close()
-
-
+    if output_dir is not None:
+        pres = open(os.path.join(output_dir, 'pressures.txt'), 'w')
+        pres.write(' '.join('{:5.4f}'.format(value) for value in p))
+        pres.close()
+    return p
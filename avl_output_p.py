@@ -8,6 +8,7 @@ This is the module that reads the results from file and produces the two output
 import os
 import numpy as np
 
+from avl_parser import AvlResult
 from isa_atmosphere import IsaAtmosphere
 
 
@@ -15,6 +16,16 @@ from isa_atmosphere import IsaAtmosphere
 # out_dir = os.path.join(os.getcwd(), 'OS')
 # print(out_dir)
 
+def load_results(results, output_dir):
+    '''
+    Gives back the AvlResult of 'results', which is either an AvlResult
+    already built or the name of the AVL file in 'output_dir'.
+    '''
+    if isinstance(results, AvlResult):
+        return results
+    return AvlResult.from_file(os.path.join(output_dir, results))
+
+
 def get_efficiency(results, output_dir):
     '''
     This function reads the results.txt file generated by AVL and gives back
@@ -22,32 +33,27 @@ def get_efficiency(results, output_dir):
 
     Parameters
     ----------
-    results:         is the results.txt generated by AVL.
+    results:         is the results.txt generated by AVL, or its AvlResult.
     output_dir:      is the output directory to save the files containing the 
-                     pressure and the efficiency.
+                     pressure and the efficiency. If None and 'results' is an
+                     AvlResult, no file is written.
 
     Returns
     -------
     efficiency.txt :  is the file containing just the CD value.
+    CL, CD :          the lift and drag coefficients of the semi-wing.
     '''
     
-    file_path = os.path.join(output_dir, results)
-    f = open(file_path)
-    content = f.readlines()
-    content = [x.split() for x in content]
-    
-    #Eff = []
-    file_path = os.path.join(output_dir, results)
-    f = open(file_path)
-    for i, line in enumerate(f):
-        if line.startswith('  Forces referred to Ssurf, Cave'):
-            Eff = content[i+1]
-            break
-    CL = float(Eff[2])
-    CD = float(Eff[5])       
-    eff = open(os.path.join(output_dir,'efficiency.txt'),'w')
-    eff.write('{:6.5f}  {:6.5f}\n'.format(CL/2, CD/2))
-    eff.close()
+    '''
+    The coefficients are the ones of the first surface referred to Ssurf and
+    Cave.
+    '''
+    CL, CD = load_results(results, output_dir).coefficients()
+    if output_dir is not None:
+        eff = open(os.path.join(output_dir,'efficiency.txt'),'w')
+        eff.write('{:6.5f}  {:6.5f}\n'.format(CL/2, CD/2))
+        eff.close()
+    return CL/2, CD/2
 
 
 def get_pressure(results_file, output_dir, Mach, z):
@@ -60,9 +66,11 @@ def get_pressure(results_file, output_dir, Mach, z):
 
     Parameters
     ----------
-    results_file:    in the input file containing the pressuresgenerated by AVL.
+    results_file:    in the input file containing the pressuresgenerated by AVL,
+                     or its AvlResult.
     output_dir:      is the output directory to save the files containing the 
-                     pressure and the efficiency.
+                     pressure and the efficiency. If None and 'results_file' is
+                     an AvlResult, no file is written.
     Mach:            is the Mach number used for the compressibility correction.    
     z :              is the flight heigth in [m].
 
@@ -70,6 +78,7 @@ def get_pressure(results_file, output_dir, Mach, z):
     -------
     pressures.csv :  is the file containing the pressure values and the 
                      corresponding points. It is in csv format.
+    pressure :       n_points x 4 array with the same columns as the file.
     '''
     
     '''
@@ -83,29 +92,25 @@ def get_pressure(results_file, output_dir, Mach, z):
     b = np.sqrt(1-Mach**2)
 
 
-    file_path = os.path.join(output_dir, results_file)
-    f = open(file_path)
-    content = f.readlines()
-    content = [x.split() for x in content]
+    '''
+    Only the elements of the first surface are used: the second one is its
+    mirror image (YDUPLICATE).
+    '''
+    elements = load_results(results_file, output_dir).wing_elements()
 
-    DCp0 = []
-    f = open(file_path)
-    for i, line in enumerate(f):
-        if line.startswith('    I        X           Y           '):
-            for j in range(20):
-                DCp0.append([float(val) for val in content[i+j+1]])
-        elif line.startswith('  Surface # 2     wing (YDUP)'):
-            break    
-    
-    vector = np.array(DCp0)
-    vector[:,6] *= (p_dyn * 1e-6)
-    vector[:,6] *= 1/b
-    vector[:,1] *= 1000
-    vector[:,2] *= 1000
-       
-    file = open(os.path.join(output_dir, 'pressure.csv'),'w')
-    for k in range(len(vector)):
-        file.write('{:.2f},{:.2f},{:.2f},{:5.4f}\n'.format(vector[k,1], vector[k,2], vector[k,3], vector[k,6]))
-    file.close()    
+    vector = np.column_stack((elements.X * 1000, elements.Y * 1000,
+                              elements.Z, elements.DCp * (p_dyn * 1e-6) / b))
     
+    if output_dir is not None:
+        write_pressure(vector, output_dir)
+    return vector
+
+
+def write_pressure(vector, output_dir):
+    '''
+    Writes the pressure given by 'get_pressure' in 'pressure.csv', the file
+    mapped by HyperMesh on the skin (*BCM).
+    '''
     'In the file I write four columns. Which are respectively: x, y, z and DCp.'
+    np.savetxt(os.path.join(output_dir, 'pressure.csv'), vector,
+               fmt=['%.2f', '%.2f', '%.2f', '%5.4f'], delimiter=',')
@@ -0,0 +1,221 @@
+'''
+Created on 18 Oct 2026
+This module reads the output files written by AVL with the 'fe' (element
+forces) and 'fs' (strip forces) commands. The file is read once, line by
+line, and the tables are converted into NumPy record arrays:
+    surfaces :  one row per surface with the force coefficients.
+    strips :    one row per strip (position, chord, area, c*cl...).
+    elements :  one row per vortex element (position, DX, slope, DCp).
+The numeric rows of the element tables are not split in Python: they are
+collected as text and converted by NumPy in one call at the end.
+The class AvlResult keeps these arrays together for the rest of the chain.
+'''
+
+import re
+
+import numpy as np
+
+
+'''
+Pairs 'name = value' of the AVL output, e.g. 'CLsurf  =   0.50000'.
+'''
+_key_value = re.compile(r'([A-Za-z][A-Za-z0-9 ./_]*?)\s*=\s*([-+]?[0-9][0-9.]*(?:[Ee][-+]?[0-9]+)?|[-+]?\.[0-9]+)')
+
+'''
+Names used in the AVL output for the strip quantities and the corresponding
+fields of the 'strips' array. 'cnc' (chord times normal force coefficient)
+is the c*cl of the 'fe' file.
+'''
+_strip_keys = {'Xle': 'X', 'Yle': 'Y', 'Zle': 'Z', 'Ave. Chord': 'chord',
+               'Chord': 'chord', 'Strip Width': 'width', 'Strip Area': 'area',
+               'Area': 'area', 'cnc': 'ccl', 'c_cl': 'ccl', 'cl': 'cl',
+               'cd': 'cd'}
+
+_surface_fields = ['surface', 'CL', 'CD', 'CL_ref', 'CD_ref', 'Ssurf', 'Cave']
+_strip_fields = ['surface', 'j', 'X', 'Y', 'Z', 'chord', 'width', 'area',
+                 'ccl', 'cl', 'cd']
+_element_fields = ['surface', 'strip', 'I', 'X', 'Y', 'Z', 'DX', 'slope', 'DCp']
+
+
+def _dtype(fields, int_fields=('surface', 'j', 'strip', 'I')):
+    return [(name, int if name in int_fields else float) for name in fields]
+
+
+def _record_array(rows, fields):
+    array = np.recarray(len(rows), dtype=_dtype(fields))
+    for name in fields:
+        array[name] = [row.get(name, np.nan) for row in rows] if rows else []
+    return array
+
+
+def parse_results(file_path):
+    """
+    This function reads an AVL output file ('fe' or 'fs') in a single pass.
+
+    Args:
+    file_path :         path of the file written by AVL.
+
+    Returns:
+    data :              dictionary with the record arrays 'surfaces',
+                        'strips' and 'elements', the list 'names' of the
+                        surfaces and the dictionary 'totals' of the
+                        configuration (CLtot, CDtot...).
+    """
+    totals = {}
+    names = []
+    surfaces = []
+    strips = []
+    element_rows = []
+    element_strips = []
+    element_counts = []
+    surface = None
+    strip = None
+    reference = None
+    mode = None
+    columns = None
+
+    with open(file_path) as f:
+        for line in f:
+            stripped = line.strip()
+            if mode == 'elements':
+                if stripped and stripped[0].isdigit():
+                    element_rows.append(line)
+                    element_counts[-1] += 1
+                    continue
+                mode = None
+            elif mode == 'strip_table':
+                if stripped and stripped[0].isdigit():
+                    values = stripped.split()
+                    row = {'surface': surface['surface']}
+                    for name, value in zip(columns, values):
+                        if name == 'j':
+                            row['j'] = int(value)
+                        elif name in _strip_keys:
+                            row[_strip_keys[name]] = float(value)
+                    if 'width' not in row and row.get('chord'):
+                        row['width'] = row['area'] / row['chord']
+                    strips.append(row)
+                    continue
+                if stripped.startswith('j '):
+                    columns = stripped.replace('c cl', 'c_cl').split()
+                    continue
+                mode = None
+
+            if not stripped:
+                continue
+            if stripped.startswith('Surface #'):
+                number, _, name = stripped[len('Surface #'):].strip().partition(' ')
+                surface = {'surface': int(number)}
+                surfaces.append(surface)
+                names.append(name.strip())
+                strip = None
+                reference = None
+            elif stripped.startswith('Forces referred to Ssurf'):
+                reference = 'surface'
+            elif stripped.startswith('Forces referred to Sref'):
+                reference = 'reference'
+            elif stripped.startswith('Strip Forces referred to'):
+                mode = 'strip_table'
+                columns = None
+            elif stripped.startswith('Strip #'):
+                number = int(stripped[len('Strip #'):].split()[0])
+                strip = {'surface': surface['surface'], 'j': number}
+                strips.append(strip)
+            elif stripped.startswith('I ') and stripped.split()[:2] == ['I', 'X']:
+                mode = 'elements'
+                element_strips.append(strip['j'] if strip is not None else 0)
+                element_counts.append(0)
+            elif '=' in stripped:
+                pairs = _key_value.findall(stripped)
+                if strip is not None:
+                    for key, value in pairs:
+                        key = key.strip()
+                        if key in _strip_keys:
+                            strip[_strip_keys[key]] = float(value)
+                elif surface is not None:
+                    for key, value in pairs:
+                        key = key.strip()
+                        if key == 'CLsurf':
+                            surface['CL' if reference == 'surface' else 'CL_ref'] = float(value)
+                        elif key == 'CDsurf':
+                            surface['CD' if reference == 'surface' else 'CD_ref'] = float(value)
+                        elif key.endswith('Ssurf'):
+                            surface['Ssurf'] = float(value)
+                        elif key.endswith('Cave'):
+                            surface['Cave'] = float(value)
+                else:
+                    for key, value in pairs:
+                        totals[key.strip()] = float(value)
+
+    '''
+    The element rows are converted in one call. Each row is I, X, Y, Z, DX,
+    Slope, dCp.
+    '''
+    values = np.fromstring(''.join(element_rows), sep=' ').reshape(-1, 7)
+    element_strip = np.repeat(np.array(element_strips, dtype=int),
+                              element_counts)
+    strips = _record_array(strips, _strip_fields)
+    strip_surface = np.zeros(max(strips.j.max(initial=0), element_strip.max(initial=0)) + 1,
+                             dtype=int)
+    strip_surface[strips.j] = strips.surface
+    elements = np.recarray(len(values), dtype=_dtype(_element_fields))
+    elements.surface = strip_surface[element_strip]
+    elements.strip = element_strip
+    elements.I = values[:, 0]
+    elements.X = values[:, 1]
+    elements.Y = values[:, 2]
+    elements.Z = values[:, 3]
+    elements.DX = values[:, 4]
+    elements.slope = values[:, 5]
+    elements.DCp = values[:, 6]
+
+    return {'surfaces': _record_array(surfaces, _surface_fields),
+            'strips': strips,
+            'elements': elements,
+            'names': names,
+            'totals': totals}
+
+
+class AvlResult:
+
+    def __init__(self, surfaces, strips, elements, names=(), totals=None):
+        '''
+        The class AvlResult holds the results of one AVL solution in memory:
+        the record arrays 'surfaces', 'strips' (X, Y, Z, chord, width, area,
+        ccl, cl, cd) and 'elements' (X, Y, Z, DX, slope, DCp) given by
+        'parse_results'. It is built once per solution and passed to
+        'get_efficiency', 'get_pressure' and to the load mapping, so the
+        results are not written and read again as text.
+        '''
+        self.surfaces = surfaces
+        self.strips = strips
+        self.elements = elements
+        self.names = list(names)
+        self.totals = totals if totals is not None else {}
+
+    @classmethod
+    def from_file(cls, file_path):
+        """
+        Reads the file written by AVL ('fe' or 'fs').
+        """
+        return cls(**parse_results(file_path))
+
+    @property
+    def surface(self):
+        """
+        Number of the first surface, i.e. the wing without its YDUPLICATE
+        image.
+        """
+        return self.surfaces.surface[0]
+
+    def wing_strips(self):
+        return self.strips[self.strips.surface == self.surface]
+
+    def wing_elements(self):
+        return self.elements[self.elements.surface == self.surface]
+
+    def coefficients(self):
+        """
+        Gives back CL and CD of the first surface, referred to Ssurf and Cave.
+        """
+        return float(self.surfaces.CL[0]), float(self.surfaces.CD[0])
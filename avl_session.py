@@ -0,0 +1,309 @@
+'''
+Created on 18 Oct 2026
+This module keeps AVL running between evaluations. The class AvlSession
+drives one avl.exe process over stdin/stdout: the geometry is loaded with
+'load', then any number of operating points (CL targets, Mach numbers) are
+run in the OPER menu, each one writing its own 'fe' file. The class AvlPool
+holds several sessions, each in its own folder, and hands them out to the
+callers.
+A job is finished when all its output files exist and AVL is back at the
+top level prompt. If AVL does not get there before the timeout, or the
+process dies, the session is restarted and the job repeated.
+Any executable speaking the same dialogue can replace avl.exe (avl_exe
+argument), e.g. a script replaying recorded AVL output.
+'''
+
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import PIPE, STDOUT
+
+import tool_paths
+from airfoil_registry import avl_airfoil
+
+
+'''
+The prompt printed by AVL when it waits for a command at the top level.
+'''
+TOP_PROMPT = b'AVL   c>'
+
+
+class AvlError(RuntimeError):
+    pass
+
+
+class AvlTimeout(AvlError):
+    pass
+
+
+def case_commands(cases, output_files):
+    """
+    Writes the commands of the OPER menu for a list of operating points.
+
+    Args:
+    cases :             list of dictionaries with the keys 'CL' and,
+                        optionally, 'Mach'.
+    output_files :      names of the 'fe' files, one per case.
+
+    Returns:
+    commands :          the commands as a single string. The last blank line
+                        brings AVL back to the top level.
+    """
+    lines = ['oper']
+    for case, output_file in zip(cases, output_files):
+        if case.get('Mach') is not None:
+            lines += ['m', 'mn {}'.format(case['Mach']), '']
+        lines += ['a c {}'.format(case['CL']), 'x', 'fe ' + output_file]
+    lines += ['', '']
+    return '\n'.join(lines)
+
+
+class AvlSession:
+
+    def __init__(self, work_dir, avl_exe=None, timeout=60., retries=1):
+        '''
+        The class AvlSession keeps one AVL process alive in 'work_dir'. The
+        airfoil files referenced by the geometry (AFILE) must be in
+        'work_dir'.
+
+        Args:
+        work_dir :          working directory of AVL.
+        avl_exe :           the executable. Default is 'tool_paths.avl_exe'.
+        timeout :           time [s] after which a job is considered lost.
+        retries :           how many times a job is repeated after a restart.
+        '''
+        self.work_dir = work_dir
+        self.avl_exe = avl_exe if avl_exe is not None else tool_paths.avl_exe
+        self.timeout = timeout
+        self.retries = retries
+        self.process = None
+        self.n_jobs = 0
+        self.n_restarts = 0
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+
+    def _read(self, stream):
+        '''
+        Runs in a thread and copies the output of AVL in the buffer.
+        '''
+        while True:
+            data = stream.read1(4096)
+            if not data:
+                break
+            with self._cond:
+                self._buffer += data
+                self._cond.notify_all()
+        with self._cond:
+            self._cond.notify_all()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """
+        Launches AVL and waits for the first prompt.
+        """
+        self._buffer = bytearray()
+        self.process = subprocess.Popen([self.avl_exe], stdin=PIPE,
+                                        stdout=PIPE, stderr=STDOUT,
+                                        cwd=self.work_dir)
+        reader = threading.Thread(target=self._read,
+                                  args=(self.process.stdout,), daemon=True)
+        reader.start()
+        self._wait((), self.timeout)
+
+    def close(self):
+        """
+        Quits AVL. The process is killed if it does not stop by itself.
+        """
+        if not self.alive():
+            self.process = None
+            return
+        try:
+            self.process.stdin.write(b'\nquit\n')
+            self.process.stdin.flush()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def restart(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.n_restarts += 1
+        self.start()
+
+    def _wait(self, output_files, timeout):
+        deadline = time.monotonic() + timeout
+        paths = [os.path.join(self.work_dir, name) for name in output_files]
+        with self._cond:
+            while True:
+                if (self._buffer.rstrip().endswith(TOP_PROMPT) and
+                        all(os.path.exists(path) for path in paths)):
+                    return bytes(self._buffer)
+                if self.process.poll() is not None:
+                    raise AvlError('AVL exited with code {}'.format(
+                        self.process.returncode))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AvlTimeout('AVL did not answer in {} s'.format(timeout))
+                self._cond.wait(min(remaining, 0.1))
+
+    def run(self, commands, output_files=(), timeout=None):
+        """
+        Sends the commands to AVL and waits until the output files are
+        written and AVL is back at the top level.
+
+        Args:
+        commands :          the commands, starting and ending at the top level.
+        output_files :      files written by the commands in 'work_dir'. The
+                            old ones are removed first.
+        timeout :           overrides the timeout of the session.
+
+        Returns:
+        output :            what AVL printed during the job.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        for attempt in range(self.retries + 1):
+            try:
+                if not self.alive():
+                    self.restart()
+                for name in output_files:
+                    path = os.path.join(self.work_dir, name)
+                    if os.path.exists(path):
+                        os.remove(path)
+                with self._cond:
+                    self._buffer = bytearray()
+                self.process.stdin.write(commands.encode() + b'\n')
+                self.process.stdin.flush()
+                output = self._wait(output_files, timeout)
+                self.n_jobs += 1
+                return output.decode(errors='replace')
+            except (AvlError, OSError):
+                if attempt == self.retries:
+                    raise
+                '''
+                The process is only stopped here: it is started again at the
+                top of the next attempt, so a restart that fails is retried
+                like a failed job.
+                '''
+                if self.process is not None:
+                    self.process.kill()
+                    self.process.wait()
+
+    def solve(self, geometry_file, cases, out_dir=None, output_files=None):
+        """
+        Loads a geometry and runs all the operating points in one go.
+
+        Args:
+        geometry_file :     the *.avl file. It is copied in 'work_dir' if it is
+                            somewhere else.
+        cases :             list of dictionaries with the keys 'CL' and,
+                            optionally, 'Mach'.
+        out_dir :           where the 'fe' files are moved at the end. Default
+                            is 'work_dir'.
+        output_files :      names of the 'fe' files. Default 'results_<i>.txt'.
+
+        Returns:
+        paths :             the paths of the 'fe' files, one per case.
+        """
+        if output_files is None:
+            output_files = ['results_{}.txt'.format(i) for i in range(len(cases))]
+        name = os.path.basename(geometry_file)
+        local = os.path.join(self.work_dir, name)
+        if os.path.abspath(geometry_file) != os.path.abspath(local):
+            shutil.copy(geometry_file, local)
+        commands = 'load {}\n'.format(name) + case_commands(cases, output_files)
+        self.run(commands, output_files)
+
+        if out_dir is None or os.path.abspath(out_dir) == os.path.abspath(self.work_dir):
+            return [os.path.join(self.work_dir, f) for f in output_files]
+        paths = []
+        for output_file in output_files:
+            path = os.path.join(out_dir, output_file)
+            shutil.move(os.path.join(self.work_dir, output_file), path)
+            paths.append(path)
+        return paths
+
+
+class AvlPool:
+
+    def __init__(self, n_sessions=1, inputs=(), base_dir=None, **options):
+        '''
+        The class AvlPool starts 'n_sessions' AVL sessions, each one in its
+        own folder inside 'base_dir' (a temporary folder by default). The
+        files in 'inputs' (e.g. 'Inputs/crm.txt') are copied in every folder.
+        The keyword 'options' are passed to AvlSession.
+        The sessions are started lazily, on their first job.
+        '''
+        self.base_dir = tempfile.mkdtemp(prefix='avl_', dir=base_dir)
+        self.sessions = []
+        self._idle = queue.Queue()
+        for i in range(n_sessions):
+            work_dir = os.path.join(self.base_dir, 'session_{}'.format(i))
+            os.makedirs(work_dir)
+            for path in inputs:
+                shutil.copy(path, work_dir)
+            session = AvlSession(work_dir, **options)
+            self.sessions.append(session)
+            self._idle.put(session)
+
+    def solve(self, geometry_file, cases, out_dir, output_files=None):
+        """
+        Runs 'AvlSession.solve' on the first free session. It can be called
+        from several threads at the same time.
+        """
+        session = self._idle.get()
+        try:
+            return session.solve(geometry_file, cases, out_dir, output_files)
+        finally:
+            self._idle.put(session)
+
+    def solve_many(self, jobs):
+        """
+        Runs a list of jobs (geometry_file, cases, out_dir) on all the
+        sessions and returns the paths in the same order.
+        """
+        with ThreadPoolExecutor(max_workers=len(self.sessions)) as executor:
+            futures = [executor.submit(self.solve, *job) for job in jobs]
+            return [future.result() for future in futures]
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+'''
+One pool per process, shared by the evaluations run in that process (see
+'evaluation.py', option 'persistent_avl').
+'''
+_shared_pool = None
+
+
+def shared_pool(inputs_dir, n_sessions=1):
+    """
+    Gives back the AvlPool of the current process, creating it on the first
+    call. 'crm.txt' is taken from 'inputs_dir' (see
+    'airfoil_registry.avl_airfoil').
+    """
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = AvlPool(n_sessions, inputs=[avl_airfoil(inputs_dir)])
+        atexit.register(_shared_pool.close)
+    return _shared_pool
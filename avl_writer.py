@@ -9,7 +9,7 @@ import os
 
 from ref_values import ref_values
 
-def avl_writer(des_vec, Mach, out_dir, output_file):
+def avl_writer(des_vec, Mach, out_dir, output_file, resolution=(20, 40)):
     """
     This function reads the airfoil coordinates from the airfoil_file, 
     splits them into upper and lower edge and returns a single array 
@@ -22,6 +22,8 @@ def avl_writer(des_vec, Mach, out_dir, output_file):
     Mach number :         Mach number.
     out_dir :             output directory.
     output_file :         name of the file produced in output.
+    resolution :          number of chordwise and spanwise vortices of the
+                          lattice (Nchordwise, Nspanwise).
       
     Returns:
     
@@ -44,7 +46,7 @@ def avl_writer(des_vec, Mach, out_dir, output_file):
     file_avl.write('SURFACE\n')
     file_avl.write('wing\n')
     file_avl.write('#Nchordwise  Cspace   Nspanwise   Sspace\n')
-    file_avl.write(' 20 1.0 40 3.0\n')
+    file_avl.write(' {} 1.0 {} 3.0\n'.format(*resolution))
     file_avl.write('YDUPLICATE\n')
     file_avl.write(' 0.0\n')
     file_avl.write('ANGLE\n')
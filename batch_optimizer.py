@@ -0,0 +1,164 @@
+'''
+Created on 18 Oct 2026
+This module contains the class AsyncBatchOptimizer, a Bayesian optimisation
+loop which keeps all the workers of an EvaluationPool busy. q designs are
+always being evaluated; as soon as one finishes (in any order) its value is
+added to the Gaussian process of 'surrogate.py' and a new design is sent.
+The designs still running are given a fake value equal to the best one
+found ("constant liar"), so the new proposal moves away from them.
+The proposals are the maximum of the expected improvement over random
+candidates within the bounds of the design vector which satisfy the planform
+constraints (see 'planform.feasible').
+'''
+
+import copy
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+from scipy.stats import norm
+
+from planform import feasible
+from surrogate import SurrogateModel
+
+
+'''
+Latin hypercubes drawn at most to find the feasible points of a sample.
+'''
+MAX_DRAWS = 100
+
+
+def expected_improvement(mean, std, best):
+    """
+    Expected improvement below 'best' of a Gaussian prediction.
+    """
+    std = np.maximum(std, 1e-12)
+    u = (best - mean) / std
+    return std * (u * norm.cdf(u) + norm.pdf(u))
+
+
+def latin_hypercube(n, lower, upper, rng):
+    """
+    n points in the box [lower, upper], one in each of the n slices of every
+    component.
+    """
+    dim = len(lower)
+    slices = (np.argsort(rng.random((n, dim)), axis=0) + rng.random((n, dim))) / n
+    return lower + slices * (upper - lower)
+
+
+class AsyncBatchOptimizer:
+
+    def __init__(self, pool, lower, upper, q=4, objective=None,
+                 area_bounds=None, ar_bounds=None, n_candidates=5000, seed=None,
+                 **options):
+        '''
+        Args:
+        pool :              an EvaluationPool. 'options' are passed to each
+                            evaluation.
+        lower, upper :      bounds of the 7 components of the design vector.
+        q :                 number of evaluations running at the same time
+                            (usually the number of workers of the pool).
+        objective :         function objective(CD, mass) to minimise. Default
+                            is the drag coefficient.
+        area_bounds :       (S_min, S_max) of the area given by 'ref_values'
+                            [m2], see 'planform.feasible'.
+        ar_bounds :         bounds of the aspect ratio.
+        n_candidates :      random candidates scored at each proposal.
+        seed :              seed of the random generator.
+        '''
+        self.pool = pool
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.q = q
+        self.objective = objective if objective is not None else (lambda CD, mass: CD)
+        self.area_bounds = area_bounds
+        self.ar_bounds = ar_bounds
+        self.n_candidates = n_candidates
+        self.rng = np.random.default_rng(seed)
+        self.options = options
+        '''
+        The Gaussian process is built on the objective (first output).
+        '''
+        self.model = SurrogateModel(self.lower, self.upper)
+        self.history = []
+
+    def _sample(self, n):
+        '''
+        Up to n feasible points of Latin hypercubes. Fewer are given back if
+        the bounds leave little room after MAX_DRAWS hypercubes.
+        '''
+        points = np.zeros((0, len(self.lower)))
+        for draw in range(MAX_DRAWS):
+            X = latin_hypercube(n, self.lower, self.upper, self.rng)
+            points = np.vstack((points, X[feasible(X, self.area_bounds, self.ar_bounds)]))
+            if len(points) >= n:
+                break
+        if len(points) == 0:
+            raise ValueError('no feasible planform found in {} x {} points: check the '
+                             'bounds, area_bounds and ar_bounds'.format(MAX_DRAWS, n))
+        return points[:n]
+
+    def propose(self, pending):
+        """
+        Gives the next design to evaluate, knowing the designs still running.
+        """
+        values = self.model.Y[:, 0]
+        if len(values) < 2:
+            return self._sample(1)[0]
+        best = values.min()
+        model = self.model
+        if len(pending):
+            model = copy.deepcopy(self.model)
+            model.add(pending, best)
+            model.fit(retrain=False)
+        candidates = self._sample(self.n_candidates)
+        mean, std = model.predict(candidates)
+        ei = expected_improvement(mean[:, 0], std[:, 0], best)
+        return candidates[np.argmax(ei)]
+
+    def _submit(self, running, desvec):
+        running[self.pool.submit(desvec, **self.options)] = desvec
+
+    def run(self, n_evaluations, initial=None):
+        """
+        Runs the optimisation.
+
+        Args:
+        n_evaluations :     total number of evaluations.
+        initial :           designs evaluated first. By default a Latin
+                            hypercube of max(q, 8) points.
+
+        Returns:
+        best_desvec :       the best design vector found.
+        best_value :        its objective.
+        """
+        if initial is None:
+            initial = self._sample(max(self.q, 8))
+        queue = [np.asarray(x, dtype=float) for x in initial]
+        running = {}
+        submitted = 0
+        while queue and len(running) < self.q and submitted < n_evaluations:
+            self._submit(running, queue.pop(0))
+            submitted += 1
+
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                desvec = running.pop(future)
+                result = future.result()
+                if result.ok:
+                    value = self.objective(result.CD, result.mass)
+                    self.model.add(desvec, value)
+                    self.history.append((desvec, value))
+            while len(running) < self.q and submitted < n_evaluations:
+                if queue:
+                    desvec = queue.pop(0)
+                else:
+                    desvec = self.propose(np.array(list(running.values())))
+                self._submit(running, desvec)
+                submitted += 1
+
+        if not self.history:
+            raise RuntimeError('no evaluation completed')
+        best = min(range(len(self.history)), key=lambda k: self.history[k][1])
+        return self.history[best]
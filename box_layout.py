@@ -0,0 +1,106 @@
+'''
+Created on 18 Oct 2026
+This module contains the class BoxLayout, which describes the topology of the
+wing box: how many bays each panel (inner and outer) is divided into, and the
+chordwise position of the front and rear spars. The default layout is the
+original one: 2 bays per panel (5 sections) and the box between the 30% and
+80% points of the airfoil file.
+The geometry writers ('FCMacro_writer', 'iges_writer') build the surfaces in a
+fixed order (skin, spars, root and tip caps) and the manifest written with
+'box.iges' gives the id of every group of surfaces, so the HyperMesh macro of
+'tcl_writer_p' does not depend on the number of sections.
+'''
+
+import json
+import os
+
+import numpy as np
+
+
+MANIFEST_FILE = 'surfaces.json'
+
+
+class BoxLayout:
+
+    def __init__(self, bays=(2, 2), spars=None):
+        '''
+        Args:
+        bays :              number of bays of the inner and of the outer
+                            panel. The sections are evenly spaced in each
+                            panel.
+        spars :             (front, rear) x/c of the spars. None keeps the
+                            original split of the airfoil points (from the
+                            point at 30% of the file to the one at 80%).
+        '''
+        self.bays = tuple(int(n) for n in bays)
+        self.spars = None if spars is None else tuple(float(x) for x in spars)
+        if min(self.bays) < 1:
+            raise ValueError('each panel needs at least one bay')
+        if self.spars is not None and not 0 <= self.spars[0] < self.spars[1] <= 1:
+            raise ValueError('the spars must satisfy 0 <= front < rear <= 1')
+
+    @property
+    def n_sections(self):
+        return sum(self.bays) + 1
+
+    def stations(self, params):
+        """
+        Spanwise position of the sections [mm]: evenly spaced between root
+        and kink (params[5]) and between kink and tip (params[6]).
+        """
+        n_in, n_out = self.bays
+        inner = [0] + [params[5]*i/n_in for i in range(1, n_in)] + [params[5]]
+        outer = [((n_out - i)*params[5] + i*params[6])/n_out for i in range(1, n_out)]
+        return inner + outer + [params[6]]
+
+    def box_points(self, airfoil):
+        """
+        Part of the airfoil between the spars.
+
+        Args:
+        airfoil :           the 4 columns of 'FCMacro_writer.read_airfoil'.
+
+        Returns:
+        box :               array with the same 4 columns. With given spars
+                            the upper and lower sides are interpolated on the
+                            same x/c, starting and ending exactly at the spars.
+        """
+        length = len(airfoil)
+        if self.spars is None:
+            return airfoil[round(0.3*length)-1:round(0.8*length), :]
+        front, rear = self.spars
+        x = airfoil[:, 0]
+        x = np.concatenate(([front], x[(x > front) & (x < rear)], [rear]))
+        upper = np.interp(x, airfoil[:, 0], airfoil[:, 1])
+        lower = np.interp(x, airfoil[:, 2], airfoil[:, 3])
+        return np.column_stack((x, upper, x, lower))
+
+    def manifest(self):
+        """
+        Ids of the surfaces of 'box.iges' (1-based, in the order of the
+        file, which is the numbering given by HyperMesh on import).
+
+        Returns:
+        manifest :          dict with the lists 'skin_upper', 'skin_lower',
+                            'spars' and the ids 'root' and 'tip'.
+        """
+        n_bays = self.n_sections - 1
+        skin = list(range(1, 2*n_bays + 1))
+        spars = list(range(2*n_bays + 1, 4*n_bays + 1))
+        return dict(n_sections=self.n_sections, bays=list(self.bays),
+                    spars_xc=None if self.spars is None else list(self.spars),
+                    skin_upper=skin[0::2], skin_lower=skin[1::2], spars=spars,
+                    root=4*n_bays + 1, tip=4*n_bays + 2)
+
+
+def write_manifest(layout, out_dir):
+    with open(os.path.join(out_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(layout.manifest(), f, indent=1)
+
+
+def read_manifest(out_dir):
+    """
+    Manifest written with the geometry in 'out_dir'.
+    """
+    with open(os.path.join(out_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
@@ -0,0 +1,527 @@
+'''
+Created on 18 Oct 2026
+This module contains the evaluation engine of the optimisation. The chain of
+'main.py' (AVL, FreeCAD, HyperMesh, OptiStruct) is wrapped in the function
+'evaluate_design', which runs it inside a given working directory and gives
+back an EvaluationResult instead of leaving the values in text files.
+The class EvaluationPool runs several design vectors at the same time in a
+pool of processes. Each evaluation gets its own scratch folder, so the
+workers never share 'wing.avl', 'crm.txt', 'box.FCmacro' or 'hmbox.tcl'.
+The chain is a list of stages (STAGES), each declaring the components of
+the design vector, the options and the upstream stages it depends on. If a
+ResultCache is given, a stage first looks for its output files in the cache
+and its software is launched only when one of those inputs changed. If a
+MorphLibrary is given, the deck of a baseline mesh is morphed onto the new
+planform and the geometry, mesh and deck stages are skipped.
+'''
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from subprocess import PIPE, STDOUT
+
+import numpy as np
+
+import tool_paths
+from airfoil_registry import avl_airfoil, load_airfoil
+from avl_session import shared_pool
+from hm_session import shared_pool as shared_hm_pool
+from avl_writer import avl_writer
+from box_layout import MANIFEST_FILE, BoxLayout, read_manifest, write_manifest
+from FCMacro_writer import FCMacro_writer
+from iges_writer import write_box_iges
+from fem_patch import patch_vol_frac
+from load_mapping import map_pressure, pload4_cards
+from mesh_morph import MorphLibrary
+from tcl_writer_p import tcl_writer
+from avl_output_p import get_efficiency, get_pressure, write_pressure
+from avl_parser import AvlResult
+from read_mass import read_mass
+from result_cache import file_hash, tool_version
+
+
+class EvaluationResult:
+
+    def __init__(self, desvec, work_dir):
+        '''
+        EvaluationResult collects everything produced by one evaluation of the
+        design vector: the aerodynamic coefficients of the semi-wing, the
+        AVL solution (AvlResult), the pressure field sent to HyperMesh, the
+        mass from OptiStruct and the time spent in each stage [s].
+        '''
+        self.desvec = np.array(desvec, dtype=float)
+        self.work_dir = work_dir
+        self.CL = None
+        self.CD = None
+        self.aero = None
+        self.pressure = None
+        self.mass = None
+        self.timings = {}
+        self.cached = []
+        self.morph = None
+        self.error = None
+
+    @property
+    def ok(self):
+        """
+        True if the evaluation reached the end without errors.
+        """
+        return self.error is None
+
+    def __repr__(self):
+        return 'EvaluationResult(CL={}, CD={}, mass={}, error={})'.format(
+            self.CL, self.CD, self.mass, self.error is not None)
+
+
+def _copy_inputs(work_dir, inputs_dir):
+    '''
+    Copies in the working directory the input files which are not generated
+    by the writers. AVL looks for the airfoil 'crm.txt' in its own working
+    directory; if 'inputs_dir' does not have one it is taken from the
+    airfoil registry, written from 'CRM_airfoil.icms'.
+    '''
+    shutil.copy(avl_airfoil(inputs_dir), work_dir)
+
+
+class Stage:
+
+    def __init__(self, name, run, desvec_indices=(), options=(), upstream=(),
+                 input_files=(), outputs=(), exe=None, collect=None, when=None):
+        '''
+        A Stage is one step of the evaluation chain. It declares everything it
+        consumes, so its cache key changes only when one of them changes.
+
+        Args:
+        name :              name of the stage.
+        run :               function run(ctx) doing the work in ctx.work_dir.
+        desvec_indices :    components of the design vector used by the stage.
+        options :           names of the options of 'evaluate_design' used.
+        upstream :          names of the stages whose files are used.
+        input_files :       files of the 'Inputs' folder used. An option name
+                            (e.g. 'airfoil_file') stands for its value, a
+                            relative path in 'Inputs' or an absolute path.
+        outputs :           files produced and stored in the cache. A stage
+                            without outputs is always run (cheap stages).
+        exe :               name of the software in 'tool_paths'.
+        collect :           function collect(ctx) reading the values of the
+                            result from the files, run after a hit or a run.
+        when :              function when(options) telling if the stage is
+                            part of the chain for these options (default
+                            always). A stage left out has no key, no files
+                            and is not timed.
+        '''
+        self.name = name
+        self.run = run
+        self.desvec_indices = list(desvec_indices)
+        self.options = options
+        self.upstream = upstream
+        self.input_files = input_files
+        self.outputs = outputs
+        self.exe = exe
+        self.collect = collect
+        self.when = when
+
+    def key(self, cache, desvec, options, inputs_dir, upstream_keys):
+        """
+        Computes the cache key from the inputs declared by the stage.
+        """
+        inputs = {name: options[name] for name in self.options}
+        for name in self.upstream:
+            inputs['stage_' + name] = upstream_keys.get(name)
+        for name in self.input_files:
+            file_name = options.get(name, name)
+            inputs['file_' + os.path.basename(file_name)] = file_hash(
+                os.path.join(inputs_dir, file_name))
+        if self.exe is not None:
+            inputs['tool'] = tool_version(getattr(tool_paths, self.exe))
+        vector = np.asarray(desvec, dtype=float)[self.desvec_indices]
+        return cache.key(self.name, vector, **inputs)
+
+
+class _Context:
+    '''
+    Holds what the stages need: the design vector, the working directory,
+    the options and the result being filled.
+    '''
+    def __init__(self, desvec, work_dir, options, result, inputs_dir):
+        self.desvec = desvec
+        self.work_dir = work_dir
+        self.inputs_dir = inputs_dir
+        self.options = options
+        self.result = result
+
+
+def _run_aero(ctx):
+    avl_writer(ctx.desvec, ctx.options['Mach'], ctx.work_dir, 'wing.avl',
+               ctx.options['resolution'])
+    if ctx.options['persistent_avl']:
+        pool = shared_pool(ctx.inputs_dir)
+        pool.solve(os.path.join(ctx.work_dir, 'wing.avl'),
+                   [dict(CL=ctx.options['CL'])], ctx.work_dir, ['results.txt'])
+        return
+    commands = 'load wing.avl\n oper \n a c {}\n x\n fe results.txt'.format(ctx.options['CL'])
+    subP = subprocess.Popen([tool_paths.avl_exe], stdin=PIPE, stdout=PIPE,
+                            stderr=STDOUT, cwd=ctx.work_dir)
+    subP.communicate(input=commands.encode())
+    '''
+    The commands end without 'quit', so AVL stops on the end of its input
+    and its exit code says nothing: the output file is checked instead.
+    '''
+    if not os.path.exists(os.path.join(ctx.work_dir, 'results.txt')):
+        raise RuntimeError('AVL did not write results.txt in {}'.format(ctx.work_dir))
+
+
+def _collect_aero(ctx):
+    '''
+    The AVL file is read once; the coefficients and the pressure are taken
+    from the AvlResult in memory.
+    '''
+    ctx.result.aero = AvlResult.from_file(os.path.join(ctx.work_dir, 'results.txt'))
+    ctx.result.CL, ctx.result.CD = get_efficiency(ctx.result.aero, None)
+
+
+def _run_pressure(ctx):
+    ctx.result.pressure = get_pressure(ctx.result.aero, None,
+                                       ctx.options['Mach'], ctx.options['z'])
+    write_pressure(ctx.result.pressure, ctx.work_dir)
+
+
+def _run_geometry(ctx):
+    '''
+    Both backends write the surface manifest next to 'box.iges', read by the
+    HyperMesh stages.
+    '''
+    layout = BoxLayout(ctx.options['bays'], ctx.options['spars'])
+    write_manifest(layout, ctx.work_dir)
+    if ctx.options['geometry_backend'] == 'native':
+        write_box_iges(ctx.desvec, ctx.options['airfoil_file'], ctx.work_dir,
+                       layout=layout, inputs_dir=ctx.inputs_dir)
+        return
+    wing = FCMacro_writer(ctx.desvec, ctx.options['airfoil_file'], layout,
+                          ctx.inputs_dir)
+    wing.write_macro(ctx.work_dir, 'box.FCmacro')
+    subprocess.run([tool_paths.freecad_exe, 'box.FCmacro'], cwd=ctx.work_dir,
+                   check=True)
+
+
+def _run_hypermesh(ctx, stage, tcl_file, output_file):
+    manifest = None
+    if os.path.exists(os.path.join(ctx.work_dir, MANIFEST_FILE)):
+        manifest = read_manifest(ctx.work_dir)
+    persistent = ctx.options['persistent_hm']
+    tcl_writer(ctx.desvec, ctx.options['vol_frac'],
+               os.path.join(ctx.work_dir, tcl_file), ctx.work_dir,
+               compliance=ctx.options['compliance'], stage=stage,
+               mesh_divisor=ctx.options['mesh_divisor'], manifest=manifest,
+               prologue=not persistent,
+               map_pressure=ctx.options['load_mapping'] == 'hypermesh')
+    if persistent:
+        shared_hm_pool().run(os.path.join(ctx.work_dir, tcl_file), ctx.work_dir,
+                             [output_file])
+        return
+    subprocess.run([tool_paths.hypermesh_exe, '-b', '-tcl', tcl_file],
+                   cwd=ctx.work_dir, check=True)
+
+
+def _run_mesh(ctx):
+    _run_hypermesh(ctx, 'mesh', 'hmmesh.tcl', 'box_mesh.hm')
+
+
+DECK_FILE = 'box_deck.fem'
+
+
+def _run_deck(ctx):
+    '''
+    With the native load mapping the deck written by HyperMesh depends only
+    on the mesh and on the objective: the loads stage patches its PLOAD4 and
+    volume fraction, so HyperMesh runs once per mesh.
+    '''
+    _run_hypermesh(ctx, 'loads', 'hmbox.tcl', 'box.fem')
+    os.replace(os.path.join(ctx.work_dir, 'box.fem'),
+               os.path.join(ctx.work_dir, DECK_FILE))
+
+
+def _run_loads(ctx):
+    if ctx.options['load_mapping'] == 'native':
+        deck = os.path.join(ctx.work_dir, DECK_FILE)
+        eids, pressures = map_pressure(deck, ctx.result.pressure)
+        patch_vol_frac(deck, ctx.options['vol_frac'],
+                       os.path.join(ctx.work_dir, 'box.fem'),
+                       pload4_cards(eids, pressures))
+        return
+    _run_hypermesh(ctx, 'loads', 'hmbox.tcl', 'box.fem')
+
+
+def _run_structure(ctx):
+    subprocess.run([tool_paths.optistruct_exe, 'box.fem', '-analysis'],
+                   cwd=ctx.work_dir, check=True)
+
+
+def _collect_structure(ctx):
+    ctx.result.mass = read_mass(os.path.join(ctx.work_dir, 'box.out'),
+                                ctx.work_dir)
+
+
+'''
+The evaluation chain. The geometry depends on the whole planform (all the 7
+components), the mesh only on the geometry and on the tip chord (params[2])
+which sets the mesh size. The loads stage applies the pressure to the saved
+mesh, so a change of the flight conditions or of the volume fraction reruns
+only AVL, the loads and OptiStruct. With load_mapping='native' the deck
+stage (left out of the chain otherwise) keeps the deck of each mesh and the
+loads stage only patches it, so HyperMesh is not run either.
+'''
+
+STAGES = [
+    Stage('aero', _run_aero, desvec_indices=range(7),
+          options=('Mach', 'CL', 'resolution'),
+          input_files=('avl_airfoil',), outputs=('wing.avl', 'results.txt'),
+          exe='avl_exe', collect=_collect_aero),
+    Stage('pressure', _run_pressure, options=('Mach', 'z'),
+          upstream=('aero',)),
+    Stage('geometry', _run_geometry, desvec_indices=range(7),
+          options=('geometry_backend', 'bays', 'spars'),
+          input_files=('airfoil_file',), outputs=('box.iges', MANIFEST_FILE),
+          exe='freecad_exe'),
+    Stage('mesh', _run_mesh, desvec_indices=(2,), options=('mesh_divisor',),
+          upstream=('geometry',),
+          outputs=('box_mesh.hm',), exe='hypermesh_exe'),
+    Stage('deck', _run_deck, options=('compliance', 'load_mapping'),
+          upstream=('mesh',), outputs=(DECK_FILE,), exe='hypermesh_exe',
+          when=lambda options: options['load_mapping'] == 'native'),
+    Stage('loads', _run_loads,
+          options=('vol_frac', 'compliance', 'load_mapping'),
+          upstream=('mesh', 'deck', 'pressure'), outputs=('box.fem',),
+          exe='hypermesh_exe'),
+    Stage('structure', _run_structure, upstream=('loads',),
+          outputs=('box.out',), exe='optistruct_exe',
+          collect=_collect_structure),
+]
+
+
+'''
+Stages replaced by the morphed deck, and the options the mesh depends on: a
+baseline is morphed only for evaluations with the same options and airfoil.
+'''
+MORPHED_STAGES = ('geometry', 'mesh', 'deck')
+MESH_OPTIONS = ('mesh_divisor', 'geometry_backend', 'bays', 'spars', 'compliance')
+
+
+def _mesh_inputs(options, inputs_dir):
+    inputs = {name: options[name] for name in MESH_OPTIONS}
+    inputs['airfoil'] = file_hash(os.path.join(inputs_dir, options['airfoil_file']))
+    return inputs
+
+
+def evaluate_design(desvec, work_dir, Mach=0.85, CL=0.5, z=10000,
+                    vol_frac=0.3, compliance=True, airfoil_file='airfoil.txt',
+                    inputs_dir=None, run_optistruct=True, cache=None,
+                    persistent_avl=False, resolution=(20, 40), mesh_divisor=25,
+                    geometry_backend='native', bays=(2, 2), spars=None,
+                    persistent_hm=False, load_mapping='hypermesh',
+                    morph=None):
+    '''
+    This function runs the whole analysis chain for one design vector inside
+    'work_dir' and gives back the results.
+
+    Parameters
+    ----------
+    desvec :         is the design vector (7 numbers).
+    work_dir :       is the folder where all the files of this evaluation are
+                     written. It is created if it does not exist.
+    Mach :           Mach number.
+    CL :             target lift coefficient for the AVL trim ('a c' command).
+    z :              is the flight heigth in [m].
+    vol_frac :       volume fraction used during topology optimisation.
+    compliance :     if True the topology optimisation minimises the
+                     compliance, otherwise the mass.
+    airfoil_file :   name of the airfoil file in the 'Inputs' folder used by
+                     FreeCAD.
+    inputs_dir :     folder containing the inputs. Default is 'Inputs' in the
+                     current working directory.
+    run_optistruct : if False the chain stops after HyperMesh.
+    cache :          a ResultCache. A stage is run only if one of the inputs
+                     it declares in STAGES changed; the stages taken from the
+                     cache are listed in 'result.cached'.
+    persistent_avl : if True AVL is not launched for this evaluation: the
+                     job goes to the AVL session kept alive by the process
+                     (see 'avl_session.py').
+    resolution :     AVL lattice (Nchordwise, Nspanwise). A coarse lattice is
+                     enough in the first iterations (see 'lattice_study.py').
+    mesh_divisor :   the HyperMesh element size is params[2]/mesh_divisor.
+    geometry_backend : 'native' writes 'box.iges' directly (see
+                     'iges_writer.py'); 'freecad' writes the macro and runs
+                     FreeCAD, to check the native geometry.
+    bays :           number of bays of the inner and outer panel (sections of
+                     the box, see 'box_layout.py'). Fewer bays give fewer
+                     surfaces and a faster mesh.
+    spars :          (front, rear) x/c of the spars. None keeps the original
+                     box.
+    persistent_hm :  if True the HyperMesh macros are run by the session
+                     kept alive by the process (see 'hm_session.py') instead
+                     of a new hmbatch.
+    load_mapping :   'hypermesh' maps 'pressure.csv' on the skin with *BCM;
+                     'native' maps the AVL pressure in Python and patches
+                     the PLOAD4 cards and the volume fraction of the deck
+                     written once per mesh (see 'load_mapping.py' and
+                     'fem_patch.py').
+    morph :          a MorphLibrary (or its folder). The deck is morphed from
+                     the nearest baseline meshed with the same options when
+                     the elements pass its checks ('result.morph' is then the
+                     MorphReport); otherwise the design is meshed and its
+                     deck added to the library. Needs load_mapping='native'.
+
+    Returns
+    -------
+    result :         an EvaluationResult.
+    '''
+    if inputs_dir is None:
+        inputs_dir = os.path.join(os.getcwd(), 'Inputs')
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+    result = EvaluationResult(desvec, work_dir)
+    _copy_inputs(work_dir, inputs_dir)
+
+    options = dict(Mach=Mach, CL=CL, z=z, vol_frac=vol_frac,
+                   compliance=compliance, airfoil_file=airfoil_file,
+                   persistent_avl=persistent_avl, resolution=tuple(resolution),
+                   mesh_divisor=mesh_divisor, geometry_backend=geometry_backend,
+                   bays=tuple(bays), spars=None if spars is None else tuple(spars),
+                   persistent_hm=persistent_hm, load_mapping=load_mapping,
+                   avl_airfoil=avl_airfoil(inputs_dir))
+    ctx = _Context(result.desvec, work_dir, options, result, inputs_dir)
+    keys = {}
+    if morph is not None:
+        if load_mapping != 'native':
+            raise ValueError("morph needs load_mapping='native'")
+        if not isinstance(morph, MorphLibrary):
+            morph = MorphLibrary(morph)
+        mesh_inputs = _mesh_inputs(options, inputs_dir)
+        start = time.perf_counter()
+        result.morph = morph.morph(result.desvec, os.path.join(work_dir, DECK_FILE),
+                                   **mesh_inputs)
+        result.timings['morph'] = time.perf_counter() - start
+    for stage in STAGES:
+        if stage.name == 'structure' and not run_optistruct:
+            break
+        if stage.when is not None and not stage.when(options):
+            continue
+        if result.morph is not None and stage.name in MORPHED_STAGES:
+            '''
+            The downstream keys refer to the baseline the deck comes from.
+            '''
+            if cache is not None:
+                keys[stage.name] = cache.key(stage.name, result.desvec,
+                                             baseline=result.morph.baseline)
+            continue
+        start = time.perf_counter()
+        hit = False
+        if cache is not None:
+            keys[stage.name] = stage.key(cache, result.desvec, options,
+                                         inputs_dir, keys)
+            if stage.outputs:
+                hit = cache.fetch(keys[stage.name], work_dir)
+        if hit:
+            result.cached.append(stage.name)
+        else:
+            '''
+            The files of a previous evaluation in the same folder are
+            removed first: if the software fails they must not be stored
+            under the new key.
+            '''
+            for name in stage.outputs:
+                path = os.path.join(work_dir, name)
+                if os.path.exists(path):
+                    os.remove(path)
+            stage.run(ctx)
+            if cache is not None and stage.outputs:
+                cache.store(keys[stage.name], work_dir, stage.outputs)
+        if stage.collect is not None:
+            stage.collect(ctx)
+        if morph is not None and stage.name == 'deck':
+            morph.add(result.desvec, os.path.join(work_dir, DECK_FILE), **mesh_inputs)
+        result.timings[stage.name] = time.perf_counter() - start
+
+    return result
+
+
+def _run_job(desvec, work_dir, options):
+    '''
+    Entry point of the pool workers. The errors are stored in the result, so
+    one failed design does not stop the others.
+    '''
+    try:
+        return evaluate_design(desvec, work_dir, **options)
+    except Exception:
+        result = EvaluationResult(desvec, work_dir)
+        result.error = traceback.format_exc()
+        return result
+
+
+class EvaluationPool:
+
+    def __init__(self, n_workers=None, scratch_dir=None, keep_files=True,
+                 **options):
+        '''
+        The class EvaluationPool evaluates many design vectors concurrently
+        in a pool of processes. Every job runs in its own folder, created
+        inside 'scratch_dir' (default 'OS' in the current working directory).
+        The keyword 'options' are passed to 'evaluate_design'.
+        If 'keep_files' is False the folder of a job is removed once its
+        result is back.
+        '''
+        if scratch_dir is None:
+            scratch_dir = os.path.join(os.getcwd(), 'OS')
+        if not os.path.exists(scratch_dir):
+            os.makedirs(scratch_dir)
+        self.scratch_dir = scratch_dir
+        self.keep_files = keep_files
+        self.options = options
+        self.options.setdefault('inputs_dir', os.path.join(os.getcwd(), 'Inputs'))
+        '''
+        The airfoils are parsed here, once: the workers only open the .npy
+        files of the registry.
+        '''
+        avl_airfoil(self.options['inputs_dir'])
+        airfoil_path = os.path.join(self.options['inputs_dir'],
+                                    self.options.get('airfoil_file', 'airfoil.txt'))
+        if os.path.exists(airfoil_path):
+            load_airfoil(airfoil_path)
+        self.executor = ProcessPoolExecutor(max_workers=n_workers)
+
+    def submit(self, desvec, **options):
+        """
+        Sends one design vector to the pool and returns a Future whose result
+        is an EvaluationResult. The keyword 'options' override the ones of the
+        pool for this job only.
+        """
+        work_dir = tempfile.mkdtemp(prefix='eval_', dir=self.scratch_dir)
+        job_options = dict(self.options)
+        job_options.update(options)
+        future = self.executor.submit(_run_job, np.array(desvec, dtype=float),
+                                      work_dir, job_options)
+        if not self.keep_files:
+            future.add_done_callback(
+                lambda f: shutil.rmtree(work_dir, ignore_errors=True))
+        return future
+
+    def map(self, desvecs, **options):
+        """
+        Evaluates a list (or an N x 7 array) of design vectors and returns the
+        EvaluationResult objects in the same order.
+        """
+        futures = [self.submit(desvec, **options) for desvec in desvecs]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,599 @@
+'''
+Created on 18 Oct 2026
+This module reads and writes the bulk data of the OptiStruct deck 'box.fem'
+written by HyperMesh. The cards GRID, CTETRA, CTRIA3, CQUAD4, PSOLID,
+PSHELL, MAT1, SPC and PLOAD4 are loaded in NumPy record arrays (one per
+card, see SCHEMAS) with an IdMap from the ids to the rows, so the mesh can be
+used without HyperMesh.
+The deck is read in chunks of lines, so the memory stays bounded. The
+small-field and large-field cards (with their continuation lines) are
+converted by columns with NumPy; only the free-field (comma separated) cards
+are split field by field. 'write_bulk' assembles the cards the same way, as
+a matrix of characters. A million-element tet mesh is read or written in a
+few seconds.
+HyperMesh keeps the component of each element in comments: '$HMNAME COMP'
+gives the names, '$HMMOVE' the elements of a component whose id differs from
+their property id. The function 'components' rebuilds the element ids of
+each component from them.
+'''
+
+import itertools
+import re
+
+import numpy as np
+
+
+'''
+Fields of each card, from the first data field: name, type ('i' integer,
+'f' real) and number of values. A blank integer is read as 0, a blank real
+as NaN, and both are written back as blanks.
+'''
+SCHEMAS = {
+    'GRID': [('id', 'i', 1), ('cp', 'i', 1), ('xyz', 'f', 3), ('cd', 'i', 1),
+             ('ps', 'i', 1), ('seid', 'i', 1)],
+    'CTETRA': [('id', 'i', 1), ('pid', 'i', 1), ('nodes', 'i', 10)],
+    'CTRIA3': [('id', 'i', 1), ('pid', 'i', 1), ('nodes', 'i', 3)],
+    'CQUAD4': [('id', 'i', 1), ('pid', 'i', 1), ('nodes', 'i', 4)],
+    'PSOLID': [('id', 'i', 1), ('mid', 'i', 1), ('cordm', 'i', 1)],
+    'PSHELL': [('id', 'i', 1), ('mid1', 'i', 1), ('t', 'f', 1), ('mid2', 'i', 1),
+               ('bending', 'f', 1), ('mid3', 'i', 1), ('ts_t', 'f', 1),
+               ('nsm', 'f', 1)],
+    'MAT1': [('id', 'i', 1), ('e', 'f', 1), ('g', 'f', 1), ('nu', 'f', 1),
+             ('rho', 'f', 1), ('a', 'f', 1), ('tref', 'f', 1), ('ge', 'f', 1)],
+    'SPC': [('sid', 'i', 1), ('g', 'i', 1), ('c', 'i', 1), ('d', 'f', 1),
+            ('g2', 'i', 1), ('c2', 'i', 1), ('d2', 'f', 1)],
+    'PLOAD4': [('sid', 'i', 1), ('eid', 'i', 1), ('p', 'f', 4), ('g1', 'i', 1),
+               ('g34', 'i', 1)],
+}
+
+'''
+Cards written in large field by 'write_bulk', to keep the precision of the
+coordinates.
+'''
+LARGE_FIELD = ('GRID',)
+
+'''
+Formats of the cards and width of their fields (None: comma separated).
+'''
+_FORMATS = {'small': 8, 'large': 16, 'free': None}
+
+_HMNAME = re.compile(r'\$HMNAME COMP\s+(\d+)\s*"([^"]*)"')
+_HMMOVE = re.compile(r'\$HMMOVE\s+(\d+)')
+_DIGITS = np.frombuffer(b'0123456789.', dtype=np.uint8)
+_SIGNS = np.frombuffer(b'+-', dtype=np.uint8)
+
+
+def format_real(value, width=8):
+    """
+    Shortest representation of 'value' fitting in a field of 'width'
+    characters, with the compact exponent of the small field ('1.5-3').
+    """
+    value = float(value)
+    for digits in range(width, 0, -1):
+        for text in ('{:.{}g}'.format(value, digits),
+                     '{:.{}e}'.format(value, digits - 1)):
+            if 'e' in text:
+                mantissa, exponent = text.split('e')
+                if '.' not in mantissa:
+                    mantissa += '.'
+                text = '{}{:+d}'.format(mantissa, int(exponent))
+            elif '.' not in text:
+                text += '.'
+            if len(text) <= width:
+                return text
+    raise ValueError('{} does not fit in {} characters'.format(value, width))
+
+
+def nastran_float(text):
+    """
+    Converts a real field, also in the compact form of the small field
+    ('1.5-3' for 1.5E-3, '2.+4', '1.D-2').
+    """
+    text = text.strip().upper().replace('D', 'E')
+    try:
+        return float(text)
+    except ValueError:
+        k = max(text.rfind('+'), text.rfind('-'))
+        if k <= 0:
+            raise
+        return float(text[:k] + 'E' + text[k:])
+
+
+def split_fields(line):
+    """
+    Fields of one line of a card, the first one included (name or
+    continuation mark). Free-field if the line contains a comma; large field
+    (16 characters) if the first field ends with '*'; small field (8
+    characters) otherwise. The continuation field at the end of a fixed line
+    is left out.
+    """
+    line = line.rstrip('\r\n')
+    if ',' in line:
+        return [field.strip() for field in line.split(',')]
+    first = line[:8].strip()
+    if first.endswith('*'):
+        return [first] + [line[8+16*i:24+16*i].strip() for i in range(4)]
+    return [first] + [line[8+8*i:16+8*i].strip() for i in range(8)]
+
+
+def _split_record(record, width):
+    '''
+    Fields (strings) of a card of the fixed formats.
+    '''
+    return [record[k:k+width].decode().strip() for k in range(0, len(record), width)]
+
+
+def _is_continuation(line):
+    return line[:1] in (b'+', b'*', b',') or (line[:1] == b' ' and line.strip() != b'')
+
+
+def _dtype(name):
+    return [(field, np.int32 if kind == 'i' else np.float64, (n,) if n > 1 else ())
+            for field, kind, n in SCHEMAS[name]]
+
+
+def _columns(name):
+    '''
+    (field, kind, index of the value or None) of each data field of a card.
+    '''
+    return [(field, kind, k if n > 1 else None)
+            for field, kind, n in SCHEMAS[name] for k in range(n)]
+
+
+class IdMap:
+
+    def __init__(self, ids):
+        '''
+        The class IdMap gives the rows of ids in an array, with a binary
+        search on the sorted ids instead of a dictionary (a few bytes per id).
+        '''
+        ids = np.asarray(ids)
+        self.order = np.argsort(ids, kind='stable')
+        self.sorted_ids = ids[self.order]
+
+    def __len__(self):
+        return len(self.sorted_ids)
+
+    def __contains__(self, eid):
+        k = np.searchsorted(self.sorted_ids, eid)
+        return bool(k < len(self.sorted_ids) and self.sorted_ids[k] == eid)
+
+    def get(self, ids, default=-1):
+        """
+        Rows of 'ids' (a number or an array), 'default' for the ids not in
+        the array.
+        """
+        ids = np.asarray(ids)
+        if len(self.sorted_ids) == 0:
+            return np.full(ids.shape, default)
+        k = np.minimum(np.searchsorted(self.sorted_ids, ids), len(self.sorted_ids) - 1)
+        return np.where(self.sorted_ids[k] == ids, self.order[k], default)
+
+    def __getitem__(self, ids):
+        """
+        Rows of 'ids'. Raises a KeyError for an id not in the array.
+        """
+        rows = self.get(ids)
+        if np.any(rows < 0):
+            missing = np.asarray(ids)[rows < 0]
+            raise KeyError('ids not found: {}'.format(np.atleast_1d(missing)[:10]))
+        return int(rows) if rows.ndim == 0 else rows
+
+
+def _compact_to_e(chars):
+    '''
+    Inserts the 'E' of the reals in compact form ('1.5-3'): a sign after a
+    digit or a point. 'chars' is an n x w uint8 array of fields; the result
+    has one more column.
+    '''
+    n, w = chars.shape
+    sign = np.isin(chars[:, 1:], _SIGNS) & np.isin(chars[:, :-1], _DIGITS)
+    j = np.where(sign.any(axis=1), sign.argmax(axis=1) + 1, w)
+    cols = np.arange(w + 1)
+    source = np.where(cols[None, :] < j[:, None], cols, cols - 1)
+    out = np.take_along_axis(chars, np.clip(source, 0, w - 1), axis=1)
+    out[cols[None, :] == j[:, None]] = ord('E')
+    out[j == w, w] = ord(' ')
+    return out
+
+
+def _convert(chars, kind):
+    '''
+    Values of a column of fields (n x w uint8 array).
+    '''
+    n, w = chars.shape
+    blank = ((chars == 32) | (chars == 0)).all(axis=1)
+    values = np.zeros(n, dtype=np.int32) if kind == 'i' else np.full(n, np.nan)
+    if blank.all():
+        return values
+    text = np.ascontiguousarray(chars[~blank]).view('S{}'.format(w)).ravel()
+    if kind == 'i':
+        values[~blank] = text.astype(np.int64)
+        return values
+    try:
+        values[~blank] = text.astype(np.float64)
+    except ValueError:
+        text = np.char.replace(np.char.upper(text), b'D', b'E').astype('S{}'.format(w))
+        chars = _compact_to_e(text.view(np.uint8).reshape(-1, w))
+        values[~blank] = chars.view('S{}'.format(w + 1)).ravel().astype(np.float64)
+    return values
+
+
+def _parse_fixed(name, records, width):
+    '''
+    Record array of the cards in small (width 8) or large (width 16) field.
+    Each card is given as the data columns of its lines joined together.
+    '''
+    table = np.recarray(len(records), dtype=_dtype(name))
+    length = max(len(record) for record in records)
+    chars = np.array(records, dtype='S{}'.format(length)).view(np.uint8)
+    chars = chars.reshape(len(records), length)
+    for position, (field, kind, k) in enumerate(_columns(name)):
+        if width*position < length:
+            values = _convert(chars[:, width*position:width*(position+1)], kind)
+        else:
+            values = 0 if kind == 'i' else np.nan
+        if k is None:
+            table[field] = values
+        else:
+            table[field][:, k] = values
+    return table
+
+
+def _parse_records(name, records):
+    '''
+    Record array of the cards split field by field.
+    '''
+    table = np.recarray(len(records), dtype=_dtype(name))
+    columns = _columns(name)
+    for row, fields in enumerate(records):
+        for position, (field, kind, k) in enumerate(columns):
+            text = fields[position] if position < len(fields) else ''
+            if kind == 'i':
+                value = int(nastran_float(text)) if text else 0
+            else:
+                value = nastran_float(text) if text else np.nan
+            if k is None:
+                table[field][row] = value
+            else:
+                table[field][row, k] = value
+    return table
+
+
+def _finish(name, tables):
+    '''
+    Joins the tables of the chunks. The second constraint of a SPC card
+    becomes a row of its own; the blank pressures of a PLOAD4 take the first.
+    '''
+    if tables:
+        table = np.concatenate(tables).view(np.recarray)
+    else:
+        table = np.recarray(0, dtype=_dtype(name))
+    if name == 'SPC':
+        second = table[table.g2 != 0]
+        pairs = np.recarray(len(table) + len(second), dtype=_dtype(name))
+        for field, other in (('sid', 'sid'), ('g', 'g2'), ('c', 'c2'), ('d', 'd2')):
+            pairs[field] = np.concatenate((table[field], second[other]))
+        pairs.g2, pairs.c2, pairs.d2 = 0, 0, np.nan
+        return pairs
+    if name == 'PLOAD4':
+        table.p = np.where(np.isnan(table.p), table.p[:, :1], table.p)
+    return table
+
+
+class BulkData:
+
+    def __init__(self, path=None, cards=tuple(SCHEMAS), chunk_lines=1 << 18):
+        '''
+        The class BulkData holds the cards of a deck as record arrays.
+
+        Args:
+        path :              the deck. None gives empty tables.
+        cards :             names of the cards to read (keys of SCHEMAS).
+        chunk_lines :       lines read at a time.
+
+        Attributes:
+        tables :            dict card name -> record array (fields of
+                            SCHEMAS; 'xyz', 'nodes' and 'p' are columns of
+                            several values). A SPC gives one row per node.
+        comments :          the '$HM' lines (see 'components').
+        '''
+        self.tables = {name: np.recarray(0, dtype=_dtype(name)) for name in cards}
+        self.comments = []
+        self._maps = {}
+        if path is not None:
+            self.read(path, cards, chunk_lines)
+
+    def __getitem__(self, name):
+        return self.tables[name]
+
+    def read(self, path, cards=tuple(SCHEMAS), chunk_lines=1 << 18):
+        """
+        Reads the cards 'cards' of the deck 'path'.
+        """
+        names = {}
+        for name in cards:
+            names[name.encode()] = name
+            names[name.encode() + b'*'] = name
+        '''
+        The cards are collected by format: for the fixed formats the data
+        columns (8 to 72) of the lines of a card are joined, the free-field
+        cards are split in fields. 'last' is the card being read, (name,
+        format); name is None for a card not read.
+        '''
+        pending = {kind: {name: [] for name in cards} for kind in _FORMATS}
+        tables = {name: [] for name in cards}
+        last = None
+        moving = False
+        with open(path, 'rb') as f:
+            while True:
+                chunk = list(itertools.islice(f, chunk_lines))
+                if not chunk:
+                    break
+                for line in chunk:
+                    line = line.rstrip(b'\r\n')
+                    if line[:1] == b'$':
+                        '''
+                        The element ids of '$HMMOVE' follow on '$' lines.
+                        '''
+                        if line[:3] == b'$HM':
+                            moving = line[:7] == b'$HMMOVE'
+                            self.comments.append(line.decode())
+                        elif moving and line[:2] != b'$$':
+                            self.comments.append(line.decode())
+                        else:
+                            moving = False
+                        continue
+                    moving = False
+                    if last is not None and _is_continuation(line):
+                        name, kind = last
+                        if name is None:
+                            continue
+                        records = pending[kind][name]
+                        if kind == 'free':
+                            records[-1].extend(split_fields(line.decode())[1:])
+                        elif b',' in line:
+                            fields = _split_record(records.pop(), _FORMATS[kind])
+                            fields.extend(split_fields(line.decode())[1:])
+                            pending['free'][name].append(fields)
+                            last = (name, 'free')
+                        else:
+                            records[-1] += line[8:72].ljust(64)
+                        continue
+                    free = b',' in line
+                    head = line.split(b',', 1)[0] if free else line[:8]
+                    name = names.get(head.strip().upper())
+                    if name is None:
+                        last = (None, None)
+                        continue
+                    if free:
+                        kind = 'free'
+                        pending[kind][name].append(split_fields(line.decode())[1:])
+                    else:
+                        kind = 'large' if head.rstrip().endswith(b'*') else 'small'
+                        pending[kind][name].append(line[8:72].ljust(64))
+                    last = (name, kind)
+                self._flush(pending, tables, last)
+        self._flush(pending, tables, None)
+        for name in cards:
+            self.tables[name] = _finish(name, tables[name])
+        self._maps = {}
+
+    @staticmethod
+    def _flush(pending, tables, last):
+        '''
+        Converts the cards read so far. The last card may continue in the
+        next chunk: it is kept.
+        '''
+        for kind, by_name in pending.items():
+            for name, records in by_name.items():
+                keep = None
+                if last == (name, kind):
+                    keep = records.pop()
+                if records:
+                    if kind == 'free':
+                        tables[name].append(_parse_records(name, records))
+                    else:
+                        tables[name].append(_parse_fixed(name, records, _FORMATS[kind]))
+                by_name[name] = [] if keep is None else [keep]
+
+
+    def index(self, name):
+        """
+        IdMap of the card 'name' (built on the first call).
+        """
+        if name not in self._maps:
+            field = 'sid' if name in ('SPC', 'PLOAD4') else 'id'
+            self._maps[name] = IdMap(self.tables[name][field])
+        return self._maps[name]
+
+    def write(self, path, cards=None, enddata=True):
+        """
+        Writes the tables in 'path' (see 'write_bulk').
+        """
+        with open(path, 'w') as f:
+            write_bulk(f, self, cards)
+            if enddata:
+                f.write('ENDDATA\n')
+
+
+def _int_chars(values, width):
+    '''
+    Integers right-justified in fields of 'width' characters (n x width
+    uint8 array), blank for 0.
+    '''
+    values = np.asarray(values, dtype=np.int64)
+    chars = np.full((len(values), width), ord(' '), dtype=np.uint8)
+    if not values.any():
+        return chars
+    magnitude = np.abs(values)
+    length = np.zeros(len(values), dtype=int)
+    rest = magnitude.copy()
+    for k in range(width - 1, -1, -1):
+        digit = rest % 10
+        chars[:, k] = 48 + digit
+        rest //= 10
+        length[(magnitude >= 10**(width - 1 - k))] = width - k
+    if np.any(rest) or np.any(length + (values < 0) > width):
+        raise ValueError('integer too long for a field of {} characters'.format(width))
+    cols = np.arange(width)
+    chars[cols[None, :] < (width - length)[:, None]] = ord(' ')
+    negative = np.flatnonzero(values < 0)
+    chars[negative, width - length[negative] - 1] = ord('-')
+    return chars
+
+
+def _real_chars(values, width):
+    '''
+    Reals right-justified in fields of 'width' characters (n x width uint8
+    array), blank for NaN. The small field uses 'format_real', the large
+    field 10 significant digits; a value with a three-digit exponent, which
+    does not fit in that format, goes through 'format_real' too.
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    if width == 16:
+        filled = np.nan_to_num(values)
+        text = np.char.mod('%16.9E', filled)
+        for k in np.flatnonzero(np.char.str_len(text) > 16).tolist():
+            text[k] = format_real(filled[k], 16).rjust(16)
+        text = text.astype('S16')
+    else:
+        text = np.array([format_real(v).rjust(8) if v == v else '' for v in values.tolist()],
+                        dtype='S8')
+    chars = text.view(np.uint8).reshape(len(values), width).copy()
+    chars[np.isnan(values)] = ord(' ')
+    return chars
+
+
+def card_lines(name, table, large=False):
+    """
+    Text of the cards of a record array, one card (and its continuation
+    lines) per row, in small or large field. The rows are assembled as a
+    matrix of characters, column by column.
+    """
+    if len(table) == 0:
+        return ''
+    width = 16 if large else 8
+    per_line = 4 if large else 8
+    columns = []
+    for field, kind, k in _columns(name):
+        values = table[field] if k is None else table[field][:, k]
+        columns.append(_int_chars(values, width) if kind == 'i' else _real_chars(values, width))
+    '''
+    The trailing blank fields are left out: a card gets a continuation line
+    only if one of its rows needs it.
+    '''
+    used = len(columns)
+    while used > 1 and np.all(columns[used-1] == ord(' ')):
+        used -= 1
+    n = len(table)
+    head = '{:<8}'.format(name + '*' if large else name).encode()
+    parts = [np.tile(np.frombuffer(head, dtype=np.uint8), (n, 1))]
+    for position, column in enumerate(columns[:used]):
+        if position and position % per_line == 0:
+            mark = b'\n*       ' if large else b'\n        '
+            parts.append(np.tile(np.frombuffer(mark, dtype=np.uint8), (n, 1)))
+        parts.append(column)
+    parts.append(np.full((n, 1), ord('\n'), dtype=np.uint8))
+    chars = np.concatenate(parts, axis=1)
+    text = chars.tobytes()
+    if np.any(chars[:, -2] == ord(' ')) or used > per_line:
+        text = re.sub(rb' +\n', b'\n', text)
+    return text.decode()
+
+
+def write_bulk(f, bulk, cards=None):
+    """
+    Writes the cards of a BulkData in the open file 'f', in the order of
+    SCHEMAS. The cards of LARGE_FIELD are written in large field.
+    """
+    for name in SCHEMAS:
+        if name in bulk.tables and (cards is None or name in cards):
+            f.write(card_lines(name, bulk.tables[name], name in LARGE_FIELD))
+
+
+def components(comments, element_pids):
+    """
+    Element ids of each component, from the comments of the deck.
+
+    Args:
+    comments :          '$HM' lines of the deck.
+    element_pids :      dict element id -> property id. An element not moved
+                        by '$HMMOVE' belongs to the component with the id of
+                        its property.
+
+    Returns:
+    components :        dict component name -> sorted array of element ids.
+    """
+    names = {}
+    moved = {}
+    target = None
+    for line in comments:
+        match = _HMNAME.match(line)
+        if match:
+            names[int(match.group(1))] = match.group(2)
+            continue
+        match = _HMMOVE.match(line)
+        if match:
+            target = int(match.group(1))
+            continue
+        if target is not None and not line.startswith('$HM'):
+            tokens = re.findall(r'\d+|THRU', line[1:].upper())
+            k = 0
+            while k < len(tokens):
+                if k + 2 < len(tokens) and tokens[k+1] == 'THRU':
+                    ids = range(int(tokens[k]), int(tokens[k+2]) + 1)
+                    k += 3
+                else:
+                    ids = [int(tokens[k])]
+                    k += 1
+                for eid in ids:
+                    moved[eid] = target
+        else:
+            target = None
+    members = {}
+    for eid, pid in element_pids.items():
+        members.setdefault(moved.get(eid, pid), []).append(eid)
+    return {names.get(comp, str(comp)): np.array(sorted(eids))
+            for comp, eids in members.items()}
+
+
+class FemMesh:
+
+    def __init__(self, path):
+        '''
+        The class FemMesh holds the nodes and the shell elements of a deck,
+        the part used by 'load_mapping'.
+
+        Attributes:
+        node_ids :          (n,) node ids.
+        xyz :               n x 3 coordinates (basic system).
+        node_index :        IdMap node id -> row of 'xyz'.
+        shell_ids :         (m,) ids of the CTRIA3 and CQUAD4.
+        shell_pids :        (m,) their property ids.
+        shell_nodes :       m x 4 rows of 'xyz' of their nodes; the fourth
+                            is -1 for a triangle.
+        components :        dict name -> element ids (see 'components').
+        '''
+        bulk = BulkData(path, ('GRID', 'CTRIA3', 'CQUAD4'))
+        grids, trias, quads = bulk['GRID'], bulk['CTRIA3'], bulk['CQUAD4']
+        self.node_ids = grids.id
+        self.xyz = np.nan_to_num(grids.xyz)
+        self.node_index = bulk.index('GRID')
+        self.shell_ids = np.concatenate((trias.id, quads.id))
+        self.shell_pids = np.concatenate((trias.pid, quads.pid))
+        self.shell_nodes = np.full((len(self.shell_ids), 4), -1, dtype=np.int64)
+        self.shell_nodes[:len(trias), :3] = self.node_index[trias.nodes]
+        self.shell_nodes[len(trias):] = self.node_index[quads.nodes]
+        self.components = components(
+            bulk.comments, dict(zip(self.shell_ids.tolist(), self.shell_pids.tolist())))
+        self._shell_index = IdMap(self.shell_ids)
+
+    def shells(self, eids=None):
+        """
+        Rows of the shell arrays of the elements 'eids' (all if None).
+        """
+        if eids is None:
+            return np.arange(len(self.shell_ids))
+        rows = self._shell_index.get(eids)
+        return rows[rows >= 0].astype(np.int64)
@@ -0,0 +1,217 @@
+'''
+Created on 18 Oct 2026
+This module patches an OptiStruct deck written by HyperMesh, so a design that
+differs from a deck already written only in the loads or in the volume
+fraction goes straight to OptiStruct. The cards that change are:
+PLOAD4 (the pressure of one load set is replaced by new cards), DCONSTR
+(bounds of the constraint on a response, e.g. the volume fraction) and
+DRESP1 (fields of a response) and GRID (coordinates of a morphed mesh, see
+'mesh_morph.py'). Everything else is copied byte by byte.
+The deck is memory-mapped: the cards to patch are found with one regular
+expression over the map and the new deck is written in a single pass,
+copying the slices between them, so a deck of millions of elements is
+patched in milliseconds.
+'''
+
+import mmap
+import os
+import re
+import tempfile
+
+from fem_io import card_lines, format_real, split_fields
+
+
+VOLFRAC_LABEL = 'VolFrac'
+
+_CARDS = re.compile(rb'^(PLOAD4|DCONSTR|DRESP1|ENDDATA)(?=[ ,*\r\n])', re.M)
+_GRID = re.compile(rb'^GRID(?=[ ,*\r\n])', re.M)
+
+
+def _is_continuation(line):
+    return line[:1] in (b'+', b'*', b',') or (line[:1] == b' ' and line.strip() != b'')
+
+
+def _card_end(mm, start):
+    '''
+    End of the card starting at 'start': the continuation lines (starting
+    with '+', '*', ',' or a blank field) belong to it.
+    '''
+    end = mm.find(b'\n', start)
+    while end >= 0:
+        line_end = mm.find(b'\n', end + 1)
+        if not _is_continuation(mm[end+1:line_end if line_end >= 0 else len(mm)]):
+            return end + 1
+        end = line_end
+    return len(mm)
+
+
+def set_fields(line, values):
+    """
+    Gives back the first line of a card with some fields replaced.
+
+    Args:
+    line :              the line (str, with its end of line).
+    values :            dict field position (1 is the first data field) ->
+                        new value (number or string).
+    """
+    body = line.rstrip('\r\n')
+    newline = line[len(body):]
+    if ',' in body:
+        fields = body.split(',')
+        for position, value in values.items():
+            fields += [''] * (position + 1 - len(fields))
+            fields[position] = value if isinstance(value, str) else format_real(value, 16)
+        return ','.join(fields) + newline
+    width = 16 if body[:8].strip().endswith('*') else 8
+    for position, value in values.items():
+        text = value if isinstance(value, str) else format_real(value, width)
+        start = 8 + width*(position - 1)
+        body = body.ljust(start + width)
+        body = body[:start] + '{:>{}}'.format(text, width) + body[start+width:]
+    return body.rstrip() + newline
+
+
+def _newline(mm):
+    return '\r\n' if mm.find(b'\r\n', 0, 4096) >= 0 else '\n'
+
+
+def _rewrite(src, dst, write):
+    '''
+    Calls write(mm, out) with 'src' memory-mapped and a temporary file next
+    to 'dst', which replaces 'dst' only if 'write' succeeds.
+    '''
+    if dst is None:
+        dst = src
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dst)), suffix='.fem')
+    try:
+        with open(src, 'rb') as f, os.fdopen(fd, 'wb') as out:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                result = write(mm, out)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    os.replace(tmp, dst)
+    return result
+
+
+def _patch(mm, out, loads, sid, bounds, responses):
+    '''
+    Writes in 'out' the deck mapped in 'mm' with the cards patched. Gives back
+    the number of cards removed or changed.
+    '''
+    patched = dict(PLOAD4=0, DCONSTR=0, DRESP1=0)
+    newline = _newline(mm)
+    if loads is not None:
+        loads = loads.replace('\n', newline).encode()
+    cards = [(match.group(1).decode(), match.start(), _card_end(mm, match.start()))
+             for match in _CARDS.finditer(mm)]
+    '''
+    The DCONSTR refer to the id of the response: the DRESP1 give the label of
+    each id.
+    '''
+    labels = {}
+    for name, start, end in cards:
+        if name == 'DRESP1':
+            fields = split_fields(mm[start:end].decode().splitlines()[0])
+            labels[fields[1]] = fields[2]
+    position = 0
+    for name, start, end in cards:
+        out.write(mm[position:start])
+        position = end
+        text = mm[start:end].decode()
+        first = text.splitlines(True)[0]
+        fields = split_fields(first)
+        if name == 'PLOAD4' and loads is not None and fields[1] and int(fields[1]) == sid:
+            patched['PLOAD4'] += 1
+            continue
+        if name == 'DCONSTR' and labels.get(fields[2]) in bounds:
+            lower, upper = bounds[labels[fields[2]]]
+            values = {3: lower, 4: upper}
+            values = {k: v for k, v in values.items() if v is not None}
+            text = set_fields(first, values) + text[len(first):]
+            patched['DCONSTR'] += 1
+        elif name == 'DRESP1' and fields[2] in responses:
+            text = set_fields(first, responses[fields[2]]) + text[len(first):]
+            patched['DRESP1'] += 1
+        elif name == 'ENDDATA' and loads is not None:
+            out.write(loads)
+            loads = None
+        out.write(text.encode())
+    out.write(mm[position:])
+    if loads is not None:
+        out.write(loads)
+    return patched
+
+
+def patch_fem(src, dst=None, loads=None, sid=2, bounds=None, responses=None):
+    """
+    Writes a patched copy of the deck 'src'.
+
+    Args:
+    src :               deck to patch.
+    dst :               patched deck (default 'src', replaced at the end).
+    loads :             PLOAD4 cards (string, see 'load_mapping.pload4_cards')
+                        replacing the PLOAD4 of the set 'sid'. They are
+                        written before ENDDATA. None keeps the loads.
+    sid :               id of the load set replaced.
+    bounds :            dict DRESP1 label -> (lower, upper) bounds of the
+                        DCONSTR cards on that response. None keeps a bound.
+    responses :         dict DRESP1 label -> dict field position -> value, to
+                        change the fields of the first line of a DRESP1.
+
+    Returns:
+    patched :           dict card name -> number of cards removed or changed.
+    """
+    return _rewrite(src, dst, lambda mm, out: _patch(mm, out, loads, sid, bounds or {},
+                                                    responses or {}))
+
+
+def patch_vol_frac(src, vol_frac, dst=None, loads=None, sid=2):
+    """
+    Sets the upper bound of the volume fraction constraint (and the loads, if
+    given) of a deck written by 'tcl_writer_p'.
+    """
+    return patch_fem(src, dst, loads, sid, bounds={VOLFRAC_LABEL: (None, vol_frac)})
+
+
+def _write_grids(mm, out, grids):
+    '''
+    Writes the deck with the GRID cards replaced by the rows of 'grids'. The
+    runs of consecutive GRID cards are written as one block of large-field
+    cards.
+    '''
+    starts = [match.start() for match in _GRID.finditer(mm)]
+    if len(starts) != len(grids):
+        raise ValueError('the deck has {} GRID cards, {} given'.format(len(starts), len(grids)))
+    runs = []
+    for row, start in enumerate(starts):
+        end = _card_end(mm, start)
+        if runs and runs[-1][1] == start:
+            runs[-1][1] = end
+            runs[-1][3] = row + 1
+        else:
+            runs.append([start, end, row, row + 1])
+    newline = _newline(mm)
+    position = 0
+    for start, end, first, last in runs:
+        out.write(mm[position:start])
+        out.write(card_lines('GRID', grids[first:last], large=True).replace('\n', newline).encode())
+        position = end
+    out.write(mm[position:])
+    return len(starts)
+
+
+def patch_grids(src, grids, dst=None):
+    """
+    Writes a copy of the deck 'src' with new node coordinates.
+
+    Args:
+    src :               deck to patch.
+    grids :             GRID record array (see 'fem_io.BulkData') with one
+                        row per GRID card of 'src', in the order of the deck.
+    dst :               patched deck (default 'src').
+
+    Returns:
+    n :                 number of GRID cards written.
+    """
+    return _rewrite(src, dst, lambda mm, out: _write_grids(mm, out, grids))
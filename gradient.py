@@ -0,0 +1,116 @@
+'''
+Created on 18 Oct 2026
+This module computes the derivatives of the optimisation functions with
+respect to the design vector.
+'fd_gradient' sends the base design and all its perturbations (8
+evaluations, or 15 with central differences) to an EvaluationPool at the
+same time, each one in its own folder. With a ResultCache in the options of
+the pool the base design, usually evaluated already by the optimiser, is
+taken from the cache.
+The planform functions ('ref_values', 'FCMacro_writer.make_sections') are
+plain arithmetic, so their derivatives are computed exactly with the
+complex step, without any solver.
+'''
+
+import numpy as np
+
+from FCMacro_writer import FCMacro_writer
+from ref_values import ref_values
+
+
+def fd_gradient(pool, desvec, step=1e-3, central=False, objective=None,
+                **options):
+    """
+    This function computes the gradient of the objective by finite
+    differences, evaluating all the designs concurrently.
+
+    Args:
+    pool :              an EvaluationPool.
+    desvec :            the base design vector.
+    step :              relative step: component i is moved by
+                        step*|desvec[i]| (step if desvec[i] is 0).
+    central :           if True central differences (15 evaluations),
+                        otherwise forward differences (8 evaluations).
+    objective :         function objective(CD, mass). Default is CD.
+    options :           options of 'evaluate_design' for all the evaluations.
+
+    Returns:
+    value :             the objective at 'desvec'.
+    gradient :          array of 7 derivatives.
+    """
+    if objective is None:
+        objective = lambda CD, mass: CD
+    x0 = np.asarray(desvec, dtype=float)
+    n = len(x0)
+    h = step * np.where(x0 != 0, np.abs(x0), 1.)
+
+    designs = [x0]
+    for i in range(n):
+        x = x0.copy()
+        x[i] += h[i]
+        designs.append(x)
+    if central:
+        for i in range(n):
+            x = x0.copy()
+            x[i] -= h[i]
+            designs.append(x)
+
+    futures = [pool.submit(x, **options) for x in designs]
+    values = []
+    for future in futures:
+        result = future.result()
+        if not result.ok:
+            raise RuntimeError(result.error)
+        values.append(objective(result.CD, result.mass))
+    values = np.array(values, dtype=float)
+
+    if central:
+        gradient = (values[1:n+1] - values[n+1:]) / (2*h)
+    else:
+        gradient = (values[1:n+1] - values[0]) / h
+    return values[0], gradient
+
+
+def complex_step_jacobian(func, x, h=1e-30):
+    """
+    Jacobian of a function of the design vector by the complex step. The
+    result is exact to machine precision, whatever the step, for functions
+    made of arithmetic operations.
+
+    Args:
+    func :              function of the design vector giving an array.
+    x :                 the design vector.
+    h :                 imaginary step.
+
+    Returns:
+    value :             func(x), flattened.
+    jacobian :          array of shape (len(value), len(x)).
+    """
+    x = np.asarray(x, dtype=float)
+    value = np.ravel(func(x)).real
+    jacobian = np.zeros((len(value), len(x)))
+    for i in range(len(x)):
+        z = x.astype(complex)
+        z[i] += 1j * h
+        jacobian[:, i] = np.ravel(func(z)).imag / h
+    return value, jacobian
+
+
+def ref_values_jacobian(desvec):
+    """
+    Values and Jacobian of (S, mean chord) given by 'ref_values'.
+    """
+    return complex_step_jacobian(lambda p: np.array(ref_values(p)), desvec)
+
+
+def make_sections_jacobian(desvec):
+    """
+    Values and Jacobian of the spanwise stations, leading edge positions and
+    chords given by 'FCMacro_writer.make_sections' (in this order, 5 values
+    each), flattened, for one design vector. The analytic Jacobians of the
+    batch version are in 'planform.sections_jacobian'.
+    """
+    def sections(p):
+        y, xle, chords = FCMacro_writer(p, None).make_sections()
+        return np.concatenate((np.array(y, dtype=complex), xle, chords))
+    return complex_step_jacobian(sections, desvec)
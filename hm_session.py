@@ -0,0 +1,339 @@
+'''
+Created on 18 Oct 2026
+This module keeps HyperMesh running between evaluations. The class HmSession
+starts hmbatch once with a small server script (SERVER_TCL): the launching
+block of the macro (template, menu filters...) is run at start-up, then the
+server reads job lines from stdin. Each job is the path of a TCL fragment
+written by 'tcl_writer_p' without the launching block; the server runs it
+in the folder of the evaluation, resets the model with *deletemodel and
+answers on stdout. The class HmPool holds several sessions and hands them out
+to the callers.
+If a job fails the server reports the TCL error; if HyperMesh does not answer
+before the timeout, or the process dies, the session is restarted and the job
+repeated.
+Any Tcl interpreter can replace hmbatch ('command' argument): with
+'stub=True' the HyperMesh commands (*...) are accepted and ignored, except
+*writefile and *feoutputwithdata which create empty files, so 'tclsh' can
+stand in for HyperMesh in tests.
+'''
+
+import atexit
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import PIPE, STDOUT
+
+import tool_paths
+from tcl_writer_p import LAUNCH
+
+
+READY = 'HM_READY'
+DONE = 'HM_DONE'
+FAILED = 'HM_FAILED'
+
+
+SERVER_TCL = '''
+# HyperMesh batch server written by hm_session.py.
+# The fragments are run one command at a time, as in the command window: a
+# 'return' at the top level ends that command only, not the whole job.
+proc hm_source {path} {
+    set f [open $path]
+    set text [read $f]
+    close $f
+    set command ""
+    foreach line [split $text "\n"] {
+        append command $line "\n"
+        if {[info complete $command]} {
+            if {[catch {uplevel #0 $command} message] == 1} {
+                return -code error $message
+            }
+            set command ""
+        }
+    }
+}
+fconfigure stdin -buffering line
+fconfigure stdout -buffering line
+puts "''' + READY + '''"
+flush stdout
+while {[gets stdin line] >= 0} {
+    set cmd [lindex $line 0]
+    if {$cmd eq "QUIT"} {
+        break
+    }
+    if {$cmd ne "JOB"} {
+        continue
+    }
+    set job [lindex $line 1]
+    cd [lindex $line 2]
+    if {[catch {hm_source [lindex $line 3]} message]} {
+        puts "''' + FAILED + ''' $job [string map {"\\n" " "} $message]"
+    } else {
+        puts "''' + DONE + ''' $job"
+    }
+    catch {*deletemodel}
+    flush stdout
+}
+'''
+
+
+STUB_TCL = '''
+# Stand-in for the HyperMesh commands (hm_session.py, stub=True).
+proc unknown {cmd args} {
+    if {[string index $cmd 0] ne "*"} {
+        error "invalid command name \\"$cmd\\""
+    }
+    switch -- $cmd {
+        *writefile {close [open [lindex $args 0] w]}
+        *feoutputwithdata {close [open [lindex $args 1] w]}
+    }
+    return
+}
+proc hm_elemlist {args} {
+    return {}
+}
+'''
+
+
+class HmError(RuntimeError):
+    pass
+
+
+class HmTimeout(HmError):
+    pass
+
+
+def _tcl_path(path):
+    '''
+    Path as a braced Tcl word, with forward slashes.
+    '''
+    return '{' + os.path.abspath(path).replace('\\', '/') + '}'
+
+
+class HmSession:
+
+    def __init__(self, command=None, stub=False, timeout=600., retries=1,
+                 server_dir=None):
+        '''
+        The class HmSession keeps one HyperMesh batch process alive.
+
+        Args:
+        command :           command line before the script, default
+                            [tool_paths.hypermesh_exe, '-b', '-tcl']. For
+                            tests e.g. ['tclsh'].
+        stub :              if True the stand-in HyperMesh commands are
+                            defined before the server loop.
+        timeout :           time [s] after which a job is considered lost.
+        retries :           how many times a job is repeated after a restart.
+        server_dir :        folder of the server script (a temporary folder
+                            by default).
+        '''
+        if command is None:
+            command = [tool_paths.hypermesh_exe, '-b', '-tcl']
+        self.command = list(command)
+        self.stub = stub
+        self.timeout = timeout
+        self.retries = retries
+        self.server_dir = tempfile.mkdtemp(prefix='hm_', dir=server_dir)
+        self.process = None
+        self.n_jobs = 0
+        self.n_restarts = 0
+        self._lines = None
+
+    def _read(self, stream, lines):
+        '''
+        Runs in a thread and puts the lines printed by HyperMesh in the
+        queue. None marks the end of the output.
+        '''
+        for line in stream:
+            lines.put(line.decode(errors='replace').rstrip('\r\n'))
+        lines.put(None)
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """
+        Writes the server script, launches HyperMesh and waits until the
+        launching block has run.
+        """
+        script = os.path.join(self.server_dir, 'hm_server.tcl')
+        with open(script, 'w') as f:
+            if self.stub:
+                f.write(STUB_TCL)
+            f.write(LAUNCH.render({}) + '\n')
+            f.write(SERVER_TCL)
+        self._lines = queue.Queue()
+        self.process = subprocess.Popen(self.command + [script], stdin=PIPE,
+                                        stdout=PIPE, stderr=STDOUT,
+                                        cwd=self.server_dir)
+        reader = threading.Thread(target=self._read,
+                                  args=(self.process.stdout, self._lines),
+                                  daemon=True)
+        reader.start()
+        self._wait(READY, self.timeout)
+
+    def close(self):
+        """
+        Stops the server. The process is killed if it does not stop by itself.
+        """
+        if self.alive():
+            try:
+                self.process.stdin.write(b'QUIT\n')
+                self.process.stdin.flush()
+                self.process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        shutil.rmtree(self.server_dir, ignore_errors=True)
+
+    def restart(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.n_restarts += 1
+        self.start()
+
+    def _wait(self, token, timeout, job=None):
+        '''
+        Reads the output until the line starting with 'token' (followed by
+        the job number, if given). Gives back the lines read and the last
+        one.
+        '''
+        output = []
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                raise HmTimeout('HyperMesh did not answer in {} s'.format(timeout))
+            if line is None:
+                self.process.wait()
+                raise HmError('HyperMesh exited with code {}'.format(
+                    self.process.returncode))
+            words = line.split(None, 2)
+            if words and words[0] in (token, FAILED) and (
+                    job is None or (len(words) > 1 and words[1] == str(job))):
+                return output, line
+            output.append(line)
+
+    def run(self, tcl_file, work_dir, output_files=(), timeout=None):
+        """
+        Runs a TCL fragment in 'work_dir' and waits for the end of the job.
+
+        Args:
+        tcl_file :          the fragment, written by 'tcl_writer' with
+                            prologue=False.
+        work_dir :          folder of the evaluation (relative paths of the
+                            fragment refer to it).
+        output_files :      files written by the fragment in 'work_dir'. The
+                            old ones are removed first and their presence is
+                            checked at the end.
+        timeout :           overrides the timeout of the session.
+
+        Returns:
+        output :            what HyperMesh printed during the job.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        for attempt in range(self.retries + 1):
+            try:
+                if not self.alive():
+                    self.restart()
+                for name in output_files:
+                    path = os.path.join(work_dir, name)
+                    if os.path.exists(path):
+                        os.remove(path)
+                job = self.n_jobs + 1
+                self.process.stdin.write('JOB {} {} {}\n'.format(
+                    job, _tcl_path(work_dir), _tcl_path(tcl_file)).encode())
+                self.process.stdin.flush()
+                output, status = self._wait(DONE, timeout, job)
+                self.n_jobs += 1
+                break
+            except (HmError, OSError):
+                if attempt == self.retries:
+                    raise
+                '''
+                As in 'AvlSession.run', HyperMesh is started again at the top
+                of the next attempt, so a failed restart is retried too.
+                '''
+                if self.process is not None:
+                    self.process.kill()
+                    self.process.wait()
+        '''
+        A TCL error is not repeated: the same fragment would fail again.
+        '''
+        if status.startswith(FAILED):
+            raise HmError('job {} failed: {}'.format(tcl_file, status.split(None, 2)[-1]))
+        missing = [name for name in output_files
+                   if not os.path.exists(os.path.join(work_dir, name))]
+        if missing:
+            raise HmError('job {} did not write {}'.format(tcl_file, ', '.join(missing)))
+        return '\n'.join(output)
+
+
+class HmPool:
+
+    def __init__(self, n_sessions=1, **options):
+        '''
+        The class HmPool holds 'n_sessions' HyperMesh sessions. The keyword
+        'options' are passed to HmSession. The sessions are started lazily,
+        on their first job.
+        '''
+        self.sessions = [HmSession(**options) for i in range(n_sessions)]
+        self._idle = queue.Queue()
+        for session in self.sessions:
+            self._idle.put(session)
+
+    def run(self, tcl_file, work_dir, output_files=(), timeout=None):
+        """
+        Runs 'HmSession.run' on the first free session. It can be called from
+        several threads at the same time.
+        """
+        session = self._idle.get()
+        try:
+            return session.run(tcl_file, work_dir, output_files, timeout)
+        finally:
+            self._idle.put(session)
+
+    def run_many(self, jobs):
+        """
+        Runs a list of jobs (tcl_file, work_dir, output_files) on all the
+        sessions and returns the outputs in the same order.
+        """
+        with ThreadPoolExecutor(max_workers=len(self.sessions)) as executor:
+            futures = [executor.submit(self.run, *job) for job in jobs]
+            return [future.result() for future in futures]
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+'''
+One pool per process, shared by the evaluations run in that process (see
+'evaluation.py', option 'persistent_hm').
+'''
+_shared_pool = None
+
+
+def shared_pool(n_sessions=1):
+    """
+    Gives back the HmPool of the current process, creating it on the first
+    call.
+    """
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = HmPool(n_sessions)
+        atexit.register(_shared_pool.close)
+    return _shared_pool
@@ -0,0 +1,223 @@
+'''
+Created on 18 Oct 2026
+This module writes 'box.iges' without FreeCAD. It builds the same geometry as
+the macro of 'FCMacro_writer': for each of the 5 sections an upper and a lower
+cubic B-spline interpolating the box points (10 splines), the 8 skin ruled
+surfaces between the splines of adjacent sections, the 8 spar ruled
+surfaces (front and rear spar of each bay) between the straight edges of the
+skin and the root and tip caps. With another BoxLayout the counts change
+and the ids are given by 'BoxLayout.manifest'. The curves are written as
+IGES entities 126 (rational B-spline curve) and 110 (line), the surfaces as
+entities 118 (ruled surface), in the order of 'FCMacro_writer.export_iges'.
+All the sections are scaled copies of the same airfoil points, so with the
+chord-length parametrisation their splines share the knot vector and the
+ruled surfaces join points with the same parameter.
+'''
+
+import os
+import time
+
+import numpy as np
+from scipy.interpolate import make_interp_spline
+
+from FCMacro_writer import FCMacro_writer
+
+
+def _real(value):
+    '''
+    Real number in the IGES format (a decimal point is always present).
+    '''
+    text = repr(float(value)).upper()
+    if '.' not in text:
+        text = text.replace('E', '.E') if 'E' in text else text + '.'
+    return text
+
+
+def _string(text):
+    '''
+    Hollerith string; an empty string is an empty (default) field.
+    '''
+    return '{}H{}'.format(len(text), text) if text else ''
+
+
+class IgesWriter:
+
+    def __init__(self, file_name='box.iges', units='MM'):
+        '''
+        The class IgesWriter collects the entities and writes the five
+        sections of the IGES file (Start, Global, Directory, Parameter,
+        Terminate) with a single call.
+        '''
+        self.file_name = file_name
+        self.units = units
+        self.entities = []
+
+    def add(self, entity_type, params, form=0, dependent=False):
+        """
+        Adds an entity and gives back its directory pointer (the sequence
+        number of its first directory line), used to reference it.
+
+        Args:
+        entity_type :       IGES entity number.
+        params :            list of the parameters (numbers are written as
+                            reals, integers as integers).
+        form :              form number.
+        dependent :         True for the curves used only by a surface.
+        """
+        self.entities.append((entity_type, params, form, dependent))
+        return 2*len(self.entities) - 1
+
+    @staticmethod
+    def _format(value):
+        if isinstance(value, (int, np.integer)):
+            return str(int(value))
+        if isinstance(value, str):
+            return value
+        return _real(value)
+
+    @staticmethod
+    def _lines(tokens, width):
+        '''
+        Packs the tokens in lines of at most 'width' characters; a token is
+        never split.
+        '''
+        lines = ['']
+        for token in tokens:
+            if len(lines[-1]) + len(token) > width:
+                lines.append('')
+            lines[-1] += token
+        return lines
+
+    def _global(self):
+        date = time.strftime('%Y%m%d.%H%M%S')
+        params = [_string(','), _string(';'), _string('box'), _string(self.file_name),
+                  _string('iges_writer'), _string('1.0'), 32, 38, 6, 308, 15,
+                  _string('box'), 1.0, 2 if self.units == 'MM' else 1,
+                  _string(self.units), 1, 1.0, _string(date), 1e-6, 1e5,
+                  _string(''), _string(''), 11, 0, _string(date)]
+        tokens = [self._format(p) + ',' for p in params]
+        tokens[-1] = tokens[-1][:-1] + ';'
+        return self._lines(tokens, 72)
+
+    def text(self):
+        """
+        The whole IGES file as a string.
+        """
+        start = ['IGES file of the wing box written by iges_writer.py']
+        glob = self._global()
+        directory = []
+        parameter = []
+        for k, (entity_type, params, form, dependent) in enumerate(self.entities):
+            de = 2*k + 1
+            tokens = [self._format(v) + ',' for v in [entity_type] + list(params)]
+            tokens[-1] = tokens[-1][:-1] + ';'
+            lines = self._lines(tokens, 64)
+            first = len(parameter) + 1
+            parameter += ['{:<64} {:>7}P{:>7}'.format(line, de, first + i)
+                          for i, line in enumerate(lines)]
+            status = '00010000' if dependent else '00000000'
+            directory.append('{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}D{:>7}'.format(
+                entity_type, first, 0, 0, 0, 0, 0, 0, status, de))
+            directory.append('{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}{:>8}D{:>7}'.format(
+                entity_type, 0, 0, len(lines), form, '', '', '', 0, de + 1))
+        out = ['{:<72}S{:>7}'.format(line, i + 1) for i, line in enumerate(start)]
+        out += ['{:<72}G{:>7}'.format(line, i + 1) for i, line in enumerate(glob)]
+        out += directory + parameter
+        out.append('S{:>7}G{:>7}D{:>7}P{:>7}{:>40}T{:>7}'.format(
+            len(start), len(glob), len(directory), len(parameter), '', 1))
+        return '\n'.join(out) + '\n'
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            f.write(self.text())
+
+
+def interpolate(points):
+    """
+    Cubic B-spline interpolating the points with the chord-length
+    parametrisation, as the splines of the macro.
+
+    Args:
+    points :            n x 3 array.
+
+    Returns:
+    knots :             knot vector (n + 4 values) on [0, 1].
+    control :           n x 3 array of control points.
+    """
+    t = np.concatenate(([0], np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))))
+    t /= t[-1]
+    spline = make_interp_spline(t, points, k=3)
+    return spline.t, spline.c
+
+
+def section_curves(desvec, airfoil_file, layout=None, inputs_dir=None):
+    """
+    Points of the splines of the macro (upper and lower spline of each
+    section) in the global frame [mm].
+
+    Returns:
+    curves :            list of n x 3 arrays, in the order of the splines of
+                        'FCMacro_writer.airfoil_points'.
+    """
+    box, (yle, xle, chords) = FCMacro_writer(desvec, airfoil_file, layout,
+                                             inputs_dir).geometry()
+    curves = []
+    for j in range(len(yle)):
+        for column in (1, 3):
+            curves.append(np.column_stack((xle[j] + chords[j]*box[:, 0],
+                                           np.full(len(box), float(yle[j])),
+                                           chords[j]*box[:, column])))
+    return curves
+
+
+def write_box_iges(desvec, airfoil_file, out_dir, file_name='box.iges',
+                   layout=None, inputs_dir=None):
+    """
+    Writes the IGES file of the box: skin, spar and cap ruled surfaces, as
+    'FCMacro_writer.export_iges'. 'layout' is a BoxLayout (default 5
+    sections), 'inputs_dir' the folder of the airfoil file (see
+    'FCMacro_writer').
+
+    Returns:
+    path :              path of the file.
+    """
+    curves = section_curves(desvec, airfoil_file, layout, inputs_dir)
+    iges = IgesWriter(file_name)
+
+    splines = []
+    for points in curves:
+        knots, control = interpolate(points)
+        n = len(control)
+        params = ([n - 1, 3, 1, 0, 1, 0] + list(knots) + [1.0]*n +
+                  list(control.ravel()) + [0.0, 1.0, 0.0, 1.0, 0.0])
+        splines.append(iges.add(126, params, dependent=True))
+
+    '''
+    Skin: ruled surface k joins the splines k and k+2 (upper and lower side of
+    each bay).
+    '''
+    for k in range(len(curves) - 2):
+        iges.add(118, [splines[k], splines[k+2], 0, 0], form=1)
+
+    '''
+    Spars: for each bay the front edges (first points) and the rear edges
+    (last points) of the upper and lower skin are joined.
+    '''
+    for bay in range(len(curves)//2 - 1):
+        for end in (0, -1):
+            lines = []
+            for side in (0, 1):
+                start = curves[2*bay + side][end]
+                stop = curves[2*bay + 2 + side][end]
+                lines.append(iges.add(110, list(start) + list(stop), dependent=True))
+            iges.add(118, [lines[0], lines[1], 0, 1], form=1)
+
+    '''
+    Caps: upper and lower spline of the root and of the tip section.
+    '''
+    for upper in (0, len(curves) - 2):
+        iges.add(118, [splines[upper], splines[upper+1], 0, 1], form=1)
+
+    path = os.path.join(out_dir, file_name)
+    iges.write(path)
+    return path
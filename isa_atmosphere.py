@@ -1,16 +1,29 @@
 '''
 Created on 12 Dec 2017
-This module contains the class IsaAtmosphere which computes the atmospheric 
-values at a iven altitude. 
+This module contains the class IsaAtmosphere which computes the atmospheric
+values at a iven altitude.
+The altitude can be a number or an array of altitudes; all the layers of the
+standard atmosphere up to 84852 m are covered. The class AtmosphereTable
+interpolates precomputed values for sweeps over many flight conditions.
 @author: ng6a38a
 '''
 import numpy as np
 
+
+'''
+Layers of the standard atmosphere: base altitude [m] and temperature
+gradient [K/m].
+'''
+LAYER_ALTITUDES = np.array([0., 11000., 20000., 32000., 47000., 51000., 71000.])
+LAYER_GRADIENTS = np.array([-0.0065, 0., 0.001, 0.0028, 0., -0.0028, -0.002])
+TOP_ALTITUDE = 84852.
+
+
 class IsaAtmosphere:
-    
+
     def __init__(self, altitude):
         '''
-        The class IsaAtmosphere computes the values of pressure, temperature, 
+        The class IsaAtmosphere computes the values of pressure, temperature,
         density, speed of sound at a given altitude in meters.
         '''
         self.altitude = altitude         #[m]
@@ -21,42 +34,130 @@ class IsaAtmosphere:
         self.PRESSURE_sl = 101325        #[Pa]
         self.DENSITY_sl = 1.225          #[kg/m3]
         self.a = -0.0065                 #[K/m]
-        
-        if self.altitude > 11000:
-            print('Out of Troposphere')
-            
+        self._values = None
+
+        if np.any(np.asarray(altitude) > TOP_ALTITUDE):
+            print('Out of Standard Atmosphere')
+
     def sea_level_values(self):
         """
         Gives back the value at sea level.
         """
         return self.TEMPERATURE_sl, self.PRESSURE_sl, self.DENSITY_sl
-        
+
+    def layer_values(self):
+        """
+        Temperature and pressure at the base of each layer, integrating the
+        layers from sea level with the constants of the class.
+        """
+        temperatures = np.zeros(len(LAYER_ALTITUDES))
+        pressures = np.zeros(len(LAYER_ALTITUDES))
+        temperatures[0] = self.TEMPERATURE_sl
+        pressures[0] = self.PRESSURE_sl
+        for k in range(1, len(LAYER_ALTITUDES)):
+            temperatures[k], pressures[k] = self._in_layer(
+                LAYER_ALTITUDES[k], LAYER_ALTITUDES[k-1], LAYER_GRADIENTS[k-1],
+                temperatures[k-1], pressures[k-1])
+        return temperatures, pressures
+
+    def _in_layer(self, altitude, base, gradient, base_temperature, base_pressure):
+        temperature = base_temperature + gradient * (altitude - base)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pressure = np.where(gradient == 0,
+                                base_pressure * np.exp(-self.g * (altitude - base) /
+                                                       (self.R * base_temperature)),
+                                base_pressure * (temperature / base_temperature)**
+                                (-self.g / (self.R * np.where(gradient == 0, 1, gradient))))
+        return temperature, pressure
+
+    def compute_all(self):
+        """
+        Computes temperature, pressure, density and speed of sound in one
+        pass. The values are kept, so the single compute_ functions do not
+        compute them again.
+
+        Returns:
+        temperature :       [K]
+        pressure :          [Pa]
+        density :           [kg/m3]
+        sound_speed :       [m/s]
+        Numbers for a number altitude, arrays for an array of altitudes.
+        """
+        if self._values is not None and np.array_equal(self._values[0], self.altitude):
+            return self._values[1]
+        altitude = np.asarray(self.altitude, dtype=float)
+        temperatures, pressures = self.layer_values()
+        k = np.clip(np.searchsorted(LAYER_ALTITUDES, altitude, side='right') - 1,
+                    0, None)
+        temperature, pressure = self._in_layer(altitude, LAYER_ALTITUDES[k],
+                                               LAYER_GRADIENTS[k], temperatures[k],
+                                               pressures[k])
+        density = pressure / (self.R * temperature)
+        sound_speed = np.sqrt(self.gamma * self.R * temperature)
+        values = (temperature, pressure, density, sound_speed)
+        if altitude.ndim == 0:
+            values = tuple(float(v) for v in values)
+        self._values = (np.copy(self.altitude), values)
+        return values
+
     def compute_temperature(self):
         """
-        Compute the temperature in the troposphere.
+        Compute the temperature.
         """
-        temperature = self.TEMPERATURE_sl + self.a * self.altitude
-        #print(temperature)
-        return temperature
-    
+        return self.compute_all()[0]
+
     def compute_pressure(self):
         """
-        Compute the pressure in the troposphere.
-        """        
-        pressure = self.PRESSURE_sl * (self.compute_temperature() / \
-                   self.TEMPERATURE_sl)**(-self.g / (self.R * self.a))
-        return pressure
-     
+        Compute the pressure.
+        """
+        return self.compute_all()[1]
+
     def compute_density(self):
         """
-        Compute the density in the troposphere.
-        """        
-        density = self.compute_pressure() / (self.R * self.compute_temperature())
-        return density
-    
+        Compute the density.
+        """
+        return self.compute_all()[2]
+
     def compute_sound_speed(self):
-        sound_speed = np.sqrt(self.gamma * self.R * self.compute_temperature())
-        return sound_speed
-        
-             
-        
\ No newline at end of file
+        return self.compute_all()[3]
+
+
+class AtmosphereTable:
+
+    def __init__(self, z_max=20000, step=10.):
+        '''
+        The class AtmosphereTable computes the atmosphere once on a grid of
+        altitudes from 0 to 'z_max' every 'step' meters and interpolates it:
+        linearly for temperature and speed of sound, linearly in the logarithm
+        for pressure and density, which are exponential within a layer.
+        The layer bases are points of the grid, so there is no error from the
+        change of gradient.
+        '''
+        grid = np.arange(0, z_max + step, step)
+        grid = np.union1d(grid, LAYER_ALTITUDES[LAYER_ALTITUDES <= z_max])
+        self.altitudes = grid
+        temperature, pressure, density, sound_speed = IsaAtmosphere(grid).compute_all()
+        self.temperature = temperature
+        self.log_pressure = np.log(pressure)
+        self.log_density = np.log(density)
+        self.sound_speed = sound_speed
+
+    def compute_all(self, altitude):
+        """
+        Interpolated temperature, pressure, density and speed of sound at
+        'altitude' (number or array). Altitudes outside the table are
+        computed exactly.
+        """
+        z = np.atleast_1d(np.asarray(altitude, dtype=float))
+        values = (np.interp(z, self.altitudes, self.temperature),
+                  np.exp(np.interp(z, self.altitudes, self.log_pressure)),
+                  np.exp(np.interp(z, self.altitudes, self.log_density)),
+                  np.interp(z, self.altitudes, self.sound_speed))
+        outside = (z < self.altitudes[0]) | (z > self.altitudes[-1])
+        if np.any(outside):
+            exact = IsaAtmosphere(z[outside]).compute_all()
+            for value, exact_value in zip(values, exact):
+                value[outside] = exact_value
+        if np.ndim(altitude) == 0:
+            values = tuple(float(v[0]) for v in values)
+        return values
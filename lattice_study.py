@@ -0,0 +1,92 @@
+'''
+Created on 18 Oct 2026
+This module runs the lattice convergence study of AVL. The same wing is
+solved with increasing numbers of vortices (chordwise x spanwise), all the
+lattices at the same time in a pool of AVL sessions. CL, CD and the load of
+each bay are compared with the finest lattice and the cheapest lattice within
+the tolerance is chosen. The optimiser can run the first iterations on that
+lattice ('resolution' option of 'evaluate_design') and the last ones on the
+fine one.
+'''
+
+import os
+
+import numpy as np
+
+from airfoil_registry import avl_airfoil
+from avl_output import integrate_strips
+from avl_output_p import get_efficiency
+from avl_parser import AvlResult
+from avl_session import AvlPool
+from avl_writer import avl_writer
+
+
+def convergence_study(desvec, work_dir, resolutions=((5, 10), (10, 20), (20, 40), (30, 60)),
+                      Mach=0.85, CL=0.5, tol=0.01, n_bays=4, pool=None,
+                      inputs_dir=None):
+    """
+    This function solves the wing on every lattice of 'resolutions' and
+    compares the results with the finest one.
+
+    Args:
+    desvec :            is the design vector.
+    work_dir :          folder of the study. Each lattice has its own folder.
+    resolutions :       list of (Nchordwise, Nspanwise).
+    Mach, CL :          operating point.
+    tol :               relative tolerance on CL, CD and on the bay loads.
+    n_bays :            number of load bays used to compare the pressure
+                        fields of different lattices.
+    pool :              an AvlPool. If None a pool with one session per
+                        lattice is started and closed at the end.
+    inputs_dir :        folder containing 'crm.txt'. Default is 'Inputs' in
+                        the current working directory.
+
+    Returns:
+    study :             record array, one row per lattice ordered by cost, with
+                        the fields Nchordwise, Nspanwise, CL, CD and the
+                        relative differences dCL, dCD, dload.
+    resolution :        the cheapest (Nchordwise, Nspanwise) within 'tol'.
+    """
+    if inputs_dir is None:
+        inputs_dir = os.path.join(os.getcwd(), 'Inputs')
+    resolutions = sorted((tuple(r) for r in resolutions), key=lambda r: r[0]*r[1])
+
+    jobs = []
+    for Nc, Ns in resolutions:
+        folder = os.path.join(work_dir, 'lattice_{}x{}'.format(Nc, Ns))
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        avl_writer(desvec, Mach, folder, 'wing.avl', (Nc, Ns))
+        jobs.append((os.path.join(folder, 'wing.avl'), [dict(CL=CL)], folder,
+                     ['results.txt']))
+
+    own_pool = pool is None
+    if own_pool:
+        pool = AvlPool(len(resolutions), inputs=[avl_airfoil(inputs_dir)])
+    try:
+        paths = pool.solve_many(jobs)
+    finally:
+        if own_pool:
+            pool.close()
+
+    results = [AvlResult.from_file(path[0]) for path in paths]
+    aero = np.array([get_efficiency(result, None) for result in results])
+    loads = np.array([integrate_strips(result.wing_strips(), n_bays)
+                      for result in results])
+
+    study = np.recarray(len(resolutions),
+                        dtype=[('Nchordwise', int), ('Nspanwise', int),
+                               ('CL', float), ('CD', float), ('dCL', float),
+                               ('dCD', float), ('dload', float)])
+    study.Nchordwise = [r[0] for r in resolutions]
+    study.Nspanwise = [r[1] for r in resolutions]
+    study.CL = aero[:, 0]
+    study.CD = aero[:, 1]
+    study.dCL = np.abs(aero[:, 0] - aero[-1, 0]) / abs(aero[-1, 0])
+    study.dCD = np.abs(aero[:, 1] - aero[-1, 1]) / abs(aero[-1, 1])
+    study.dload = (np.abs(loads - loads[-1]).max(axis=1) /
+                   np.abs(loads[-1]).max())
+
+    converged = (study.dCL <= tol) & (study.dCD <= tol) & (study.dload <= tol)
+    chosen = int(np.argmax(converged))
+    return study, resolutions[chosen]
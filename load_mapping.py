@@ -0,0 +1,147 @@
+'''
+Created on 18 Oct 2026
+This module maps the aerodynamic pressure on the skin of the FE model without
+HyperMesh. The centroids and normals of the shell elements of the upper skin
+are computed from 'box.fem' ('fem_io.FemMesh'); the pressure of
+'avl_output_p.get_pressure' (x, y [mm], z, DP [MPa]) is interpolated at the
+centroids with the inverse distance weighting of the nearest AVL points
+(a KD-tree on the planform coordinates) and written as PLOAD4 cards.
+The AVL lattice is flat, so only x and y are used. The sign of each
+pressure follows the normal of the element, so the load always points
+upwards (positive DP) whatever the orientation of the elements.
+'''
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from fem_io import FemMesh, format_real
+from fem_patch import patch_fem
+
+
+LOADED_COMPONENT = 'Skin_up'
+
+
+def element_geometry(mesh, rows=None):
+    """
+    Centroids, unit normals and areas of shell elements.
+
+    Args:
+    mesh :              a FemMesh.
+    rows :              rows of the shell arrays (default all the shells).
+
+    Returns:
+    centroids :         m x 3 array.
+    normals :           m x 3 array, unit normals (right-hand rule on the
+                        node order, as PLOAD4).
+    areas :             (m,) array.
+    """
+    if rows is None:
+        rows = mesh.shells()
+    nodes = mesh.shell_nodes[rows]
+    quad = nodes[:, 3] >= 0
+    '''
+    For the triangles the third node is used twice: the diagonals of the
+    degenerate quadrilateral give the same normal and area.
+    '''
+    corners = np.where(quad[:, None], nodes, nodes[:, [0, 1, 2, 2]])
+    points = mesh.xyz[corners]
+    centroids = np.where(quad[:, None], points.mean(axis=1), points[:, :3].mean(axis=1))
+    cross = np.cross(points[:, 2] - points[:, 0], points[:, 3] - points[:, 1])
+    norm = np.linalg.norm(cross, axis=1)
+    normals = cross / np.where(norm > 0, norm, 1)[:, None]
+    return centroids, normals, 0.5*norm
+
+
+class PressureMapper:
+
+    def __init__(self, pressure, n_neighbours=4, power=2):
+        '''
+        The class PressureMapper interpolates the AVL pressure.
+
+        Args:
+        pressure :          n_points x 4 array of 'get_pressure'.
+        n_neighbours :      number of AVL points used for each element.
+        power :             exponent of the inverse distance weights.
+        '''
+        self.points = np.asarray(pressure[:, :2], dtype=float)
+        self.values = np.asarray(pressure[:, 3], dtype=float)
+        self.tree = cKDTree(self.points)
+        self.n_neighbours = min(n_neighbours, len(self.points))
+        self.power = power
+
+    def __call__(self, xy):
+        """
+        Pressure at the points 'xy' (m x 2 or m x 3 array, z not used).
+        """
+        xy = np.asarray(xy, dtype=float)[:, :2]
+        distances, index = self.tree.query(xy, k=self.n_neighbours)
+        distances = distances.reshape(len(xy), -1)
+        index = index.reshape(len(xy), -1)
+        with np.errstate(divide='ignore'):
+            weights = 1 / distances**self.power
+        '''
+        A point on an AVL point takes its value.
+        '''
+        exact = distances[:, 0] == 0
+        weights[exact] = 0
+        weights[exact, 0] = 1
+        return (weights*self.values[index]).sum(axis=1) / weights.sum(axis=1)
+
+
+def pload4_cards(eids, pressures, sid=2):
+    """
+    Small-field PLOAD4 cards (one per element, uniform pressure) as a string.
+    """
+    return ''.join('PLOAD4  {:>8}{:>8}{:>8}\n'.format(sid, eid, format_real(p))
+                   for eid, p in zip(np.asarray(eids).tolist(), pressures))
+
+
+def map_pressure(mesh, pressure, component=LOADED_COMPONENT, scale=1.,
+                 n_neighbours=4, all_shells=False):
+    """
+    Pressure on the elements of the loaded skin.
+
+    Args:
+    mesh :              a FemMesh or the path of the .fem file.
+    pressure :          the array of 'get_pressure'.
+    component :         name of the loaded component. A ValueError is
+                        raised if the deck does not have it.
+    scale :             factor on the pressure.
+    all_shells :        if True a deck without the component (e.g. without
+                        the '$HMNAME' comments) has the pressure mapped on
+                        all its shells. Only for decks made of the loaded
+                        skin: the sign follows each normal, so any other
+                        shell would be loaded upwards too.
+
+    Returns:
+    eids :              ids of the loaded elements.
+    pressures :         PLOAD4 pressures [MPa].
+    """
+    if not isinstance(mesh, FemMesh):
+        mesh = FemMesh(mesh)
+    if component in mesh.components:
+        rows = mesh.shells(mesh.components[component])
+    elif all_shells:
+        print('Component {} not found: the pressure is mapped on all the shells'.format(component))
+        rows = mesh.shells()
+    else:
+        raise ValueError('component {} not found in the deck (components: {})'.format(
+            component, ', '.join(sorted(mesh.components)) or 'none'))
+    centroids, normals, areas = element_geometry(mesh, rows)
+    pressures = scale*PressureMapper(pressure, n_neighbours)(centroids)
+    pressures *= np.where(normals[:, 2] < 0, -1, 1)
+    return mesh.shell_ids[rows], pressures
+
+
+def write_loads(fem_file, pressure, sid=2, **options):
+    """
+    Maps the pressure on the deck 'fem_file' and replaces the PLOAD4 cards of
+    the set 'sid' (see 'fem_patch.patch_fem'). The keyword 'options' are
+    passed to 'map_pressure'.
+
+    Returns:
+    eids, pressures :   as 'map_pressure'.
+    """
+    eids, pressures = map_pressure(fem_file, pressure, **options)
+    patch_fem(fem_file, loads=pload4_cards(eids, pressures, sid), sid=sid)
+    return eids, pressures
@@ -0,0 +1,321 @@
+'''
+Created on 18 Oct 2026
+This module reuses a baseline FE mesh for a new planform instead of importing
+the IGES and meshing again in HyperMesh. The box is built section by section
+(x = xle + chord*x_airfoil, z = chord*z_airfoil, see 'iges_writer.py') with
+leading edge and chord piecewise linear from root to kink and from kink to
+tip ('planform.interpolate', the law of 'FCMacro_writer.make_sections').
+Each node of the baseline mesh gets the same coordinates in that frame on
+the new planform: the spanwise position within its panel, the chordwise
+fraction x/c and the thickness fraction z/c. Skin, spars and ribs stay on
+their surfaces, so the only question is how much the elements are
+distorted. The tetrahedra (and the shells, checked as triangles) are
+compared with the baseline: no element may be inverted, the mean-ratio
+quality must stay above a floor and may not drop by more than a given
+fraction, and the element size may not change by more than a factor. When
+one of these fails the design is meshed by HyperMesh and its deck becomes a
+new baseline (MorphLibrary).
+'''
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+
+from fem_io import BulkData
+from fem_patch import patch_grids
+from planform import interpolate
+
+
+DECK_FILE = 'baseline.fem'
+DESVEC_FILE = 'desvec.json'
+
+'''
+Relative tolerance of the quality checks: the round-off of the mapping must
+not reject a mesh, and the identity morph is always accepted.
+'''
+RTOL = 1e-6
+
+
+def morph_nodes(xyz, base_desvec, desvec):
+    """
+    Maps nodes of the box of 'base_desvec' onto the box of 'desvec'.
+
+    Args:
+    xyz :               n x 3 coordinates [mm] (y spanwise).
+    base_desvec :       design vector of the mesh.
+    desvec :            new design vector.
+
+    Returns:
+    xyz :               n x 3 new coordinates.
+    """
+    p0 = np.asarray(base_desvec, dtype=float)
+    p = np.asarray(desvec, dtype=float)
+    x, y, z = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+    '''
+    Root, kink and tip are mapped on root, kink and tip, linearly in
+    between: the ribs of each panel stay evenly spaced, as in 'BoxLayout'.
+    '''
+    new_y = np.interp(y, [0, p0[5], p0[6]], [0, p[5], p[6]])
+    xle0, chords0 = interpolate(p0, y)
+    xle, chords = interpolate(p, new_y)
+    return np.column_stack((xle + chords*(x - xle0)/chords0, new_y, chords*z/chords0))
+
+
+def tet_quality(xyz, tets):
+    """
+    Signed volumes and mean-ratio quality (1 for the regular tetrahedron, 0
+    for a flat one) of tetrahedra given by the rows of their 4 corner nodes.
+    """
+    points = xyz[tets]
+    edges = points[:, 1:] - points[:, :1]
+    volumes = np.einsum('ij,ij->i', edges[:, 0], np.cross(edges[:, 1], edges[:, 2])) / 6
+    lengths = (edges**2).sum(axis=(1, 2))
+    for a, b in ((1, 2), (1, 3), (2, 3)):
+        lengths += ((points[:, a] - points[:, b])**2).sum(axis=1)
+    return volumes, 12*(3*np.abs(volumes))**(2/3) / lengths
+
+
+def tria_quality(xyz, trias):
+    """
+    Area vectors (m x 3) and mean-ratio quality of triangles given by the
+    rows of their nodes.
+    """
+    points = xyz[trias]
+    areas = np.cross(points[:, 1] - points[:, 0], points[:, 2] - points[:, 0]) / 2
+    lengths = sum(((points[:, a] - points[:, b])**2).sum(axis=1)
+                  for a, b in ((0, 1), (1, 2), (2, 0)))
+    return areas, 4*np.sqrt(3)*np.linalg.norm(areas, axis=1) / lengths
+
+
+class MorphReport:
+
+    def __init__(self, baseline, n_elements, n_inverted, n_poor, min_quality,
+                 max_distortion, max_scale, accepted):
+        '''
+        The class MorphReport describes a morphed mesh.
+
+        Attributes:
+        baseline :          folder (or deck) of the baseline.
+        n_elements :        elements checked (tetrahedra and triangles).
+        n_inverted :        elements turned inside out.
+        n_poor :            elements which crossed the quality floor, or
+                            were already below it and lost more than the
+                            accepted distortion.
+        min_quality :       lowest mean-ratio quality.
+        max_distortion :    largest relative loss of quality, 1 - q/q_base.
+        max_scale :         largest change of element size (>= 1, either
+                            way).
+        accepted :          True if the mesh can be used.
+        '''
+        self.baseline = baseline
+        self.n_elements = n_elements
+        self.n_inverted = n_inverted
+        self.n_poor = n_poor
+        self.min_quality = min_quality
+        self.max_distortion = max_distortion
+        self.max_scale = max_scale
+        self.accepted = accepted
+
+    def __repr__(self):
+        return ('MorphReport(inverted={}, poor={}, min_quality={:.3f}, '
+                'max_distortion={:.3f}, max_scale={:.3f}, accepted={})').format(
+                    self.n_inverted, self.n_poor, self.min_quality, self.max_distortion,
+                    self.max_scale, self.accepted)
+
+
+class Baseline:
+
+    def __init__(self, deck, desvec):
+        '''
+        The class Baseline holds the nodes and elements of a baseline deck and
+        the quality of its elements.
+
+        Args:
+        deck :              the .fem file.
+        desvec :            the design vector it was meshed for.
+        '''
+        self.deck = deck
+        self.desvec = np.asarray(desvec, dtype=float)
+        bulk = BulkData(deck, ('GRID', 'CTETRA', 'CTRIA3', 'CQUAD4'))
+        self.grids = bulk['GRID']
+        self.xyz = np.nan_to_num(self.grids.xyz)
+        index = bulk.index('GRID')
+        '''
+        The corner nodes come first, so the 10-node tetrahedra are checked on
+        their corners. The quadrilaterals are checked as two triangles.
+        '''
+        self.tets = index[bulk['CTETRA'].nodes[:, :4]]
+        quads = index[bulk['CQUAD4'].nodes]
+        self.trias = np.concatenate((index[bulk['CTRIA3'].nodes], quads[:, :3],
+                                     quads[:, [0, 2, 3]]))
+        self.volumes, self.tet_quality = tet_quality(self.xyz, self.tets)
+        self.areas, self.tria_quality = tria_quality(self.xyz, self.trias)
+
+    def morph(self, desvec, min_quality=0.05, max_distortion=0.5, max_scale=1.5):
+        """
+        Maps the nodes on the planform of 'desvec' and checks the elements.
+
+        Args:
+        desvec :            new design vector.
+        min_quality :       lowest mean-ratio quality accepted. An element
+                            already below it in the baseline only has to
+                            respect 'max_distortion'.
+        max_distortion :    largest relative loss of quality accepted.
+        max_scale :         largest change of element size accepted.
+
+        Returns:
+        xyz :               n x 3 new coordinates, in the order of the GRID
+                            cards.
+        report :            a MorphReport.
+        """
+        if len(self.tets) + len(self.trias) == 0:
+            raise ValueError('{} has no elements to check'.format(self.deck))
+        xyz = morph_nodes(self.xyz, self.desvec, desvec)
+        volumes, tet_q = tet_quality(xyz, self.tets)
+        areas, tria_q = tria_quality(xyz, self.trias)
+        '''
+        An element is inverted if its orientation changes sign or if it
+        collapses; one already degenerate in the baseline is not counted.
+        '''
+        products = np.concatenate((volumes*self.volumes,
+                                   np.einsum('ij,ij->i', areas, self.areas)))
+        base_products = np.concatenate((self.volumes**2,
+                                        np.einsum('ij,ij->i', self.areas, self.areas)))
+        inverted = np.sum((products < 0) | ((products == 0) & (base_products > 0)))
+        quality = np.concatenate((tet_q, tria_q))
+        base_quality = np.concatenate((self.tet_quality, self.tria_quality))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distortion = np.where(base_quality > 0, 1 - quality/base_quality, 0.)
+            scale = np.concatenate((
+                (np.abs(volumes)/np.abs(self.volumes))**(1/3),
+                np.sqrt(np.linalg.norm(areas, axis=1)/np.linalg.norm(self.areas, axis=1))))
+            scale = np.nan_to_num(np.maximum(scale, 1/scale), nan=1.)
+        distortion = np.nan_to_num(distortion, nan=1.)
+        floor = min_quality*(1 - RTOL)
+        poor = np.sum((quality < floor) & ((base_quality >= min_quality) |
+                                           (distortion > max_distortion + RTOL)))
+        report = MorphReport(os.path.dirname(self.deck) or self.deck, len(quality),
+                             int(inverted), int(poor), quality.min(),
+                             max(distortion.max(), 0.), scale.max(), False)
+        report.accepted = (report.n_inverted == 0 and report.n_poor == 0
+                           and report.max_distortion <= max_distortion + RTOL
+                           and report.max_scale <= max_scale*(1 + RTOL))
+        return xyz, report
+
+    def write(self, xyz, dst):
+        """
+        Writes the baseline deck with the coordinates 'xyz' in 'dst'.
+        """
+        grids = self.grids.copy()
+        grids.xyz = xyz
+        patch_grids(self.deck, grids, dst)
+
+
+@lru_cache(maxsize=4)
+def _load(deck, mtime):
+    '''
+    The last baselines read are kept in memory: the designs of an
+    optimisation are morphed from the same few decks.
+    '''
+    with open(os.path.join(os.path.dirname(deck), DESVEC_FILE)) as f:
+        return Baseline(deck, json.load(f))
+
+
+class MorphLibrary:
+
+    def __init__(self, root_dir, min_quality=0.05, max_distortion=0.5,
+                 max_scale=1.5, n_tries=2):
+        '''
+        The class MorphLibrary keeps the baseline decks on disk, one folder
+        per design vector, grouped by the options of the mesh.
+
+        Args:
+        root_dir :          folder of the library.
+        min_quality :       see 'Baseline.morph'.
+        max_distortion :    see 'Baseline.morph'.
+        max_scale :         see 'Baseline.morph'.
+        n_tries :           baselines tried, nearest first, before giving up.
+        '''
+        self.root_dir = root_dir
+        self.thresholds = dict(min_quality=min_quality, max_distortion=max_distortion,
+                               max_scale=max_scale)
+        self.n_tries = n_tries
+        self.n_morphed = 0
+        self.n_rejected = 0
+
+    def _group_dir(self, inputs):
+        '''
+        Folder of the baselines meshed with the same 'inputs' (mesh size,
+        layout, airfoil...), which must be convertible to a string.
+        '''
+        h = hashlib.sha256()
+        for name in sorted(inputs):
+            h.update('|{}={!r}'.format(name, inputs[name]).encode())
+        return os.path.join(self.root_dir, h.hexdigest()[:16])
+
+    def baselines(self, **inputs):
+        """
+        List of (design vector, folder) of the baselines of 'inputs'.
+        """
+        group = self._group_dir(inputs)
+        found = []
+        if os.path.isdir(group):
+            for name in sorted(os.listdir(group)):
+                path = os.path.join(group, name, DESVEC_FILE)
+                if os.path.exists(path):
+                    with open(path) as f:
+                        found.append((np.array(json.load(f)), os.path.join(group, name)))
+        return found
+
+    def add(self, desvec, deck, **inputs):
+        """
+        Copies 'deck', meshed for 'desvec', in the library. The design vector
+        is written last, so the other processes never see a partial deck.
+        """
+        desvec = np.asarray(desvec, dtype=float)
+        folder = os.path.join(self._group_dir(inputs),
+                              hashlib.sha256(desvec.tobytes()).hexdigest()[:16])
+        if os.path.exists(os.path.join(folder, DESVEC_FILE)):
+            return folder
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder)
+        os.close(fd)
+        shutil.copyfile(deck, tmp)
+        os.replace(tmp, os.path.join(folder, DECK_FILE))
+        fd, tmp = tempfile.mkstemp(dir=folder)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(desvec.tolist(), f)
+        os.replace(tmp, os.path.join(folder, DESVEC_FILE))
+        return folder
+
+    def morph(self, desvec, dst, **inputs):
+        """
+        Writes in 'dst' the deck of 'desvec' morphed from the nearest
+        baseline of 'inputs' whose elements pass the checks.
+
+        Returns:
+        report :            the MorphReport of the deck written, or None if
+                            the design has to be meshed.
+        """
+        desvec = np.asarray(desvec, dtype=float)
+        candidates = self.baselines(**inputs)
+        '''
+        Distance between planforms relative to the semi-span of the baseline.
+        '''
+        candidates.sort(key=lambda c: np.linalg.norm(desvec - c[0]) / c[0][6])
+        for base_desvec, folder in candidates[:self.n_tries]:
+            deck = os.path.join(folder, DECK_FILE)
+            baseline = _load(deck, os.path.getmtime(deck))
+            xyz, report = baseline.morph(desvec, **self.thresholds)
+            if report.accepted:
+                baseline.write(xyz, dst)
+                self.n_morphed += 1
+                return report
+            print('Mesh not morphed from {}: {}'.format(folder, report))
+        self.n_rejected += 1
+        return None
@@ -0,0 +1,198 @@
+'''
+Created on 18 Oct 2026
+This module contains the class MultiFidelityDriver. It replaces the old
+rule "OptiStruct at the first and at every even iteration": every design is
+first evaluated with a cheap set-up (coarse AVL lattice, coarse HyperMesh
+mesh) and the result is corrected with the difference between the fine and
+the cheap evaluations seen so far. The full evaluation is run only where the
+correction is uncertain, i.e. far from the designs already evaluated with
+both set-ups.
+The driver keeps count of the solver time spent and of the time saved with
+respect to running every design with the full set-up.
+'''
+
+import numpy as np
+
+
+'''
+Default settings of the two fidelities, passed to 'evaluate_design'.
+'''
+LOW_FIDELITY = dict(resolution=(10, 20), mesh_divisor=12)
+HIGH_FIDELITY = dict(resolution=(20, 40), mesh_divisor=25)
+
+
+class MultiFidelityDriver:
+
+    def __init__(self, pool, low=None, high=None, radius=0.05, scale=None,
+                 bounds=None, objective=None, verbose=False):
+        '''
+        The class MultiFidelityDriver evaluates design vectors through an
+        EvaluationPool mixing cheap and full evaluations.
+
+        Args:
+        pool :              an EvaluationPool.
+        low, high :         options of 'evaluate_design' for the cheap and the
+                            full evaluation.
+        radius :            a full evaluation is scheduled when the nearest
+                            design with both evaluations is farther than
+                            'radius' (distance of the design vectors divided
+                            by 'scale').
+        scale :             size of each component of the design vector. By
+                            default the width of 'bounds' or, without
+                            bounds, the size of the first batch evaluated
+                            (see '_default_scale').
+        bounds :            (min, max) of each component, as given to
+                            'minimize'.
+        objective :         function objective(CD, mass) used by __call__.
+                            Default is the drag coefficient.
+        verbose :           if True the time saved is printed after each
+                            batch (otherwise see 'report').
+        '''
+        self.pool = pool
+        self.low = dict(LOW_FIDELITY if low is None else low)
+        self.high = dict(HIGH_FIDELITY if high is None else high)
+        self.radius = radius
+        self.scale = None if scale is None else np.asarray(scale, dtype=float)
+        self.bounds = None if bounds is None else np.asarray(bounds, dtype=float)
+        self.objective = objective if objective is not None else (lambda CD, mass: CD)
+        self.verbose = verbose
+        '''
+        Designs evaluated with both fidelities and the corresponding
+        differences (high - low) of CD and mass.
+        '''
+        self.points = []
+        self.deltas = []
+        self.time_low = 0.
+        self.time_high = 0.
+        self.n_low = 0
+        self.n_high = 0
+        self.time_saved = 0.
+
+    def _default_scale(self, desvecs):
+        '''
+        Width of the bounds or, without bounds, the larger of the magnitude
+        and of the spread of each component in the batch. All the components
+        are lengths [mm]: a component which is 0 (e.g. the leading edge of a
+        kink without sweep, or a fixed bound) gets a thousandth of the
+        largest one, so the distances stay finite.
+        '''
+        floor = 1e-3 * np.abs(desvecs).max()
+        floor = floor if floor > 0 else 1.
+        if self.bounds is not None:
+            scale = self.bounds[:, 1] - self.bounds[:, 0]
+            return np.where(scale > 0, scale, floor)
+        scale = np.maximum(np.abs(desvecs).max(axis=0), np.ptp(desvecs, axis=0))
+        return np.maximum(scale, floor)
+
+    @staticmethod
+    def _values(result):
+        mass = result.mass if result.mass is not None else np.nan
+        return np.array([result.CD, mass], dtype=float)
+
+    @staticmethod
+    def _time(result):
+        return sum(result.timings.values())
+
+    def uncertainty(self, desvec):
+        """
+        Distance, relative to 'scale', from 'desvec' to the nearest design
+        evaluated with both fidelities. Infinite if there is none.
+        """
+        if not self.points:
+            return np.inf
+        distances = np.linalg.norm((np.array(self.points) - desvec) / self.scale,
+                                   axis=1)
+        return distances.min()
+
+    def correction(self, desvec):
+        """
+        Correction (high - low) of CD and mass at 'desvec': the differences
+        of the known designs weighted by the inverse of the squared distance.
+        """
+        if not self.points:
+            return np.zeros(2)
+        distances = np.linalg.norm((np.array(self.points) - desvec) / self.scale,
+                                   axis=1)
+        deltas = np.array(self.deltas)
+        if distances.min() == 0:
+            return deltas[np.argmin(distances)]
+        weights = 1 / distances**2
+        return weights @ deltas / weights.sum()
+
+    def evaluate(self, desvecs):
+        """
+        Evaluates a batch of design vectors.
+
+        Args:
+        desvecs :           list or N x 7 array of design vectors.
+
+        Returns:
+        values :            N x 2 array of CD and mass.
+        fidelity :          N array, True where the full evaluation was run.
+        """
+        desvecs = np.atleast_2d(np.asarray(desvecs, dtype=float))
+        if self.scale is None:
+            self.scale = self._default_scale(desvecs)
+
+        low_results = self.pool.map(desvecs, **self.low)
+        for result in low_results:
+            if not result.ok:
+                raise RuntimeError(result.error)
+            self.time_low += self._time(result)
+        self.n_low += len(low_results)
+
+        '''
+        The full evaluations are sent together, after choosing them one at a
+        time: a design close to one already chosen in this batch does not
+        need its own.
+        '''
+        chosen = []
+        for k, desvec in enumerate(desvecs):
+            distance = self.uncertainty(desvec)
+            if chosen:
+                near = np.linalg.norm((desvecs[chosen] - desvec) / self.scale, axis=1)
+                distance = min(distance, near.min())
+            if distance > self.radius:
+                chosen.append(k)
+        high_results = self.pool.map(desvecs[chosen], **self.high) if chosen else []
+
+        values = np.array([self._values(result) for result in low_results])
+        fidelity = np.zeros(len(desvecs), dtype=bool)
+        for k, result in zip(chosen, high_results):
+            if not result.ok:
+                raise RuntimeError(result.error)
+            self.time_high += self._time(result)
+            high = self._values(result)
+            self.points.append(desvecs[k])
+            self.deltas.append(high - values[k])
+            values[k] = high
+            fidelity[k] = True
+        self.n_high += len(high_results)
+
+        for k in np.flatnonzero(~fidelity):
+            values[k] = values[k] + self.correction(desvecs[k])
+
+        '''
+        Each design not evaluated with the full set-up saves the mean cost of a
+        full evaluation minus the cost of its cheap one.
+        '''
+        if self.n_high:
+            mean_high = self.time_high / self.n_high
+            for k in np.flatnonzero(~fidelity):
+                self.time_saved += mean_high - self._time(low_results[k])
+        if self.verbose:
+            print(self.report())
+        return values, fidelity
+
+    def __call__(self, desvec):
+        """
+        Objective for scipy.optimize.minimize.
+        """
+        values = self.evaluate([desvec])[0][0]
+        return self.objective(values[0], values[1])
+
+    def report(self):
+        return ('{} cheap and {} full evaluations, solver time {:.1f} s, '
+                'saved {:.1f} s'.format(self.n_low, self.n_high,
+                                        self.time_low + self.time_high,
+                                        self.time_saved))
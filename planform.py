@@ -0,0 +1,195 @@
+'''
+Created on 18 Oct 2026
+This module contains vectorised versions of 'ref_values' and of
+'FCMacro_writer.make_sections' with their analytic Jacobians. All the
+functions accept a single design vector or a batch of them (N x 7 array) and
+are plain array arithmetic, so the planform constraints (wing area, aspect
+ratio) of thousands of candidates are checked in a fraction of a millisecond,
+and their exact derivatives can be given to the optimiser.
+The design vector is (c_root, c_kink, c_tip, x_kink, x_tip, y_kink, y_tip)
+in mm, with x the leading edge position and y the spanwise station.
+Jacobians have the shape N x n_values x 7 (n_values x 7 for a single
+design vector).
+'''
+
+import numpy as np
+
+
+def _batch(desvecs):
+    p = np.asarray(desvecs)
+    if not np.iscomplexobj(p):
+        p = p.astype(float)
+    return np.atleast_2d(p), p.ndim == 1
+
+
+def _output(single, *arrays):
+    if single:
+        arrays = tuple(a[0] for a in arrays)
+    return arrays if len(arrays) > 1 else arrays[0]
+
+
+'''
+Stations, leading edge and chords are linear in the design vector: each row
+below gives the coefficients of one of the 5 sections (root, half of the
+inner panel, kink, half of the outer panel, tip).
+'''
+_Y = np.array([[0, 0, 0, 0, 0, 0, 0],
+               [0, 0, 0, 0, 0, 0.5, 0],
+               [0, 0, 0, 0, 0, 1, 0],
+               [0, 0, 0, 0, 0, 0.5, 0.5],
+               [0, 0, 0, 0, 0, 0, 1]], dtype=float)
+_XLE = np.array([[0, 0, 0, 0, 0, 0, 0],
+                 [0, 0, 0, 0.5, 0, 0, 0],
+                 [0, 0, 0, 1, 0, 0, 0],
+                 [0, 0, 0, 0.5, 0.5, 0, 0],
+                 [0, 0, 0, 0, 1, 0, 0]], dtype=float)
+_CHORDS = np.array([[1, 0, 0, 0, 0, 0, 0],
+                    [0.5, 0.5, 0, 0, 0, 0, 0],
+                    [0, 1, 0, 0, 0, 0, 0],
+                    [0, 0.5, 0.5, 0, 0, 0, 0],
+                    [0, 0, 1, 0, 0, 0, 0]], dtype=float)
+
+
+def sections(desvecs):
+    """
+    Spanwise stations, leading edge positions, chords and block areas of the 5
+    sections of 'make_sections'.
+
+    Args:
+    desvecs :           design vector or N x 7 array of design vectors [mm].
+
+    Returns:
+    y, xle, chords :    N x 5 arrays [mm].
+    areas :             N x 4 array, area between two adjacent sections [mm2].
+    """
+    p, single = _batch(desvecs)
+    y = p @ _Y.T
+    xle = p @ _XLE.T
+    chords = p @ _CHORDS.T
+    areas = (chords[:, 1:] + chords[:, :-1]) * np.diff(y, axis=1) / 2
+    return _output(single, y, xle, chords, areas)
+
+
+def sections_jacobian(desvecs):
+    """
+    Jacobians of the values given by 'sections'.
+
+    Returns:
+    dy, dxle, dchords : N x 5 x 7 arrays (constant, the functions are linear).
+    dareas :            N x 4 x 7 array.
+    """
+    p, single = _batch(desvecs)
+    y, chords = p @ _Y.T, p @ _CHORDS.T
+    n = len(p)
+    dy = np.broadcast_to(_Y, (n,) + _Y.shape)
+    dchords = np.broadcast_to(_CHORDS, (n,) + _CHORDS.shape)
+    '''
+    A = (c[k+1] + c[k]) * (y[k+1] - y[k]) / 2, product rule.
+    '''
+    height = np.diff(y, axis=1)[:, :, None]
+    chord_sum = (chords[:, 1:] + chords[:, :-1])[:, :, None]
+    dareas = ((dchords[:, 1:] + dchords[:, :-1]) * height +
+              chord_sum * (dy[:, 1:] - dy[:, :-1])) / 2
+    dxle = np.broadcast_to(_XLE, (n,) + _XLE.shape)
+    return _output(single, dy.copy(), dxle.copy(), dchords.copy(), dareas)
+
+
+def interpolate(desvec, y):
+    """
+    Leading edge and chord of one design vector at any spanwise stations,
+    with the piecewise-linear law of 'make_sections' (root to kink, kink to
+    tip). Stations outside the semi-span take the root or tip values.
+
+    Args:
+    desvec :            design vector [mm].
+    y :                 array of stations [mm].
+
+    Returns:
+    xle, chords :       arrays with the shape of 'y' [mm].
+    """
+    stations, xle, chords, _ = sections(np.asarray(desvec, dtype=float))
+    return np.interp(y, stations, xle), np.interp(y, stations, chords)
+
+
+def reference_values(desvecs):
+    """
+    Wing area and reference chord of 'ref_values' with their derivatives.
+
+    Returns:
+    S :                 N array, area of the half wing [m2].
+    cm :                N array, reference chord S/b [m].
+    dS :                N x 7 array [m2/mm].
+    dcm :               N x 7 array [m/mm].
+    """
+    p, single = _batch(desvecs)
+    c0, c1, c2, y5, y6 = p[:, 0], p[:, 1], p[:, 2], p[:, 5], p[:, 6]
+    S = ((c0 + c1) * y5 + (c1 + c2) * (y6 - y5)) / 2
+    dS = np.zeros(p.shape, dtype=p.dtype)
+    dS[:, 0] = y5 / 2
+    dS[:, 1] = y6 / 2
+    dS[:, 2] = (y6 - y5) / 2
+    dS[:, 5] = (c0 - c2) / 2
+    dS[:, 6] = (c1 + c2) / 2
+    cm = S / y6
+    dcm = dS / y6[:, None]
+    dcm[:, 6] -= S / y6**2
+    return _output(single, S / 1e6, cm / 1e3, dS / 1e6, dcm / 1e3)
+
+
+def aspect_ratio(desvecs):
+    """
+    Aspect ratio of the whole wing, (2*y_tip)**2 / (2*S), and its derivative.
+
+    Returns:
+    AR :                N array.
+    dAR :               N x 7 array [1/mm].
+    """
+    p, single = _batch(desvecs)
+    S, _, dS, _ = reference_values(p)
+    b = p[:, 6] / 1e3
+    AR = 2 * b**2 / S
+    dAR = -AR[:, None] * dS / S[:, None]
+    dAR[:, 6] += 4 * b / S / 1e3
+    return _output(single, AR, dAR)
+
+
+def planform_constraints(desvecs, area_bounds=None, ar_bounds=None):
+    """
+    Planform constraints in the form g <= 0, with their Jacobian: chords
+    positive, kink inboard of the tip and, optionally, wing area and aspect
+    ratio within bounds. The rows can be passed to scipy.optimize.minimize as
+    'ineq' constraints with the opposite sign.
+
+    Args:
+    desvecs :           design vector or N x 7 array of design vectors.
+    area_bounds :       (S_min, S_max) [m2], area of the half wing.
+    ar_bounds :         (AR_min, AR_max).
+
+    Returns:
+    g :                 N x m array.
+    dg :                N x m x 7 array.
+    """
+    p, single = _batch(desvecs)
+    n = len(p)
+    rows = [-p[:, [0, 1, 2, 5]], (p[:, 5] - p[:, 6])[:, None]]
+    drows = [np.zeros((n, 4, 7)), np.zeros((n, 1, 7))]
+    drows[0][:, [0, 1, 2, 3], [0, 1, 2, 5]] = -1
+    drows[1][:, 0, 5] = 1
+    drows[1][:, 0, 6] = -1
+    for bounds, function in ((area_bounds, lambda p: reference_values(p)[::2]),
+                             (ar_bounds, aspect_ratio)):
+        if bounds is None:
+            continue
+        value, dvalue = function(p)
+        rows.append(np.column_stack((bounds[0] - value, value - bounds[1])))
+        drows.append(np.stack((-dvalue, dvalue), axis=1))
+    return _output(single, np.hstack(rows), np.concatenate(drows, axis=1))
+
+
+def feasible(desvecs, area_bounds=None, ar_bounds=None):
+    """
+    N array of booleans, True where all the planform constraints hold (the
+    chords and the kink constraint strictly).
+    """
+    g = planform_constraints(np.atleast_2d(desvecs), area_bounds, ar_bounds)[0]
+    return (g[:, :5] < 0).all(axis=1) & (g[:, 5:] <= 0).all(axis=1)
@@ -35,4 +35,6 @@ def read_mass(OUTfile, output_dir):
             mass = open(local_path,'w')
             mass.write(match.group(1))
             mass.close()
-            break
\ No newline at end of file
+            mass = float(match.group(1))
+            break
+    return mass
\ No newline at end of file
@@ -0,0 +1,193 @@
+'''
+Created on 18 Oct 2026
+This module contains the class ResultCache, an on-disk cache of the files
+produced by each stage of the evaluation (results.txt, pressure.csv, box.iges,
+box.fem, box.out). The entries are addressed by a hash of everything the
+stage depends on: design vector, flight conditions, airfoil files and the
+version of the software. When the optimiser comes back to a point already
+evaluated, the files are copied back in the working directory and the
+software is not launched again.
+The cache is bounded in size: the least recently used entries are removed
+first.
+'''
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+'''
+The hash of a file is kept in memory, together with its size and modification
+time, so the airfoil files are read only once per process.
+'''
+_file_hashes = {}
+
+
+def file_hash(path):
+    """
+    Gives back the sha256 of the content of a file. If the file does not exist
+    the hash of its path is returned.
+    """
+    if not os.path.exists(path):
+        return hashlib.sha256(path.encode()).hexdigest()
+    stat = os.stat(path)
+    tag = (path, stat.st_size, stat.st_mtime)
+    if tag not in _file_hashes:
+        with open(path, 'rb') as f:
+            _file_hashes[tag] = hashlib.sha256(f.read()).hexdigest()
+    return _file_hashes[tag]
+
+
+def tool_version(exe):
+    """
+    Gives back a string identifying the installed version of a software: the
+    name of the executable plus its size and modification time. Reinstalling
+    or updating the software invalidates the cache.
+    """
+    if os.path.exists(exe):
+        stat = os.stat(exe)
+        return '{}:{}:{}'.format(os.path.basename(exe), stat.st_size,
+                                 int(stat.st_mtime))
+    return exe
+
+
+class ResultCache:
+
+    def __init__(self, cache_dir, max_size=10e9, max_entries=None,
+                 decimals=None):
+        '''
+        The class ResultCache stores the output files of the stages in
+        'cache_dir'.
+
+        Args:
+        cache_dir :         folder of the cache. Created if missing.
+        max_size :          maximum size of the cache [bytes].
+        max_entries :       maximum number of entries (None means no limit).
+        decimals :          if given, the design vector is rounded to this
+                            number of decimals before hashing, so points closer
+                            than the rounding share the same entry.
+        '''
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.decimals = decimals
+        self.hits = 0
+        self.misses = 0
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def key(self, stage, desvec, **inputs):
+        """
+        Computes the key of a stage. 'inputs' are all the other quantities the
+        stage depends on (Mach, altitude, airfoil hash, software version...).
+        They must be convertible to a string.
+        """
+        vector = np.asarray(desvec, dtype=np.float64)
+        if self.decimals is not None:
+            vector = np.round(vector, self.decimals) + 0.0
+        h = hashlib.sha256()
+        h.update(stage.encode())
+        h.update(vector.tobytes())
+        for name in sorted(inputs):
+            h.update('|{}={!r}'.format(name, inputs[name]).encode())
+        return h.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def fetch(self, key, work_dir):
+        """
+        Copies the files of the entry 'key' in 'work_dir'. Returns True on a
+        hit, False if the entry does not exist.
+        """
+        entry = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry, 'entry.json')) as f:
+                files = json.load(f)['files']
+            for name in files:
+                shutil.copy(os.path.join(entry, name), work_dir)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return False
+        '''
+        Touching the entry marks it as recently used.
+        '''
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        self.hits += 1
+        return True
+
+    def store(self, key, work_dir, files):
+        """
+        Copies 'files' from 'work_dir' in the entry 'key'. The entry is first
+        written in a temporary folder and then renamed, so a concurrent worker
+        never sees an incomplete entry. Nothing is stored if one of the files
+        is missing, i.e. the software failed.
+        """
+        entry = self._entry_dir(key)
+        if os.path.exists(entry):
+            return
+        if not all(os.path.exists(os.path.join(work_dir, name)) for name in files):
+            return
+        parent = os.path.dirname(entry)
+        if not os.path.exists(parent):
+            os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='tmp_', dir=parent)
+        for name in files:
+            shutil.copy(os.path.join(work_dir, name), tmp)
+        with open(os.path.join(tmp, 'entry.json'), 'w') as f:
+            json.dump({'files': list(files), 'created': time.time()}, f)
+        try:
+            os.replace(tmp, entry)
+        except OSError:
+            '''
+            Another worker stored the same entry in the meantime.
+            '''
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for sub in os.listdir(self.cache_dir):
+            sub_path = os.path.join(self.cache_dir, sub)
+            if not os.path.isdir(sub_path):
+                continue
+            for name in os.listdir(sub_path):
+                if name.startswith('tmp_'):
+                    continue
+                path = os.path.join(sub_path, name)
+                try:
+                    size = sum(os.path.getsize(os.path.join(path, f))
+                               for f in os.listdir(path))
+                    entries.append((os.path.getmtime(path), size, path))
+                except OSError:
+                    continue
+        return entries
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache respects
+        'max_size' and 'max_entries'.
+        """
+        entries = sorted(self._entries())
+        total = sum(entry[1] for entry in entries)
+        while entries and (total > self.max_size or
+                           (self.max_entries is not None and
+                            len(entries) > self.max_entries)):
+            mtime, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """
+        Removes all the entries.
+        """
+        for mtime, size, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
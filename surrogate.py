@@ -0,0 +1,176 @@
+'''
+Created on 18 Oct 2026
+This module contains the class SurrogateModel, a Gaussian process model of
+the drag coefficient (from 'get_efficiency') and of the mass (from
+'read_mass') over the 7 components of the design vector. Every completed
+evaluation is added to the model; the predictions come with their standard
+deviation, are computed for a whole batch of design vectors at once and cost
+microseconds instead of the minutes of FreeCAD, HyperMesh and OptiStruct.
+With a fixed length scale and no noise the mean is the RBF interpolant of
+the data, and the standard deviation its power function.
+'''
+
+import numpy as np
+
+
+OUTPUTS = ('CD', 'mass')
+
+
+def _kernel(A, B, length, kind):
+    '''
+    Correlation between the rows of A and B (normalised inputs).
+    '''
+    d2 = ((A[:, None, :] - B[None, :, :])**2).sum(axis=2) / length**2
+    if kind == 'gaussian':
+        return np.exp(-0.5 * d2)
+    r = np.sqrt(5 * d2)
+    return (1 + r + r**2 / 3) * np.exp(-r)
+
+
+class _OutputModel:
+    '''
+    Gaussian process of one output. The data are standardised and the
+    Cholesky factor of the correlation matrix is stored.
+    '''
+    def __init__(self, X, y, length, noise, kind):
+        self.X = X
+        self.mean = y.mean()
+        self.std = y.std() if y.std() > 0 else 1.
+        self.length = length
+        self.kind = kind
+        K = _kernel(X, X, length, kind) + noise * np.eye(len(X))
+        self.L = np.linalg.cholesky(K)
+        self.alpha = np.linalg.solve(self.L.T, np.linalg.solve(self.L, (y - self.mean) / self.std))
+
+    def predict(self, X):
+        k = _kernel(X, self.X, self.length, self.kind)
+        mean = self.mean + self.std * (k @ self.alpha)
+        v = np.linalg.solve(self.L, k.T)
+        var = np.clip(1 - (v**2).sum(axis=0), 0, None)
+        return mean, self.std * np.sqrt(var)
+
+
+def _log_likelihood(X, y, length, noise, kind):
+    y = (y - y.mean()) / (y.std() if y.std() > 0 else 1.)
+    K = _kernel(X, X, length, kind) + noise * np.eye(len(X))
+    try:
+        L = np.linalg.cholesky(K)
+    except np.linalg.LinAlgError:
+        return -np.inf
+    alpha = np.linalg.solve(L.T, np.linalg.solve(L, y))
+    return -0.5 * y @ alpha - np.log(np.diag(L)).sum()
+
+
+class SurrogateModel:
+
+    def __init__(self, lower=None, upper=None, kind='gaussian', noise=1e-8,
+                 retrain_every=5, objective=None):
+        '''
+        The class SurrogateModel learns CD and mass from the evaluations.
+
+        Args:
+        lower, upper :      bounds of the design vector used to normalise the
+                            inputs. By default the range of the data.
+        kind :              correlation function, 'gaussian' or 'matern52'.
+        noise :             nugget added to the diagonal (numerical noise of
+                            the solvers, relative to the variance).
+        retrain_every :     the length scale is fitted again (maximum
+                            likelihood) every 'retrain_every' new points. In
+                            between the new points are added with the old
+                            length scale.
+        objective :         function objective(CD, mass) used by __call__.
+                            Default is the drag coefficient.
+        '''
+        self.lower = None if lower is None else np.asarray(lower, dtype=float)
+        self.upper = None if upper is None else np.asarray(upper, dtype=float)
+        self.kind = kind
+        self.noise = noise
+        self.retrain_every = retrain_every
+        self.objective = objective if objective is not None else (lambda CD, mass: CD)
+        self.X = np.zeros((0, 7))
+        self.Y = np.zeros((0, len(OUTPUTS)))
+        self.lengths = [None] * len(OUTPUTS)
+        self.models = [None] * len(OUTPUTS)
+        self._n_fitted = 0
+        self._n_trained = 0
+
+    def add(self, desvec, CD, mass=np.nan):
+        """
+        Adds one or more truth points. 'desvec' can be a N x 7 array with CD
+        and mass of length N. A missing mass is given as NaN.
+        """
+        X = np.atleast_2d(np.asarray(desvec, dtype=float))
+        Y = np.column_stack((np.broadcast_to(np.asarray(CD, dtype=float), len(X)),
+                             np.broadcast_to(np.asarray(mass, dtype=float), len(X))))
+        self.X = np.vstack((self.X, X))
+        self.Y = np.vstack((self.Y, Y))
+
+    def add_result(self, result):
+        """
+        Adds an EvaluationResult (see 'evaluation.py'). Failed evaluations
+        are skipped.
+        """
+        if result.ok and result.CD is not None:
+            mass = result.mass if result.mass is not None else np.nan
+            self.add(result.desvec, result.CD, mass)
+
+    def _normalise(self, X):
+        lower = self.lower if self.lower is not None else self.X.min(axis=0)
+        upper = self.upper if self.upper is not None else self.X.max(axis=0)
+        span = np.where(upper > lower, upper - lower, 1.)
+        return (X - lower) / span
+
+    def fit(self, retrain=None):
+        """
+        Builds the models of the outputs with the current data. The length
+        scales are chosen again by maximum likelihood if 'retrain' is True,
+        or if it is None and 'retrain_every' points arrived since the last
+        training. With False the old length scales are kept.
+        """
+        n = len(self.X)
+        if retrain is None:
+            retrain = n - self._n_trained >= self.retrain_every
+        Xn = self._normalise(self.X)
+        grid = np.geomspace(0.05, 5, 25)
+        for i in range(len(OUTPUTS)):
+            rows = np.isfinite(self.Y[:, i])
+            if rows.sum() < 2:
+                self.models[i] = None
+                continue
+            X, y = Xn[rows], self.Y[rows, i]
+            if retrain or self.lengths[i] is None:
+                scores = [_log_likelihood(X, y, length, self.noise, self.kind)
+                          for length in grid]
+                self.lengths[i] = grid[int(np.argmax(scores))]
+            self.models[i] = _OutputModel(X, y, self.lengths[i], self.noise, self.kind)
+        if retrain:
+            self._n_trained = n
+        self._n_fitted = n
+
+    def predict(self, desvecs):
+        """
+        Predicts CD and mass for a batch of design vectors.
+
+        Args:
+        desvecs :           N x 7 array (or a single design vector).
+
+        Returns:
+        mean :              N x 2 array, CD and mass.
+        std :               N x 2 array, standard deviations.
+        """
+        if self._n_fitted != len(self.X):
+            self.fit()
+        Xn = self._normalise(np.atleast_2d(np.asarray(desvecs, dtype=float)))
+        mean = np.full((len(Xn), len(OUTPUTS)), np.nan)
+        std = np.full((len(Xn), len(OUTPUTS)), np.nan)
+        for i, model in enumerate(self.models):
+            if model is not None:
+                mean[:, i], std[:, i] = model.predict(Xn)
+        return mean, std
+
+    def __call__(self, desvec):
+        """
+        Objective for scipy.optimize.minimize, computed on the predicted mean.
+        """
+        mean = self.predict(desvec)[0][0]
+        return self.objective(mean[0], mean[1])
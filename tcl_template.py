@@ -0,0 +1,40 @@
+'''
+Created on 18 Oct 2026
+This module contains the class TclTemplate used by 'tcl_writer_p'. A template
+is a block of the HyperMesh macro where the variable tokens are written as
+{{name}}. The text is split once, when the template is created (at import),
+into static chunks and field names; rendering only joins the chunks with the
+values, so writing a macro costs microseconds.
+The Tcl code uses '$' and single braces, so the fields are marked with double
+braces, which HyperMesh macros never contain.
+'''
+
+import re
+
+
+_FIELD = re.compile(r'\{\{(\w+)\}\}')
+
+
+class TclTemplate:
+
+    def __init__(self, text):
+        parts = _FIELD.split(text)
+        self.chunks = parts[0::2]
+        self.fields = parts[1::2]
+
+    def render(self, values):
+        """
+        Gives back the text with the fields replaced by str(values[field]).
+        """
+        out = [self.chunks[0]]
+        for field, chunk in zip(self.fields, self.chunks[1:]):
+            out.append(str(values[field]))
+            out.append(chunk)
+        return ''.join(out)
+
+
+def render(templates, values):
+    """
+    Renders a list of templates with the same values in a single string.
+    """
+    return ''.join([template.render(values) for template in templates])
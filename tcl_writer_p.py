@@ -5,44 +5,68 @@ and writes in it the whole macro in tcl. The only input are the pressure values
 from AVL (missing at the moment. I will use a txt file to test the code) and the
 root chord dimension (from par.txt) to adjust the mesh size according to the
 model size.
+The blocks of the macro are compiled once, at import, as TclTemplate objects
+(see 'tcl_template.py'): each call only fills in the mesh size, the volume
+fraction, the file paths and the surface ids, and writes the file at once.
 I write the module as a function, not a class.
 @author: Fabio C.
 '''
-# import os
+import os
+from functools import lru_cache
 # from numpy import loadtxt
 
+from box_layout import BoxLayout
+from tcl_template import TclTemplate, render
+
 
 '''
 Setting directory.
 '''
 
-def tcl_writer(desvec, vol_frac, output_filename, out_dir, compliance=False):
+def _mark(ids):
     '''
-    This function writes the tcl macro for HM in a file, whose name is given as
-    input. It actually only changes the mesh size and the pressure values, while
-    all the rest of the script remained unchanged.
-    
-    Args:
-    desvec:             Is the design vector.
-    vf:                 Volume fraction used during topology optimisation.
-    output_filename:    Is the file containing the tcl macro for HyperMesh.
+    List of surface ids for *createmark, with runs of 3 or more consecutive
+    ids written as ranges (e.g. '2 4 6 8-16').
     '''
-            
-    volfrac = vol_frac
-    params = desvec
-    size = int(params[2]/25)
+    ids = sorted(ids)
+    groups = []
+    start = 0
+    for k in range(1, len(ids) + 1):
+        if k == len(ids) or ids[k] != ids[k-1] + 1:
+            run = ids[start:k]
+            if len(run) >= 3:
+                groups.append('{}-{}'.format(run[0], run[-1]))
+            else:
+                groups += [str(i) for i in run]
+            start = k
+    return ' '.join(groups)
+
+
+def _automesh(n_surfaces):
     '''
-    Get the path to the aerodynamic loads file.
+    Mesh parameters and automesh command for each surface of the mark.
     '''
-#     loads_path = os.path.join(out_dir, file_loads)
-#     loads = loadtxt(loads_path)
-    
-    
-    tclfile = open(output_filename,'w')
-    
-    #Writing the initial block.
-    tclfile.write("# Launching block.\n")
-    s_launch = '''
+    return ''.join(['*set_meshfaceparams {0} 2 2 0 0 1 0.5 1 1\n*automesh {0} 2 2\n'.format(i)
+                    for i in range(n_surfaces)])
+
+
+@lru_cache(maxsize=64)
+def _surface_fields(skin_upper, skin_lower, spars, root, tip):
+    '''
+    Fields of the templates given by the surface manifest. They only change
+    with the layout, so they are kept.
+    '''
+    caps = [root, tip]
+    skin = list(skin_lower) + list(spars)
+    return dict(caps=_mark(caps), caps_automesh=_automesh(len(caps)),
+                skin=_mark(skin), skin_automesh=_automesh(len(skin)),
+                skin_up=_mark(skin_upper), skin_up_automesh=_automesh(len(skin_upper)),
+                root=root)
+
+
+
+#Writing the initial block.
+LAUNCH = TclTemplate('# Launching block.\n' + '''
 *begin "version 14.0"
 *menufilterset "*"
 *menufilterdisable 
@@ -57,39 +81,27 @@ def tcl_writer(desvec, vol_frac, output_filename, out_dir, compliance=False):
 *settopologydisplaymode 0
 *elementchecksettings 6 0 0 1 1 6 0 6 0 6 6 6 0 0 0 0 0 0 0 0 0 0 0
 *templatefileset "C:/Program Files/Altair/14.0/templates/feoutput/optistruct/optistruct"
-*enablemacromenu 1'''
-    tclfile.write(s_launch)
-    
-    #Import the *.iges file.
-    s_geom = '''
+*enablemacromenu 1''')
+
+#Open the meshed model saved by the mesh stage.
+READ_MESH = TclTemplate('\n#Open the meshed model saved by the mesh stage.\n'
+                        '*readfile "{{mesh_file}}" 0\n')
+
+#Import the *.iges file.
+GEOM = TclTemplate('''
 #Import geometry from *.iges.
 *start_batch_import 3
 *setgeomrefinelevel 1
 *geomimport "auto_detect" "box.iges" "CleanupTol=-0.01" "DoNotMergeEdges=off" "ImportBlanked=off" "ScaleFactor=1.0"
-*end_batch_import'''
-    tclfile.write(s_geom)
-    
-    #Making the two extreme surfaces to close the volume.
-    s_faces = '''
-#Making the two extreme surfaces to close the volume.
-*drawlistresetstyle
-*surfacemode 4
-*createmark lines 1 1 2 12 14
-*surfacesplineonlinesloop 1 1 1 3 
-*surfacemode 4
-*createmark lines 1 8 9 29 35
-*surfacesplineonlinesloop 1 1 1 3'''
-    tclfile.write(s_faces)
-    
-    #Create the solid.
-    s_volume = '''
+*end_batch_import''')
+
+#Create the solid.
+VOLUME = TclTemplate('''
 *createmark surfaces 1 "all"
-*solids_create_from_surfaces 1 4 -1 2'''
-    tclfile.write(s_volume)
-   
-   
-    #Collectors management.
-    s_colcts = ''' 
+*solids_create_from_surfaces 1 4 -1 2''')
+
+#Collectors management.
+COLCTS = TclTemplate(''' 
 #Rename the lvl0 collector...
 *retainmarkselections 1
 *startnotehistorystate {Renamed component from "lvl0" to "Design"}
@@ -119,63 +131,35 @@ def tcl_writer(desvec, vol_frac, output_filename, out_dir, compliance=False):
 *startnotehistorystate {Renamed component from "component1" to "Caps"}
 *renamecollector components "component1" "Caps"
 *retainmarkselections 0
-*endnotehistorystate {Renamed component from "component1" to "Caps"}'''
-    tclfile.write(s_colcts)
+*endnotehistorystate {Renamed component from "component1" to "Caps"}''')
 
-    s_meshtip = '''
+#Mesh of the caps.
+MESHTIP = TclTemplate('''
 #Create the 2D mesh for the Caps component.
 *setedgedensitylinkwithaspectratio -1
 *elementorder 1
 *startnotehistorystate {Automesh surfaces}
-*createmark surfaces 1 17 18
-*interactiveremeshsurf 1 ''' + str(size) + ''' 2 2 2 1 1
-*set_meshfaceparams 0 2 2 0 0 1 0.5 1 1
-*automesh 0 2 2
-*set_meshfaceparams 1 2 2 0 0 1 0.5 1 1
-*automesh 1 2 2
-*storemeshtodatabase 0
+*createmark surfaces 1 {{caps}}
+*interactiveremeshsurf 1 {{size}} 2 2 2 1 1
+{{caps_automesh}}*storemeshtodatabase 0
 *ameshclearsurface 
-*endnotehistorystate {Automesh surfaces}'''
-    tclfile.write(s_meshtip)   
-    
-    s_meshsurf = '''
+*endnotehistorystate {Automesh surfaces}''')
+
+#Mesh of the skin and of the spars.
+MESHSURF = TclTemplate('''
 #Make the skin component current.
 *retainmarkselections 1
 *currentcollector components "Skin"
 *retainmarkselections 0
 
-#Create the mesh. First the 2D surface mesh. If you see OS uses an iterative command over the 16 surfaces.
+#Create the mesh. First the 2D surface mesh. If you see OS uses an iterative command over the surfaces.
 #IMPORTANT: The mesh size is the value, '25' in this case, in the line 'interactiveremeshsurf 1 25 2 2 2 1 1'.
 *setedgedensitylinkwithaspectratio -1
 *elementorder 1
 *startnotehistorystate {Automesh surfaces}
-*createmark surfaces 1 2 4 6 8-16
-*interactiveremeshsurf 1 ''' + str(size) + ''' 2 2 2 1 1
-*set_meshfaceparams 0 2 2 0 0 1 0.5 1 1
-*automesh 0 2 2
-*set_meshfaceparams 1 2 2 0 0 1 0.5 1 1
-*automesh 1 2 2
-*set_meshfaceparams 2 2 2 0 0 1 0.5 1 1
-*automesh 2 2 2
-*set_meshfaceparams 3 2 2 0 0 1 0.5 1 1
-*automesh 3 2 2
-*set_meshfaceparams 4 2 2 0 0 1 0.5 1 1
-*automesh 4 2 2
-*set_meshfaceparams 5 2 2 0 0 1 0.5 1 1
-*automesh 5 2 2
-*set_meshfaceparams 6 2 2 0 0 1 0.5 1 1
-*automesh 6 2 2
-*set_meshfaceparams 7 2 2 0 0 1 0.5 1 1
-*automesh 7 2 2
-*set_meshfaceparams 8 2 2 0 0 1 0.5 1 1
-*automesh 8 2 2
-*set_meshfaceparams 9 2 2 0 0 1 0.5 1 1
-*automesh 9 2 2
-*set_meshfaceparams 10 2 2 0 0 1 0.5 1 1
-*automesh 10 2 2
-*set_meshfaceparams 11 2 2 0 0 1 0.5 1 1
-*automesh 11 2 2
-*storemeshtodatabase 0
+*createmark surfaces 1 {{skin}}
+*interactiveremeshsurf 1 {{size}} 2 2 2 1 1
+{{skin_automesh}}*storemeshtodatabase 0
 *ameshclearsurface 
 *endnotehistorystate {Automesh surfaces}
 
@@ -187,22 +171,14 @@ def tcl_writer(desvec, vol_frac, output_filename, out_dir, compliance=False):
 *setedgedensitylinkwithaspectratio -1
 *elementorder 1
 *startnotehistorystate {Automesh surfaces}
-*createmark surfaces 1 1 3 5 7
-*interactiveremeshsurf 1 ''' + str(size) + ''' 2 2 2 1 1
-*set_meshfaceparams 0 2 2 0 0 1 0.5 1 1
-*automesh 0 2 2
-*set_meshfaceparams 1 2 2 0 0 1 0.5 1 1
-*automesh 1 2 2
-*set_meshfaceparams 2 2 2 0 0 1 0.5 1 1
-*automesh 2 2 2
-*set_meshfaceparams 3 2 2 0 0 1 0.5 1 1
-*automesh 3 2 2
-*storemeshtodatabase 0
+*createmark surfaces 1 {{skin_up}}
+*interactiveremeshsurf 1 {{size}} 2 2 2 1 1
+{{skin_up_automesh}}*storemeshtodatabase 0
 *ameshclearsurface 
-*endnotehistorystate {Automesh surfaces}'''
-    tclfile.write(s_meshsurf)  
-    
-    s_meshsolid = '''
+*endnotehistorystate {Automesh surfaces}''')
+
+#Solid mesh.
+MESHSOLID = TclTemplate('''
 #make current the solid component.
 *retainmarkselections 1
 *currentcollector components "Design"
@@ -221,20 +197,19 @@ def tcl_writer(desvec, vol_frac, output_filename, out_dir, compliance=False):
 # *retainmarkselections 0
 # *endnotehistorystate {Deleted component "Caps "}
 *createmark components 1 "Caps"
-*deletemark components 1'''
-    tclfile.write(s_meshsolid) 
-    
-    s_mater = '''
+*deletemark components 1''')
+
+#Material.
+MATER = TclTemplate('''
 #Create the material.
 *createentity mats cardimage=MAT1 name=material1
 *setvalue mats id=1 name="Dural"
 *setvalue mats id=1 STATUS=1 1=73000
 *setvalue mats id=1 STATUS=1 3=0.33
-*setvalue mats id=1 STATUS=1 4=2.78e-009'''
-    tclfile.write(s_mater)
+*setvalue mats id=1 STATUS=1 4=2.78e-009''')
 
-    
-    s_props = '''
+#Properties.
+PROPS = TclTemplate('''
 #Create the properties.
  
 #Thickness property.
@@ -325,10 +300,10 @@ def tcl_writer(desvec, vol_frac, output_filename, out_dir, compliance=False):
 *createmark materials 1
 *clearmark materials 1
 *createmark elements 1
-*clearmark elements 1'''
-    tclfile.write(s_props)
-     
-    s_constr = '''
+*clearmark elements 1''')
+
+#Constraints.
+CONSTR = TclTemplate('''
 #CONSTRAINTS
 *createentity loadcols name=loadcol1
 *retainmarkselections 1
@@ -344,21 +319,28 @@ def tcl_writer(desvec, vol_frac, output_filename, out_dir, compliance=False):
 *showentitybymark 2 1 2
 *endnotehistorystate {Show component "Design "}
 *startnotehistorystate {Created Constraints}
-*createmark surfaces 1 17
+*createmark surfaces 1 {{root}}
 *loadcreateonentity_curve surfaces 1 3 1 0 0 0 0 0 0 0 0 0 0 0
 *createmark loads 0 1
 *loadsupdatefixedvalue 0 0
-*endnotehistorystate {Created Constraints}'''
-    tclfile.write(s_constr)
-     
-    s_loads = '''
+*endnotehistorystate {Created Constraints}''')
+
+#Saving the meshed model for the loads stage.
+WRITE_MESH = TclTemplate('\n#Saving the meshed model for the loads stage.\n'
+                         '*writefile "{{mesh_file}}" 1\n')
+
+#Loads and load step.
+LOADS = TclTemplate('''
 #LOADS
 *createentity loadcols name=loadcol1
 *retainmarkselections 1
 *startnotehistorystate {Renamed loadcol from "loadcol1" to "Loads"}
 *renamecollector loadcols "loadcol1" "Loads"
 *retainmarkselections 0
-*endnotehistorystate {Renamed loadcol from "loadcol1" to "Loads"}
+*endnotehistorystate {Renamed loadcol from "loadcol1" to "Loads"}''')
+
+#Mapping of the pressure file on the upper skin.
+MAP_PRESSURE = TclTemplate('''
 
 
 
@@ -377,11 +359,9 @@ return $elemList
 *createmark loads 2
 *createmark nodes 1
 #*pressuresonentity_curve elements 1 1 0 0 0 0.5 30 1 0 0 0 0 0
-*BCM elements 1 2 4 1 "C:/Users/NG6A38A/workspace/optimization/src/OS/pressure.csv" -100 1 30'''
+*BCM elements 1 2 4 1 "{{pressure_path}}" -100 1 30''')
 
-    tclfile.write(s_loads) 
-     
-    s_loadstep = '''
+LOADSTEP = TclTemplate('''
 #Create the LOADSTEP 'Static'
 *startnotehistorystate {LoadSteps Creation}
 *createmark loadcols 1 "Constraints" "Loads"
@@ -398,14 +378,10 @@ return $elemList
 *attributeupdateint loadsteps 1 2396 1 1 0 0
 *attributeupdateint loadsteps 1 8134 1 1 0 0
 *attributeupdateint loadsteps 1 2160 1 1 0 0
-*endnotehistorystate {LoadSteps Creation}'''
-    tclfile.write(s_loadstep)
-     
-     
-     
-     
-    if compliance is True:
-        s_responses = '''
+*endnotehistorystate {LoadSteps Creation}''')
+
+#Compliance minimisation.
+COMPLIANCE = TclTemplate('''
 #Create the responses.
 #COMPLIANCE
 *createarray 6 0 0 0 0 0 0
@@ -423,21 +399,18 @@ return $elemList
 *optiresponsesetequationdata2 "VolFrac" 0 0 1 0
 *optiresponsesetequationdata3 "VolFrac" 0 0 1 0
 *optiresponsesetequationdata4 "VolFrac" 0 0 0 0 1 0 1 0'''
-        tclfile.write(s_responses)    
-     
-        s_obj = '''
+                        '''
 #Design Constraints: DCONSTRAINTS
 #Volume Fraction
 *createarray 0
-*opticonstraintcreate "volume_frac" 2 1 0 ''' +str(volfrac)+ ''' 1 0
+*opticonstraintcreate "volume_frac" 2 1 0 {{volfrac}} 1 0
  
 #Design Objective
 #Compliance
-*optiobjectivecreate 1 0 1'''
-        tclfile.write(s_obj)
-     
-    else:        
-        s_responses = '''
+*optiobjectivecreate 1 0 1''')
+
+#Mass minimisation.
+MASS = TclTemplate('''
 #Create the responses.
 #MASS
 *createarray 7 2 0 0 0 0 0 0
@@ -465,9 +438,7 @@ return $elemList
 *optiresponsesetequationdata2 "VolFrac" 0 0 1 0
 *optiresponsesetequationdata3 "VolFrac" 0 0 1 0
 *optiresponsesetequationdata4 "VolFrac" 0 0 0 0 1 0 1 0'''
-        tclfile.write(s_responses)    
-     
-        s_obj = '''
+                  '''
 #Design Constraints: DCONSTRAINTS
 #Stress_von_Mises: -300 and 300 are the lower and upper limit respectively.
 *createarray 1 1
@@ -475,18 +446,14 @@ return $elemList
  
 #Volume Fraction
 *createarray 0
-*opticonstraintcreate "volume_frac" 3 1 0 ''' +str(volfrac)+ ''' 1 0
+*opticonstraintcreate "volume_frac" 3 1 0 {{volfrac}} 1 0
  
 #Design Objective
 #Mass
-*optiobjectivecreate 1 0 0'''
-        tclfile.write(s_obj)
-         
-      
-      
-      
-         
-    s_topo = '''
+*optiobjectivecreate 1 0 0''')
+
+#Topology design variable and control cards.
+TOPOLOGY = TclTemplate('''
 #Create Design Variable (DESVAR): 'Topology'. MINDIM = 100.
 *createmark properties 1 "Solid"
 *topologydesvarcreate 1 "topology" 0 0 2
@@ -512,21 +479,81 @@ return $elemList
 # *opticontrolupdateapproxparameters 0 "FULL"
 # *opticontrolupdatebarconparameters 0 "REQUIRED"
 # *opticontrolupdatecontolparameters 0 1
-# *opticontrolupdatetopdiscparameters 0 "NO"\n'''
-    tclfile.write(s_topo)
-   
-    hm_file = "box.hm"
-    fem_file = "box.fem"
-    tclfile.write("#Exporting files HM and FEM.\n")
-    tclfile.write("*writefile \""+ hm_file + "\" 1\n")
-    tclfile.write("*carddisable \"ANALYSIS\"\n")
-    tclfile.write("*createstringarray 1 \"CONNECTORS_SKIP \"\n")
-    tclfile.write("*feoutputwithdata \"C:/Program Files/Altair/14.0/templates/feoutput/optistruct/optistruct\" \"" + fem_file + "\" 1 0 2 1 1\n")
-    tclfile.write("*cardenable \"ANALYSIS\"\n")
+# *opticontrolupdatetopdiscparameters 0 "NO"\n''')
 
-    tclfile.close()
+EXPORT = TclTemplate('#Exporting files HM and FEM.\n'
+                     '*writefile "{{hm_file}}" 1\n'
+                     '*carddisable "ANALYSIS"\n'
+                     '*createstringarray 1 "CONNECTORS_SKIP "\n'
+                     '*feoutputwithdata "C:/Program Files/Altair/14.0/templates/feoutput/optistruct/optistruct" "{{fem_file}}" 1 0 2 1 1\n'
+                     '*cardenable "ANALYSIS"\n')
 
+'''
+Blocks written by each stage (see 'tcl_writer').
+'''
+MESH_BLOCKS = [GEOM, VOLUME, COLCTS, MESHTIP, MESHSURF, MESHSOLID, MATER, PROPS,
+               CONSTR]
 
 
+def tcl_writer(desvec, vol_frac, output_filename, out_dir, compliance=False,
+               stage='all', mesh_divisor=25, manifest=None, prologue=True,
+               map_pressure=True):
+    '''
+    This function writes the tcl macro for HM in a file, whose name is given as
+    input. It actually only changes the mesh size and the pressure values, while
+    all the rest of the script remained unchanged.
+    
+    Args:
+    desvec:             Is the design vector.
+    vf:                 Volume fraction used during topology optimisation.
+    output_filename:    Is the file containing the tcl macro for HyperMesh.
+    stage:              'all' writes the whole macro. 'mesh' writes only the
+                        geometry, mesh, properties and constraints and saves
+                        the model in 'box_mesh.hm'. 'loads' opens
+                        'box_mesh.hm' and writes the loads, the optimisation
+                        set-up and the *.fem file. Splitting the macro lets a
+                        change of the loads reuse the mesh.
+    mesh_divisor:       The element size is the tip chord divided by this
+                        number. A smaller value gives a coarser, cheaper mesh.
+    manifest:           ids of the surfaces of 'box.iges' written with the
+                        geometry (see 'box_layout.py'). Default is the one of
+                        the default BoxLayout (5 sections).
+    prologue:           if False the launching block is left out: the file is
+                        a fragment for a HyperMesh session that already ran
+                        it (see 'hm_session.py').
+    map_pressure:       if False the pressure is not mapped by HyperMesh: the
+                        'Loads' collector is left empty and the PLOAD4 cards
+                        are added to the *.fem file afterwards (see
+                        'load_mapping.py').
+    '''
+    params = desvec
+    if manifest is None:
+        manifest = BoxLayout().manifest()
+    '''
+    HyperMesh wants forward slashes also on Windows. The pressure file is the
+    one written by 'get_pressure' in the same output directory.
+    '''
+    values = dict(size=int(params[2]/mesh_divisor), volfrac=vol_frac,
+                  pressure_path=os.path.join(out_dir, 'pressure.csv').replace('\\', '/'),
+                  mesh_file='box_mesh.hm', hm_file='box.hm', fem_file='box.fem')
+    values.update(_surface_fields(tuple(manifest['skin_upper']),
+                                  tuple(manifest['skin_lower']),
+                                  tuple(manifest['spars']), manifest['root'],
+                                  manifest['tip']))
 
+    blocks = [LAUNCH] if prologue else []
+    if stage == 'loads':
+        blocks.append(READ_MESH)
+    else:
+        blocks += MESH_BLOCKS
+    if stage == 'mesh':
+        blocks.append(WRITE_MESH)
+    else:
+        blocks.append(LOADS)
+        if map_pressure:
+            blocks.append(MAP_PRESSURE)
+        blocks += [LOADSTEP, COMPLIANCE if compliance is True else MASS,
+                   TOPOLOGY, EXPORT]
 
+    with open(output_filename, 'w') as tclfile:
+        tclfile.write(render(blocks, values))
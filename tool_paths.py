@@ -0,0 +1,20 @@
+'''
+Created on 18 Oct 2026
+This module collects the paths to the external software (AVL, FreeCAD,
+HyperMesh, OptiStruct) called by the optimisation. They used to live at the
+top of 'main.py'; keeping them here lets the evaluation workers import them
+without running the whole optimisation script.
+
+IMPORTANT NOTE: change the paths below to match the installation on the
+                machine running the optimisation.
+'''
+
+import os
+
+
+os.environ['RADFLEX_PATH'] = r'C:\Program Files\Altair\14.0\hwsolvers\common\bin\win64'
+avl_exe = r'C:\Users\NG6A38A\Downloads\AeroSuite\AVL\avl.exe'
+freecad_exe = r'C:\Users\NG6A38A\Downloads\FreeCAD_0.17.12940_x64_dev_win\bin\FreeCAD.exe'
+hypermesh_exe = r'C:\Program Files\Altair\14.0\hm\bin\win64\hmbatch.exe'
+#hypermesh_exe = r'C:\Program Files\Altair\14.0\hm\bin\win64\hmopengl.exe'
+optistruct_exe = r'C:\Program Files\Altair\14.0\hwsolvers\optistruct\bin\win64\optistruct_14.0_win64.exe'